@@ -1,6 +1,7 @@
 import { Request, Response, NextFunction } from "express"
 import { setDoc } from "./lib/db/postgres"
-import UploadRouter from "./routes/http/UploadRouter"
+import UploadRouter, { BatchUploadRouter } from "./routes/http/UploadRouter"
+import ServiceRouter from "./routes/http/ServiceRouter"
 const express = require('express')
 const app = express()
 const port = 4000
@@ -23,3 +24,9 @@ app.get('/', (req: Request, res: Response) => {
 // CSV upload endpoint
 app.post('/api/upload', UploadRouter)  
 
+// Batched, gzip-compressed upload used by `spectre-scanner upload`
+app.use('/api/scans', BatchUploadRouter)
+
+// Service lookups by scan, host/CIDR, port or product
+app.use('/api/services', ServiceRouter)
+
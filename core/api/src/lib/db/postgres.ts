@@ -1,3 +1,8 @@
+import { Pool, PoolClient } from "pg"
+import { from as copyFrom } from "pg-copy-streams"
+import { Readable } from "stream"
+import { pipeline } from "stream/promises"
+
 
 // Sets a document 
 export const setDoc = (collection: string, data: {[x:string]: any}, docId?: string) => {
@@ -12,3 +17,280 @@ export const setDoc = (collection: string, data: {[x:string]: any}, docId?: stri
 
     console.log(`Setting document ${docId} in collection ${collection}`)
 }
+
+
+// Scan storage
+//
+// scans     one row per scan with its metadata sidecar
+// hosts     one row per (scan, ip)
+// services  one row per open (host, port, protocol)
+//
+// Rows arrive in the scanner's CSV column order and are COPY'd into a
+// temporary staging table, then split into hosts and services with
+// set-based INSERT ... SELECT. Repeated rows within a scan (retried
+// batches, overlapping shards) collapse onto the unique keys.
+
+// Column order written by the scanner's OutputFormatter
+export const SCAN_COLUMNS = [
+    'timestamp', 'scan_id', 'target_ip', 'hostname', 'port',
+    'protocol', 'service', 'version', 'product', 'os_guess'
+] as const
+
+export type ScanRow = { [K in typeof SCAN_COLUMNS[number]]?: string | number | null }
+
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id         TEXT PRIMARY KEY,
+    target          TEXT,
+    started_at      TIMESTAMPTZ,
+    finished_at     TIMESTAMPTZ,
+    total_hosts     INTEGER,
+    total_services  INTEGER,
+    metadata        JSONB,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS hosts (
+    id        BIGSERIAL PRIMARY KEY,
+    scan_id   TEXT NOT NULL REFERENCES scans (scan_id) ON DELETE CASCADE,
+    ip        INET NOT NULL,
+    hostname  TEXT,
+    os_guess  TEXT,
+    UNIQUE (scan_id, ip)
+);
+
+CREATE TABLE IF NOT EXISTS services (
+    host_id   BIGINT NOT NULL REFERENCES hosts (id) ON DELETE CASCADE,
+    scan_id   TEXT NOT NULL,
+    port      INTEGER NOT NULL,
+    protocol  TEXT NOT NULL,
+    service   TEXT,
+    product   TEXT,
+    version   TEXT,
+    seen_at   TIMESTAMPTZ,
+    PRIMARY KEY (host_id, port, protocol)
+);
+
+CREATE INDEX IF NOT EXISTS hosts_ip_idx ON hosts USING gist (ip inet_ops);
+CREATE INDEX IF NOT EXISTS services_scan_idx ON services (scan_id);
+CREATE INDEX IF NOT EXISTS services_port_idx ON services (port, protocol);
+CREATE INDEX IF NOT EXISTS services_product_idx ON services (product, version);
+CREATE INDEX IF NOT EXISTS services_service_idx ON services (service);
+`
+
+// Staging table for one load, dropped when its transaction ends. Columns
+// beyond SCAN_COLUMNS (--incremental's change, --cve-feed's cves/severity/
+// cvss) are staged as well and left out of the merge.
+const stagingTable = (columns: readonly string[]) => `
+CREATE TEMP TABLE scan_rows_staging (
+    ${Array.from(new Set([...SCAN_COLUMNS, ...columns]), (column) => `"${column}" TEXT`).join(', ')}
+) ON COMMIT DROP
+`
+
+// DISTINCT ON keeps ON CONFLICT from touching the same row twice in one statement
+const MERGE_HOSTS = `
+INSERT INTO hosts (scan_id, ip, hostname, os_guess)
+SELECT DISTINCT ON (target_ip) $1, target_ip::inet, NULLIF(hostname, ''), NULLIF(os_guess, '')
+FROM scan_rows_staging
+WHERE target_ip IS NOT NULL AND target_ip <> ''
+ORDER BY target_ip, timestamp DESC
+ON CONFLICT (scan_id, ip) DO UPDATE SET
+    hostname = COALESCE(EXCLUDED.hostname, hosts.hostname),
+    os_guess = COALESCE(EXCLUDED.os_guess, hosts.os_guess)
+`
+
+const MERGE_SERVICES = `
+INSERT INTO services (host_id, scan_id, port, protocol, service, product, version, seen_at)
+SELECT DISTINCT ON (h.id, s.port::integer, s.protocol)
+    h.id, $1, s.port::integer, s.protocol,
+    NULLIF(s.service, ''), NULLIF(s.product, ''), NULLIF(s.version, ''),
+    NULLIF(s.timestamp, '')::timestamptz
+FROM scan_rows_staging s
+JOIN hosts h ON h.scan_id = $1 AND h.ip = s.target_ip::inet
+WHERE s.port ~ '^[0-9]+$'
+ORDER BY h.id, s.port::integer, s.protocol, s.timestamp DESC
+ON CONFLICT (host_id, port, protocol) DO NOTHING
+`
+
+let pool: Pool | undefined
+let schemaReady: Promise<void> | undefined
+
+// Shared connection pool, configured from DATABASE_URL or the standard PG* variables
+export const getPool = (): Pool => {
+    if (!pool) {
+        pool = new Pool({
+            connectionString: process.env.DATABASE_URL,
+            max: Number(process.env.PG_POOL_SIZE ?? 10),
+            idleTimeoutMillis: 30_000
+        })
+        pool.on('error', (e) => console.error(`Idle Postgres client error: ${e}`))
+    }
+    return pool
+}
+
+// Create the tables and indexes once per process
+export const ensureSchema = (): Promise<void> => {
+    if (!schemaReady) {
+        schemaReady = getPool().query(SCHEMA).then(() => undefined)
+        schemaReady.catch(() => { schemaReady = undefined })
+    }
+    return schemaReady
+}
+
+// One row as a COPY csv line, empty values load as NULL
+const csvField = (value: unknown): string => {
+    if (value === null || value === undefined || value === '') return ''
+    const text = String(value)
+    return /[",\n\r]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text
+}
+
+const csvLines = async function* (rows: Iterable<ScanRow> | AsyncIterable<ScanRow>) {
+    let chunk = ''
+    for await (const row of rows) {
+        chunk += SCAN_COLUMNS.map((column) => csvField(row[column])).join(',') + '\n'
+        // Hand COPY sizeable chunks rather than one write per row
+        if (chunk.length >= 64 * 1024) {
+            yield chunk
+            chunk = ''
+        }
+    }
+    if (chunk) yield chunk
+}
+
+// Header names the scanner writes, anything else is rejected before it reaches SQL
+const COLUMN_NAME = /^[a-z_][a-z0-9_]*$/
+
+// A CSV header the scanner wouldn't have written
+export class CsvHeaderError extends Error {}
+
+// Column names from a CSV stream's header line, and the stream from its start
+const readHeader = async (csv: Readable): Promise<[string[], Readable]> => {
+    const chunks = csv[Symbol.asyncIterator]()
+    let head = Buffer.alloc(0)
+    while (head.indexOf(10) < 0) {
+        const next = await chunks.next()
+        if (next.done) break
+        head = Buffer.concat([head, Buffer.from(next.value)])
+    }
+    const end = head.indexOf(10)
+    const line = head.subarray(0, end < 0 ? head.length : end).toString('utf8')
+    const columns = line.replace(/^\uFEFF/, '').trim().split(',').map((column) => column.trim().replace(/^"|"$/g, ''))
+    for (const column of columns) {
+        // Names end up in the staging DDL and COPY column list
+        if (!COLUMN_NAME.test(column)) throw new CsvHeaderError(`Unexpected CSV column: ${JSON.stringify(column)}`)
+    }
+
+    const replay = async function* () {
+        yield head
+        for (let next = await chunks.next(); !next.done; next = await chunks.next()) yield next.value
+    }
+    return [columns, Readable.from(replay())]
+}
+
+const load = async (scanId: string, source: Readable, columns: readonly string[], header: boolean): Promise<number> => {
+    await ensureSchema()
+    const client: PoolClient = await getPool().connect()
+    try {
+        await client.query('BEGIN')
+        await client.query(stagingTable(columns))
+        await client.query('INSERT INTO scans (scan_id) VALUES ($1) ON CONFLICT DO NOTHING', [scanId])
+
+        const copy = client.query(copyFrom(
+            `COPY scan_rows_staging (${columns.map((column) => `"${column}"`).join(', ')}) ` +
+            `FROM STDIN WITH (FORMAT csv${header ? ', HEADER true' : ''})`
+        ))
+        await pipeline(source, copy)
+
+        await client.query(MERGE_HOSTS, [scanId])
+        const services = await client.query(MERGE_SERVICES, [scanId])
+        await client.query('COMMIT')
+        return services.rowCount ?? 0
+    } catch (e) {
+        await client.query('ROLLBACK').catch(() => undefined)
+        throw e
+    } finally {
+        client.release()
+    }
+}
+
+// Bulk load result rows for a scan, returns the number of new services stored
+export const ingestRows = (scanId: string, rows: Iterable<ScanRow> | AsyncIterable<ScanRow>): Promise<number> => {
+    return load(scanId, Readable.from(csvLines(rows)), SCAN_COLUMNS, false)
+}
+
+// Bulk load a CSV file/stream exactly as the scanner wrote it, whatever
+// columns its header line lists
+export const ingestCsv = async (scanId: string, csv: Readable): Promise<number> => {
+    const [columns, source] = await readHeader(csv)
+    return load(scanId, source, columns, true)
+}
+
+// Record the scan's metadata sidecar once every row is in
+export const completeScan = async (scanId: string, metadata: {[x:string]: any} = {}) => {
+    await ensureSchema()
+    await getPool().query(
+        `INSERT INTO scans (scan_id, target, started_at, finished_at, total_hosts, total_services, metadata)
+         VALUES ($1, $2, $3, $4, $5, $6, $7)
+         ON CONFLICT (scan_id) DO UPDATE SET
+            target = EXCLUDED.target,
+            started_at = EXCLUDED.started_at,
+            finished_at = EXCLUDED.finished_at,
+            total_hosts = EXCLUDED.total_hosts,
+            total_services = EXCLUDED.total_services,
+            metadata = EXCLUDED.metadata`,
+        [
+            scanId,
+            metadata.target ?? null,
+            metadata.start_time ?? null,
+            metadata.end_time ?? null,
+            metadata.total_hosts_scanned ?? null,
+            metadata.total_services_found ?? null,
+            JSON.stringify(metadata)
+        ]
+    )
+}
+
+export type ServiceQuery = {
+    scanId?: string
+    ip?: string          // address or CIDR
+    port?: number
+    product?: string
+    version?: string
+    limit?: number
+}
+
+// Services matching every given filter, each served by an index
+export const findServices = async (query: ServiceQuery) => {
+    const where: string[] = []
+    const params: unknown[] = []
+    const add = (clause: string, value: unknown) => {
+        params.push(value)
+        where.push(clause.replace('?', `$${params.length}`))
+    }
+
+    if (query.scanId) add('s.scan_id = ?', query.scanId)
+    if (query.ip) add('h.ip <<= ?::inet', query.ip)
+    if (query.port !== undefined) add('s.port = ?', query.port)
+    if (query.product) add('s.product = ?', query.product)
+    if (query.version) add('s.version = ?', query.version)
+    params.push(query.limit ?? 1000)
+
+    const result = await getPool().query(
+        `SELECT s.scan_id, host(h.ip) AS ip, h.hostname, h.os_guess, s.port, s.protocol,
+                s.service, s.product, s.version, s.seen_at
+         FROM services s JOIN hosts h ON h.id = s.host_id
+         ${where.length ? 'WHERE ' + where.join(' AND ') : ''}
+         ORDER BY h.ip, s.port
+         LIMIT $${params.length}`,
+        params
+    )
+    return result.rows
+}
+
+// SQLSTATE classes 22 (data exception) and 23 (integrity constraint), i.e.
+// the request's data was at fault rather than the database
+export const isDataError = (e: unknown): boolean => {
+    if (e instanceof CsvHeaderError) return true
+    const code = (e as { code?: unknown }).code
+    return typeof code === 'string' && /^2[23][0-9A-Z]{3}$/.test(code)
+}
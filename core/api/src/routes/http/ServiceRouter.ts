@@ -0,0 +1,58 @@
+import { Request, Response, Router } from "express";
+import { findServices, isDataError, ServiceQuery } from "../../lib/db/postgres";
+
+// Service lookups for the dashboard
+//
+// GET /api/services?scan_id=&ip=&port=&product=&version=&limit=
+//
+// Every filter is optional and they combine with AND. `ip` takes an
+// address or a CIDR. At most `limit` rows (default 1000, max 10000).
+
+const MAX_LIMIT = 10_000
+
+const param = (req: Request, name: string): string | undefined => {
+    const value = req.query[name]
+    return typeof value === 'string' && value !== '' ? value : undefined
+}
+
+const integer = (value: string | undefined, name: string, max: number): number | undefined => {
+    if (value === undefined) return undefined
+    const number = Number(value)
+    if (!Number.isInteger(number) || number < 0 || number > max) {
+        throw new RangeError(`${name} must be an integer from 0 to ${max}`)
+    }
+    return number
+}
+
+const ServiceRouter = Router()
+
+ServiceRouter.get('/', async (req: Request, res: Response) => {
+    let query: ServiceQuery
+    try {
+        query = {
+            scanId: param(req, 'scan_id'),
+            ip: param(req, 'ip'),
+            port: integer(param(req, 'port'), 'port', 65535),
+            product: param(req, 'product'),
+            version: param(req, 'version'),
+            limit: integer(param(req, 'limit'), 'limit', MAX_LIMIT)
+        }
+    } catch (e) {
+        res.status(400).json({ error: (e as Error).message })
+        return
+    }
+
+    try {
+        res.status(200).json({ services: await findServices(query) })
+    } catch (e) {
+        // e.g. an `ip` that isn't an address or CIDR
+        if (isDataError(e)) {
+            res.status(400).json({ error: `Invalid filter: ${(e as Error).message}` })
+            return
+        }
+        console.error(`Failed to query services: ${e}`)
+        res.status(503).json({ error: 'Storage unavailable' })
+    }
+})
+
+export default ServiceRouter
@@ -1,5 +1,7 @@
-import { Request, Response } from "express";
-import { setDoc } from "../../lib/db/postgres";
+import { Request, Response, Router, json, text } from "express";
+import { Readable } from "stream";
+import { createGunzip } from "zlib";
+import { completeScan, ingestCsv, ingestRows, isDataError, setDoc } from "../../lib/db/postgres";
 
 const UploadRouter = (req: Request, res: Response) => {
 
@@ -21,5 +23,143 @@ const UploadRouter = (req: Request, res: Response) => {
     }
 }
 
-export default UploadRouter
 
+// Batched ingest used by `spectre-scanner upload`
+//
+// POST /api/scans/:scanId/batches   gzip JSON Lines, one result row per line
+// POST /api/scans/:scanId/csv       a whole scanner CSV file (text/csv, optionally gzip)
+// POST /api/scans/:scanId/complete  scan metadata once every batch is in
+//
+// Every request carries an Idempotency-Key ("<scanId>:<batch>"). Clients
+// retry on errors, so a key that was already stored is acknowledged with
+// the original result instead of being stored twice.
+
+// Compressed batches are inflated by the body parser, this caps the inflated size
+const MAX_BATCH_SIZE = '32mb'
+
+// Idempotency keys remembered in memory, oldest evicted first
+const MAX_REMEMBERED_KEYS = 100_000
+
+const completedKeys = new Map<string, object>()
+
+const remember = (key: string, result: object) => {
+    completedKeys.set(key, result)
+    if (completedKeys.size > MAX_REMEMBERED_KEYS) {
+        const oldest = completedKeys.keys().next().value
+        if (oldest !== undefined) completedKeys.delete(oldest)
+    }
+}
+
+const replayIfDuplicate = (req: Request, res: Response): boolean => {
+    const key = req.get('Idempotency-Key')
+    const previous = key ? completedKeys.get(key) : undefined
+    if (previous) {
+        res.status(200).json({ ...previous, duplicate: true })
+        return true
+    }
+    return false
+}
+
+const parseRows = (body: string): {[x:string]: any}[] => {
+    const rows = []
+    for (const line of body.split('\n')) {
+        if (line.trim()) rows.push(JSON.parse(line))
+    }
+    return rows
+}
+
+export const BatchUploadRouter = Router()
+
+BatchUploadRouter.post(
+    '/:scanId/batches',
+    text({ type: 'application/x-ndjson', limit: MAX_BATCH_SIZE }),
+    async (req: Request, res: Response) => {
+        if (replayIfDuplicate(req, res)) return
+
+        const scanId = req.params.scanId
+        const batch = Number(req.get('X-Batch-Index') ?? 0)
+
+        let rows
+        try {
+            rows = parseRows(typeof req.body === 'string' ? req.body : '')
+        } catch (e) {
+            res.status(400).json({ error: `Malformed batch: ${e}` })
+            return
+        }
+
+        const expected = req.get('X-Batch-Rows')
+        if (expected !== undefined && Number(expected) !== rows.length) {
+            res.status(400).json({ error: `Expected ${expected} rows, got ${rows.length}` })
+            return
+        }
+
+        try {
+            // Rows already stored for this scan are skipped, so a replay after a restart is harmless
+            await ingestRows(scanId, rows)
+        } catch (e) {
+            console.error(`Failed to store batch ${batch} of scan ${scanId}: ${e}`)
+            // Retryable on the client side
+            res.status(503).json({ error: 'Storage unavailable' })
+            return
+        }
+
+        const result = { scan_id: scanId, batch, rows: rows.length }
+        const key = req.get('Idempotency-Key')
+        if (key) remember(key, result)
+        res.status(202).json(result)
+    }
+)
+
+// The body is streamed straight into COPY rather than parsed in memory
+BatchUploadRouter.post(
+    '/:scanId/csv',
+    async (req: Request, res: Response) => {
+        if (!req.is('text/csv')) {
+            res.status(415).json({ error: 'Expected a text/csv body' })
+            return
+        }
+
+        const scanId = req.params.scanId
+        const body: Readable = req.get('Content-Encoding') === 'gzip' ? req.pipe(createGunzip()) : req
+
+        let services
+        try {
+            services = await ingestCsv(scanId, body)
+        } catch (e) {
+            if (isDataError(e)) {
+                res.status(400).json({ error: `${e}` })
+                return
+            }
+            console.error(`Failed to store CSV of scan ${scanId}: ${e}`)
+            res.status(503).json({ error: 'Storage unavailable' })
+            return
+        }
+        res.status(202).json({ scan_id: scanId, services })
+    }
+)
+
+BatchUploadRouter.post(
+    '/:scanId/complete',
+    json(),
+    async (req: Request, res: Response) => {
+        if (replayIfDuplicate(req, res)) return
+
+        const scanId = req.params.scanId
+        const { batches, rows, metadata } = req.body ?? {}
+
+        try {
+            await completeScan(scanId, metadata)
+        } catch (e) {
+            console.error(`Failed to complete scan ${scanId}: ${e}`)
+            res.status(503).json({ error: 'Storage unavailable' })
+            return
+        }
+
+        const result = { scan_id: scanId, batches, rows }
+        const key = req.get('Idempotency-Key')
+        if (key) remember(key, result)
+        res.status(200).json(result)
+    }
+)
+
+export default UploadRouter
@@ -0,0 +1,385 @@
+"""
+Per-host feature matrices for the risk model, built from scanner output.
+
+Every scan file (any format the scanner writes: csv, csv.gz, csv.zst,
+jsonl, jsonl.gz, parquet or json) is read in chunks and reduced to one
+row per (scan_id, target_ip) with NumPy scatter operations, never a
+Python loop over rows. Each file's result is cached as .npy arrays keyed
+by its path, size and mtime, so re-running over months of scans only
+processes new files, and cached matrices are memory-mapped on load.
+
+Feature columns (see FEATURE_NAMES):
+    services, tcp, udp, distinct_services, with_version
+    port_<n>                 open notable ports
+    ports_<range>            well-known / registered / dynamic counts
+    version_major_mean, version_minor_mean, version_patch_mean,
+    version_major_max        parsed from nmap's version field
+    os_<family>              one-hot OS family from os_guess
+    svc_<i>                  hashed service names
+    prod_<i>                 hashed product and product+major tokens
+
+Usage (from core/model):
+    python features.py scans/*.csv.gz --out features.npy
+or from a notebook:
+    from features import load_features
+    features = load_features(glob.glob('scans/*.csv.gz'))
+    frame = features.to_frame()
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump when the feature layout changes so cached arrays are rebuilt
+FEATURE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.spectre', 'features')
+
+# Rows read from a scan file at a time
+CHUNK_ROWS = 65536
+
+COLUMNS = ['scan_id', 'target_ip', 'port', 'protocol', 'service', 'version', 'product', 'os_guess']
+
+SERVICE_BUCKETS = 64
+PRODUCT_BUCKETS = 128
+
+# Ports that get a column of their own
+NOTABLE_PORTS = (
+    21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 161, 389, 443, 445, 993, 995,
+    1433, 1521, 2049, 2375, 3306, 3389, 5432, 5900, 5985, 6379, 8080, 8443, 9200,
+    11211, 27017
+)
+
+PORT_RANGES = (('well_known', 1024), ('registered', 49152), ('dynamic', 65536))
+
+# os_guess substring -> family, first match wins
+OS_FAMILIES = (
+    ('windows', 'windows'),
+    ('linux', 'linux'),
+    ('bsd', 'bsd'),
+    ('macos', 'mac os|macos|darwin'),
+    ('network', 'cisco|juniper|mikrotik|routeros|fortios|junos'),
+)
+
+_VERSION_PATTERN = r'(\d+)(?:\.(\d+))?(?:\.(\d+))?'
+
+
+def _feature_names() -> List[str]:
+    names = ['services', 'tcp', 'udp', 'distinct_services', 'with_version']
+    names += [f'port_{port}' for port in NOTABLE_PORTS]
+    names += [f'ports_{name}' for name, _ in PORT_RANGES]
+    names += ['version_major_mean', 'version_minor_mean', 'version_patch_mean', 'version_major_max']
+    names += [f'os_{family}' for family, _ in OS_FAMILIES] + ['os_other', 'os_unknown']
+    names += [f'svc_{i}' for i in range(SERVICE_BUCKETS)]
+    names += [f'prod_{i}' for i in range(PRODUCT_BUCKETS)]
+    return names
+
+
+FEATURE_NAMES = _feature_names()
+_COLUMN = {name: i for i, name in enumerate(FEATURE_NAMES)}
+WIDTH = len(FEATURE_NAMES)
+
+_PORT_START = _COLUMN[f'port_{NOTABLE_PORTS[0]}']
+_RANGE_START = _COLUMN[f'ports_{PORT_RANGES[0][0]}']
+_OS_START = _COLUMN[f'os_{OS_FAMILIES[0][0]}']
+_SVC_START = _COLUMN['svc_0']
+_PROD_START = _COLUMN['prod_0']
+
+# Port number -> notable port column, -1 for the rest
+_PORT_COLUMN = np.full(65536, -1, dtype=np.int64)
+_PORT_COLUMN[list(NOTABLE_PORTS)] = np.arange(len(NOTABLE_PORTS)) + _PORT_START
+
+_RANGE_BOUNDS = np.array([bound for _, bound in PORT_RANGES[:-1]])
+
+
+class HostFeatures(NamedTuple):
+    """One feature row per (scan_id, target_ip)"""
+    scan_ids: np.ndarray
+    ips: np.ndarray
+    matrix: np.ndarray
+
+    @property
+    def columns(self) -> List[str]:
+        return FEATURE_NAMES
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame indexed by (scan_id, target_ip)"""
+        index = pd.MultiIndex.from_arrays([self.scan_ids, self.ips], names=['scan_id', 'target_ip'])
+        return pd.DataFrame(self.matrix, index=index, columns=FEATURE_NAMES, copy=False)
+
+
+# Reading
+
+def _base_name(path: str) -> str:
+    for suffix in ('.gz', '.zst'):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def _normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.reindex(columns=COLUMNS)
+    return frame.fillna('').astype(str)
+
+
+def iter_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Scan rows of one results file as string DataFrames of up to chunk_rows rows"""
+    name = _base_name(path)
+    if name.endswith('.csv'):
+        reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows,
+                             usecols=lambda column: column in COLUMNS)
+        for chunk in reader:
+            yield _normalize(chunk)
+    elif name.endswith('.jsonl'):
+        for chunk in pd.read_json(path, lines=True, dtype=False, chunksize=chunk_rows):
+            yield _normalize(chunk)
+    elif name.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [c for c in COLUMNS if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield _normalize(batch.to_pandas())
+    elif name.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            results = json.load(f).get('results', [])
+        for start in range(0, len(results), chunk_rows):
+            yield _normalize(pd.DataFrame.from_records(results[start:start + chunk_rows]))
+    else:
+        raise ValueError(f"Unrecognised results file: {path}")
+
+
+# Extraction
+
+def _hash_buckets(values: np.ndarray, buckets: int) -> np.ndarray:
+    """Stable hashed bucket per value (the same across processes and runs)"""
+    hashed = pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+    return (hashed % np.uint64(buckets)).astype(np.int64)
+
+
+def _distinct(column: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Codes and distinct values of a column.
+
+    Scan columns repeat heavily (a handful of services, products and OS
+    guesses across a network), so string work runs once per distinct value
+    and is broadcast back to the rows through the codes.
+    """
+    codes, uniques = pd.factorize(column.to_numpy(dtype=object))
+    return codes, pd.Series(uniques, dtype=object)
+
+
+def _factorize_pairs(first: np.ndarray, second: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Codes for (first, second) pairs plus the distinct pairs' two halves"""
+    first_codes, first_values = pd.factorize(first)
+    second_codes, second_values = pd.factorize(second)
+    width = max(len(second_values), 1)
+    codes, pairs = pd.factorize(first_codes.astype(np.int64) * width + second_codes)
+    return codes, np.asarray(first_values, dtype=object)[pairs // width], \
+        np.asarray(second_values, dtype=object)[pairs % width]
+
+
+def _chunk_features(chunk: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Partial sums for the hosts in one chunk.
+
+    Returns (scan ids, ips, sums, version_major_max). Sums stay additive
+    so hosts split across chunks are merged by adding their partials.
+    """
+    rows, scan_ids, ips = _factorize_pairs(chunk['scan_id'].to_numpy(dtype=object),
+                                           chunk['target_ip'].to_numpy(dtype=object))
+    sums = np.zeros((len(scan_ids), WIDTH), dtype=np.float64)
+    major_max = np.zeros(len(scan_ids), dtype=np.float64)
+
+    every = np.ones(len(rows), dtype=bool)
+
+    def scatter(columns, mask=every, weights=1.0):
+        columns = np.broadcast_to(columns, rows.shape)
+        weights = np.broadcast_to(weights, rows.shape)
+        np.add.at(sums, (rows[mask], columns[mask]), weights[mask])
+
+    scatter(_COLUMN['services'])
+    codes, protocols = _distinct(chunk['protocol'])
+    protocols = protocols.str.lower()
+    scatter(_COLUMN['tcp'], (protocols == 'tcp').to_numpy()[codes])
+    scatter(_COLUMN['udp'], (protocols == 'udp').to_numpy()[codes])
+
+    port = pd.to_numeric(chunk['port'], errors='coerce').to_numpy(dtype=np.float64)
+    valid = ~np.isnan(port) & (port >= 0) & (port < 65536)
+    port = np.where(valid, port, 0).astype(np.int64)
+    notable = _PORT_COLUMN[port]
+    scatter(notable, valid & (notable >= 0))
+    scatter(_RANGE_START + np.searchsorted(_RANGE_BOUNDS, port, side='right'), valid)
+
+    version_codes, versions = _distinct(chunk['version'])
+    components = versions.str.extract(_VERSION_PATTERN).astype(float).to_numpy().reshape(-1, 3)
+    version = components[version_codes]
+    has_version = ~np.isnan(version[:, 0])
+    scatter(_COLUMN['with_version'], has_version)
+    for offset, name in enumerate(('version_major_mean', 'version_minor_mean', 'version_patch_mean')):
+        scatter(_COLUMN[name], has_version, np.nan_to_num(version[:, offset]))
+    np.maximum.at(major_max, rows[has_version], version[has_version, 0])
+
+    codes, guesses = _distinct(chunk['os_guess'])
+    guesses = guesses.str.lower()
+    families = np.full(len(guesses), _COLUMN['os_other'], dtype=np.int64)
+    families[(guesses == '').to_numpy()] = _COLUMN['os_unknown']
+    unmatched = (guesses != '').to_numpy().copy()
+    for offset, (_, pattern) in enumerate(OS_FAMILIES):
+        hit = unmatched & guesses.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+        families[hit] = _OS_START + offset
+        unmatched &= ~hit
+    scatter(families[codes])
+
+    codes, services = _distinct(chunk['service'])
+    services = services.str.lower()
+    buckets = _SVC_START + _hash_buckets(services.to_numpy(), SERVICE_BUCKETS)
+    scatter(buckets[codes], (services != '').to_numpy()[codes])
+
+    product_codes, products = _distinct(chunk['product'])
+    products = products.str.lower().str.strip()
+    has_product = (products != '').to_numpy()[product_codes]
+    buckets = _PROD_START + _hash_buckets(products.to_numpy(), PRODUCT_BUCKETS)
+    scatter(buckets[product_codes], has_product)
+
+    # Product with its major version, so "openssh 7" and "openssh 9" differ
+    majors = versions.str.extract(r'(\d+)', expand=False).fillna('').to_numpy(dtype=object)
+    pair_codes, pair_products, pair_majors = _factorize_pairs(product_codes, version_codes)
+    tokens = products.to_numpy(dtype=object)[pair_products.astype(np.int64)] + ' ' + \
+        majors[pair_majors.astype(np.int64)]
+    buckets = _PROD_START + _hash_buckets(tokens, PRODUCT_BUCKETS)
+    scatter(buckets[pair_codes], has_product & has_version)
+
+    return scan_ids, ips, sums, major_max
+
+
+def _finalize(scan_ids: np.ndarray, ips: np.ndarray, sums: np.ndarray, major_max: np.ndarray) -> HostFeatures:
+    """Turn merged partial sums into the published feature values"""
+    counted = np.maximum(sums[:, _COLUMN['with_version']], 1)
+    for name in ('version_major_mean', 'version_minor_mean', 'version_patch_mean'):
+        sums[:, _COLUMN[name]] /= counted
+    sums[:, _COLUMN['version_major_max']] = major_max
+    sums[:, _COLUMN['distinct_services']] = np.count_nonzero(
+        sums[:, _SVC_START:_SVC_START + SERVICE_BUCKETS], axis=1)
+
+    # A host has one OS, whichever of its rows carried a guess
+    os_block = sums[:, _OS_START:_COLUMN['os_unknown'] + 1]
+    guessed = os_block[:, :-1].sum(axis=1) > 0
+    os_block[guessed, -1] = 0
+    np.minimum(os_block, 1, out=os_block)
+
+    return HostFeatures(np.asarray(scan_ids, dtype=str), np.asarray(ips, dtype=str), sums.astype(np.float32))
+
+
+def extract_file(path: str, chunk_rows: int = CHUNK_ROWS) -> HostFeatures:
+    """Feature rows for every host in one scan file"""
+    partials = [_chunk_features(chunk) for chunk in iter_chunks(path, chunk_rows)]
+    if not partials:
+        empty = np.array([], dtype=object)
+        return _finalize(empty, empty, np.zeros((0, WIDTH)), np.zeros(0))
+    if len(partials) == 1:
+        return _finalize(*partials[0])
+
+    # Merge hosts that straddle chunk boundaries
+    codes, scan_ids, ips = _factorize_pairs(np.concatenate([p[0] for p in partials]),
+                                            np.concatenate([p[1] for p in partials]))
+    sums = np.zeros((len(scan_ids), WIDTH), dtype=np.float64)
+    np.add.at(sums, codes, np.concatenate([p[2] for p in partials]))
+    major_max = np.zeros(len(scan_ids), dtype=np.float64)
+    np.maximum.at(major_max, codes, np.concatenate([p[3] for p in partials]))
+    return _finalize(scan_ids, ips, sums, major_max)
+
+
+# Caching
+
+def _cache_prefix(path: str, cache_dir: str) -> str:
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{FEATURE_VERSION}|{WIDTH}"
+    digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(_base_name(path))}-{digest}")
+
+
+def _save_array(path: str, array: np.ndarray) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def cached_features(path: str, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                    chunk_rows: int = CHUNK_ROWS) -> HostFeatures:
+    """
+    extract_file() through the .npy cache.
+
+    Cached matrices come back memory-mapped read-only, so only the pages a
+    model actually touches are read from disk.
+    """
+    if not cache_dir:
+        return extract_file(path, chunk_rows)
+
+    prefix = _cache_prefix(path, cache_dir)
+    paths = [f"{prefix}.{part}.npy" for part in ('scan_ids', 'ips', 'matrix')]
+    if all(os.path.exists(p) for p in paths):
+        return HostFeatures(np.load(paths[0]), np.load(paths[1]), np.load(paths[2], mmap_mode='r'))
+
+    features = extract_file(path, chunk_rows)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Matrix last: its presence marks a complete entry
+    for cache_path, array in zip(paths, features):
+        _save_array(cache_path, array)
+    return features
+
+
+def load_features(paths: Sequence[str], cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                  out: Optional[str] = None, chunk_rows: int = CHUNK_ROWS) -> HostFeatures:
+    """
+    Feature rows for every host across many scan files.
+
+    With `out` the combined matrix is written to that .npy file through a
+    memory map, one file's block at a time, and returned memory-mapped, so
+    the combined matrix never has to fit in memory at once.
+    """
+    parts = [cached_features(path, cache_dir, chunk_rows) for path in paths]
+    scan_ids = np.concatenate([p.scan_ids for p in parts]) if parts else np.array([], dtype=str)
+    ips = np.concatenate([p.ips for p in parts]) if parts else np.array([], dtype=str)
+    total = sum(len(p) for p in parts)
+
+    if out is None:
+        matrix = np.concatenate([p.matrix for p in parts]) if parts else np.zeros((0, WIDTH), np.float32)
+        return HostFeatures(scan_ids, ips, matrix)
+
+    matrix = np.lib.format.open_memmap(out, mode='w+', dtype=np.float32, shape=(total, WIDTH))
+    offset = 0
+    for part in parts:
+        matrix[offset:offset + len(part)] = part.matrix
+        offset += len(part)
+    matrix.flush()
+    return HostFeatures(scan_ids, ips, np.load(out, mmap_mode='r'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-host feature matrices from scan files")
+    parser.add_argument('files', nargs='+', help='Scan result files or globs')
+    parser.add_argument('--out', default=None, help='Write the combined matrix to this .npy file')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help='Per-file .npy cache (default: ~/.spectre/features)')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-extract')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    paths = [match for pattern in args.files for match in sorted(glob.glob(pattern)) or [pattern]]
+    features = load_features(paths, None if args.no_cache else args.cache_dir, args.out, args.chunk_rows)
+    print(f"{len(features)} hosts x {WIDTH} features from {len(paths)} files")
+    if args.out:
+        print(f"Matrix saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Scaling benchmark for coordinator/worker scans (src/core/cluster.py).
+
+For each worker count, starts that many local `cli.py worker --once`
+processes with bench/fake_nmap.py as their nmap, runs a DistributedScanner
+over the target in this process and reports wall time and hosts/s. With
+--kill, the first worker is SIGKILLed halfway through to exercise lease
+reassignment; the host count must still come out complete.
+
+fake_nmap paces hosts with FAKE_NMAP_RATE, standing in for the network
+bound part of a real scan, so throughput should grow with the worker count.
+
+Usage (from core/scanner):
+    python bench/bench_cluster.py [--workers 1,2,4] [--target 10.0.0.0/22]
+                                  [--rate 100] [--leases 32] [--kill]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from core.cluster import DistributedScanner
+
+FAKE_NMAP = os.path.join(BENCH_DIR, 'fake_nmap.py')
+
+
+def start_workers(count: int, port: int, rate: float) -> list:
+    env = dict(os.environ, FAKE_NMAP_RATE=str(rate))
+    return [
+        subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, 'cli.py'), 'worker', f"http://127.0.0.1:{port}",
+             '--nmap-path', FAKE_NMAP, '--no-sudo', '--once', '--name', f"bench-{n}"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for n in range(count)
+    ]
+
+
+def run(count: int, port: int, args) -> dict:
+    workers = start_workers(count, port, args.rate)
+    scanner = DistributedScanner(show_progress=False, listen=('127.0.0.1', port),
+                                 leases=args.leases, lease_ttl=args.lease_ttl)
+    if args.kill:
+        threading.Timer(args.kill_after, lambda: workers[0].send_signal(signal.SIGKILL)).start()
+
+    start = time.perf_counter()
+    try:
+        hosts = len({row.host.ip for row in scanner.iter_scan(args.target, ports='top100', timeout=0)})
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+    elapsed = time.perf_counter() - start
+    return {
+        'workers': count,
+        'hosts': hosts,
+        'seconds': elapsed,
+        'reassigned': scanner.coordinator.reassigned
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coordinator/worker scaling benchmark")
+    parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts')
+    parser.add_argument('--target', default='10.0.0.0/22')
+    parser.add_argument('--rate', type=float, default=100, help='Hosts per second per fake nmap')
+    parser.add_argument('--leases', type=int, default=32)
+    parser.add_argument('--lease-ttl', type=float, default=3)
+    parser.add_argument('--port', type=int, default=18731)
+    parser.add_argument('--kill', action='store_true', help='SIGKILL one worker mid-scan')
+    parser.add_argument('--kill-after', type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'hosts':>8} {'seconds':>9} {'hosts/s':>9} {'reassigned':>11}")
+    for i, count in enumerate(int(n) for n in args.workers.split(',')):
+        result = run(count, args.port + i, args)
+        print(f"{result['workers']:>8} {result['hosts']:>8} {result['seconds']:>9.2f} "
+              f"{result['hosts'] / result['seconds']:>9.1f} {result['reassigned']:>11}")
+
+
+if __name__ == "__main__":
+    main()
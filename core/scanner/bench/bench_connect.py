@@ -0,0 +1,88 @@
+"""
+Benchmark for the asyncio connect scanner (src/modules/connect_scan.py)
+against real localhost listeners, no root or nmap needed.
+
+A child process listens on --open ports starting at --base-port on every
+loopback address and accepts and drops connections. The scanner then
+sweeps --hosts loopback addresses (127.0.0.1 upwards, all local on Linux)
+over --ports consecutive ports from --base-port, so each host has --open
+open ports and the rest refuse. Reported per concurrency level: connects
+per second, wall time and whether every open port was found.
+
+Usage (from core/scanner):
+    python bench/bench_connect.py [--hosts 16] [--ports 1000] [--open 20]
+                                  [--concurrency 100,500,2000] [--rate 0]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from modules.connect_scan import ConnectScanner
+
+
+def listen(base_port: int, count: int, ready) -> None:
+    async def drop(reader, writer):
+        writer.close()
+
+    async def serve():
+        servers = [await asyncio.start_server(drop, '0.0.0.0', base_port + i, backlog=4096) for i in range(count)]
+        ready.set()
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+
+    asyncio.run(serve())
+
+
+def sweep(concurrency: int, args) -> dict:
+    last = socket.inet_ntoa((socket.inet_aton('127.0.0.1')[:3] + bytes([args.hosts])))
+    scanner = ConnectScanner(show_progress=False, concurrency=concurrency, connect_timeout=1.0)
+    ports = f"{args.base_port}-{args.base_port + args.ports - 1}"
+
+    start = time.perf_counter()
+    rows = scanner.scan(f"127.0.0.1-{last}", ports=ports, timeout=0, rate_limit=args.rate or None)
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': scanner.effective_concurrency,
+        'rows': len(rows),
+        'expected': args.hosts * args.open,
+        'connects': scanner.metrics.counters.get('connects', 0),
+        'seconds': elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connect scanner benchmark")
+    parser.add_argument('--hosts', type=int, default=16, help='Loopback addresses to sweep (max 254)')
+    parser.add_argument('--ports', type=int, default=1000, help='Ports per host')
+    parser.add_argument('--open', type=int, default=20, help='Listening ports')
+    # Below Linux's ephemeral range (32768+), where loopback self-connects
+    # would show up as extra open ports
+    parser.add_argument('--base-port', type=int, default=20000)
+    parser.add_argument('--concurrency', default='100,500,2000')
+    parser.add_argument('--rate', type=int, default=0, help='Connects per second cap, 0 for none')
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    listener = multiprocessing.Process(target=listen, args=(args.base_port, args.open, ready), daemon=True)
+    listener.start()
+    if not ready.wait(10):
+        sys.exit("Listeners did not start")
+
+    print(f"{'concurrency':>11} {'connects':>9} {'seconds':>8} {'connects/s':>11} {'open found':>11}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            result = sweep(concurrency, args)
+            print(f"{result['concurrency']:>11} {result['connects']:>9} {result['seconds']:>8.2f} "
+                  f"{result['connects'] / result['seconds']:>11.0f} {result['rows']:>5}/{result['expected']:<5}")
+    finally:
+        listener.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Throughput benchmark for the nmap XML parser, the scan pipeline and the
+output writers, driven by bench/fake_nmap.py so it runs on any Linux box
+without root or a network.
+
+Each stage runs in a forked child so its peak RSS is measured on its own.
+Reported per stage: hosts/s, rows/s, time to first result and peak RSS.
+
+    parse        NetworkScanner._parse_nmap_xml on a generated document
+                 (first result = the call returning, it is not streaming)
+    scan         NetworkScanner.scan() against fake_nmap as the nmap binary
+    write:<fmt>  OutputFormatter writer for every --format available here
+                 (first result = the writer pulling its first row)
+
+Usage (from core/scanner):
+    python bench/bench_scan.py [--hosts 10000] [--ports 3] [--rate 0]
+                               [--stages parse,scan,write] [--json results.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+import fake_nmap
+from modules.nmap_xml import NmapXmlStream
+from modules.scanner import NetworkScanner
+from utils.formats import OUTPUT_FORMATS, check_format
+from utils.parser import OutputFormatter
+
+FAKE_NMAP = os.path.join(BENCH_DIR, 'fake_nmap.py')
+
+
+def target_for(hosts: int) -> str:
+    """Smallest CIDR holding `hosts` addresses"""
+    bits = max(0, math.ceil(math.log2(max(1, hosts))))
+    return f"10.0.0.0/{32 - bits}"
+
+
+def peak_rss_kib() -> int:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def generated_xml(hosts: int, ports: int) -> str:
+    return ''.join(fake_nmap.generate_xml([target_for(hosts)], hosts=hosts, ports=ports, stats=True))
+
+
+def bench_parse(hosts: int, ports: int, rate: float) -> dict:
+    xml = generated_xml(hosts, ports)
+    scanner = NetworkScanner(show_progress=False)
+
+    start = time.perf_counter()
+    parsed = scanner._parse_nmap_xml(xml)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'hosts': len(parsed['hosts']),
+        'rows': sum(len(h.ports) for h in parsed['hosts']),
+        'seconds': elapsed,
+        'first_result': elapsed,
+        'bytes': len(xml)
+    }
+
+
+def bench_scan(hosts: int, ports: int, rate: float) -> dict:
+    os.environ.update(FAKE_NMAP_HOSTS=str(hosts), FAKE_NMAP_PORTS=str(ports), FAKE_NMAP_RATE=str(rate))
+    scanner = NetworkScanner(show_progress=False, nmap_path=FAKE_NMAP, sudo=False)
+
+    first = None
+    rows = 0
+    start = time.perf_counter()
+    for _ in scanner.iter_scan(target_for(hosts), ports="1-1000", timeout=3600):
+        if first is None:
+            first = time.perf_counter() - start
+        rows += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        'hosts': scanner.hosts_found,
+        'rows': rows,
+        'seconds': elapsed,
+        'first_result': first
+    }
+
+
+def parsed_hosts(hosts: int, ports: int) -> list:
+    """Parsed hosts without holding the whole document in memory"""
+    stream = NmapXmlStream()
+    parsed = []
+    for chunk in fake_nmap.generate_xml([target_for(hosts)], hosts=hosts, ports=ports, stats=False):
+        parsed.extend(stream.feed(chunk))
+    parsed.extend(stream.close())
+    return parsed
+
+
+def bench_write(hosts: int, ports: int, rate: float, fmt: str) -> dict:
+    parsed = parsed_hosts(hosts, ports)
+    scanner = NetworkScanner(show_progress=False)
+    scanner.scan_id = 'BENCH'
+
+    first = None
+    start = None
+
+    def rows():
+        nonlocal first
+        for host in parsed:
+            for row in scanner._host_rows(host):
+                if first is None:
+                    first = time.perf_counter() - start
+                yield row
+
+    formatter = OutputFormatter()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"bench.{fmt}")
+        # Writers report progress on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            summary = formatter.save(rows(), path, fmt, write_metadata=False)
+            elapsed = time.perf_counter() - start
+        size = os.path.getsize(formatter.output_path)
+
+    return {
+        'hosts': len(parsed),
+        'rows': summary['total_services'],
+        'seconds': elapsed,
+        'first_result': first,
+        'bytes': size
+    }
+
+
+def _child(conn, func, args):
+    try:
+        result = func(*args)
+        result['peak_rss_kib'] = peak_rss_kib()
+        conn.send(result)
+    except Exception as e:
+        conn.send({'error': f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_isolated(func, *args) -> dict:
+    """Run a stage in a fresh forked process and collect its metrics"""
+    context = multiprocessing.get_context('fork')
+    parent, child = context.Pipe(duplex=False)
+    proc = context.Process(target=_child, args=(child, func, args))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    return result
+
+
+def print_table(results: dict) -> None:
+    print(f"{'stage':<16}{'hosts':>9}{'rows':>10}{'seconds':>10}{'hosts/s':>12}"
+          f"{'rows/s':>12}{'first ms':>10}{'peak MiB':>10}{'bytes':>12}")
+    for stage, r in results.items():
+        if 'error' in r:
+            print(f"{stage:<16}  {r['error']}")
+            continue
+        seconds = r['seconds'] or 1e-9
+        first = f"{r['first_result'] * 1000:.1f}" if r.get('first_result') is not None else '-'
+        size = f"{r['bytes']:,}" if 'bytes' in r else '-'
+        print(f"{stage:<16}{r['hosts']:>9}{r['rows']:>10}{r['seconds']:>10.3f}"
+              f"{r['hosts'] / seconds:>12,.0f}{r['rows'] / seconds:>12,.0f}{first:>10}"
+              f"{r['peak_rss_kib'] / 1024:>10.1f}{size:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scanner pipeline benchmark")
+    parser.add_argument('--hosts', type=int, default=10000, help='Hosts per run (default: 10000)')
+    parser.add_argument('--ports', type=int, default=3, help='Open ports per host (default: 3)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='fake nmap hosts per second for the scan stage, 0 for unthrottled')
+    parser.add_argument('--stages', default='parse,scan,write',
+                        help='Comma separated stages to run (default: parse,scan,write)')
+    parser.add_argument('--formats', default=','.join(OUTPUT_FORMATS),
+                        help='Writer formats to benchmark (default: all)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    results = {}
+
+    if 'parse' in stages:
+        results['parse'] = run_isolated(bench_parse, args.hosts, args.ports, args.rate)
+    if 'scan' in stages:
+        results['scan'] = run_isolated(bench_scan, args.hosts, args.ports, args.rate)
+    if 'write' in stages:
+        for fmt in args.formats.split(','):
+            try:
+                check_format(fmt)
+            except ImportError as e:
+                print(f"Skipping {fmt}: {e}")
+                continue
+            results[f"write:{fmt}"] = run_isolated(bench_write, args.hosts, args.ports, args.rate, fmt)
+
+    print(f"{args.hosts} hosts x {args.ports} open ports")
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'hosts': args.hosts, 'ports': args.ports, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
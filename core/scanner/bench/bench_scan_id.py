@@ -0,0 +1,75 @@
+"""
+Compare scan ID generation cost and CSV footprint against the old
+RSA-key based IDs.
+
+Usage (from core/scanner):
+    python bench/bench_scan_id.py [--rows 1000] [--iterations 10000]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.ids import generate_scan_id
+from utils.parser import FIELDNAMES
+
+
+def csv_size(scan_id: str, rows: int) -> int:
+    """Size in bytes of a CSV holding `rows` identical sample rows"""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    row = {
+        'timestamp': '2025-07-06T18:10:23.850534',
+        'scan_id': scan_id,
+        'target_ip': '192.168.1.10',
+        'hostname': 'host.local',
+        'port': '22',
+        'protocol': 'tcp',
+        'service': 'ssh',
+        'version': '8.9p1 Ubuntu 3ubuntu0.10',
+        'product': 'OpenSSH',
+        'os_guess': 'Linux 5.0 - 5.14'
+    }
+    for _ in range(rows):
+        writer.writerow(row)
+    return len(buf.getvalue().encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan ID benchmark")
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=10000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        new_id = generate_scan_id()
+    per_id = (time.perf_counter() - start) / args.iterations
+    new_size = csv_size(new_id, args.rows)
+
+    print(f"generate_scan_id: {per_id * 1e6:.2f} us/id")
+    print(f"  CSV size for {args.rows} rows: {new_size / 1024:.1f} KiB")
+
+    try:
+        from sshkey_tools.keys import RsaPrivateKey
+    except ImportError:
+        print("sshkey_tools not installed, skipping RSA comparison")
+        return
+
+    start = time.perf_counter()
+    old_id = RsaPrivateKey.generate().to_string()
+    rsa_time = time.perf_counter() - start
+    old_size = csv_size(old_id, args.rows)
+
+    print(f"RsaPrivateKey.generate: {rsa_time * 1000:.1f} ms/id")
+    print(f"  CSV size for {args.rows} rows: {old_size / 1024:.1f} KiB")
+    print(f"Speedup: {rsa_time / per_id:,.0f}x, size ratio: {old_size / new_size:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark for --target-file / --exclude-file preparation (utils/targets.py).
+
+Writes a synthetic target list of random IPv4 addresses mixed with some
+CIDRs and ranges, plus an exclusion list, then times loading, collapsing,
+excluding and rendering the set into nmap batches and shards.
+
+Usage (from core/scanner):
+    python bench/bench_targets.py [--entries 1000000] [--networks 1000] [--excludes 10000]
+"""
+import argparse
+import os
+import random
+import socket
+import struct
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from utils.targets import TargetSet
+
+
+def address(rng: random.Random) -> str:
+    return socket.inet_ntoa(struct.pack('!I', rng.getrandbits(32)))
+
+
+def write_list(path: str, entries: int, networks: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("# synthetic target list\n")
+        for i in range(entries):
+            if i % max(1, entries // max(1, networks)) == 0:
+                f.write(f"{address(rng)}/{rng.randint(16, 30)}\n")
+            else:
+                f.write(address(rng) + "\n")
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<36} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Target list benchmark")
+    parser.add_argument('--entries', type=int, default=1000000)
+    parser.add_argument('--networks', type=int, default=1000)
+    parser.add_argument('--excludes', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        targets_path = os.path.join(tmp, 'targets.txt')
+        exclude_path = os.path.join(tmp, 'exclude.txt')
+        timed(f"generate {args.entries} entries", lambda: write_list(targets_path, args.entries, args.networks, 1))
+        write_list(exclude_path, args.excludes, args.excludes // 100, 2)
+
+        def prepare():
+            targets = TargetSet().add_file(targets_path)
+            targets.exclude(TargetSet().add_file(exclude_path))
+            targets.num_addresses
+            return targets
+
+        targets = timed("load + collapse + exclude", prepare)
+        print(f"{'':<36} {targets.summary()}")
+        timed("first 65536-address batch", lambda: next(targets.batches(65536)))
+        shards = timed("split into 16 shards", lambda: targets.split(16))
+        print(f"{'':<36} {sum(len(s) for s in shards)} nmap arguments")
+
+
+if __name__ == "__main__":
+    main()
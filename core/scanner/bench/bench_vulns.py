@@ -0,0 +1,112 @@
+"""
+Benchmark for the offline CVE index (modules/vulndb.py) on a synthetic
+NVD 1.1 feed, so it runs without downloading the real feeds.
+
+Reports the time to compile the feed, to load the cached index and to
+annotate rows built from bench/fake_nmap.py's service mix, once with
+the memo warm and once with every row a distinct version.
+
+Usage (from core/scanner):
+    python bench/bench_vulns.py [--cves 200000] [--products 2000] [--rows 100000]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+import fake_nmap
+from modules.vulndb import VulnIndex
+from utils.records import Host, Port, Result
+
+SEVERITIES = [(3.1, 'LOW'), (5.3, 'MEDIUM'), (7.5, 'HIGH'), (9.8, 'CRITICAL')]
+
+# CPE names for fake_nmap's products, so annotated rows actually match
+KNOWN_PRODUCTS = [
+    ('openbsd', 'openssh'), ('f5', 'nginx'), ('oracle', 'mysql'), ('postgresql', 'postgresql'),
+    ('redis', 'redis'), ('apache', 'tomcat'), ('beasts', 'vsftpd'), ('isc', 'bind')
+]
+
+
+def cve_item(number: int, vendor: str, product: str, rng: random.Random) -> dict:
+    major, minor = rng.randint(0, 20), rng.randint(0, 20)
+    if rng.random() < 0.7:
+        match = {
+            'vulnerable': True,
+            'cpe23Uri': f"cpe:2.3:a:{vendor}:{product}:*:*:*:*:*:*:*:*",
+            'versionStartIncluding': f"{major}.0",
+            'versionEndExcluding': f"{major}.{minor}.{rng.randint(0, 30)}"
+        }
+    else:
+        match = {
+            'vulnerable': True,
+            'cpe23Uri': f"cpe:2.3:a:{vendor}:{product}:{major}.{minor}.{rng.randint(0, 30)}:*:*:*:*:*:*:*"
+        }
+    score, severity = rng.choice(SEVERITIES)
+    return {
+        'cve': {'CVE_data_meta': {'ID': f"CVE-2020-{number:05d}"}},
+        'configurations': {'nodes': [{'operator': 'OR', 'children': [], 'cpe_match': [match]}]},
+        'impact': {'baseMetricV3': {'cvssV3': {'baseScore': score, 'baseSeverity': severity}}}
+    }
+
+
+def write_feed(path: str, cves: int, products: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    names = KNOWN_PRODUCTS + [(f"vendor{i}", f"product{i}") for i in range(products)]
+    items = [cve_item(n, *rng.choice(names), rng) for n in range(cves)]
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump({'CVE_data_type': 'CVE', 'CVE_Items': items}, f)
+
+
+def make_rows(count: int, distinct_versions: bool):
+    rows = []
+    services = fake_nmap.SERVICES
+    for i in range(count):
+        port, service, product, version = services[i % len(services)]
+        if distinct_versions:
+            version = f"{i % 20}.{i % 23}.{i % 31}"
+        host = Host(ip=f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", state='up')
+        rows.append(Result('', 'bench', host, Port(str(port), 'tcp', 'open', service, version, product)))
+    return rows
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<36} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CVE index benchmark")
+    parser.add_argument('--cves', type=int, default=200000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        feed = os.path.join(tmp, 'nvdcve-1.1-bench.json.gz')
+        cache = os.path.join(tmp, 'index.pickle')
+        timed(f"generate {args.cves} CVEs", lambda: write_feed(feed, args.cves, args.products))
+
+        index = timed("compile + cache", lambda: VulnIndex.load([feed], cache))
+        print(f"{'':<36} {len(index)} CVEs, {len(index.products)} products, "
+              f"{os.path.getsize(cache) / 1024 / 1024:.1f} MiB cache")
+        timed("load cached", lambda: VulnIndex.load([feed], cache))
+
+        for label, distinct in (('repeated versions', False), ('distinct versions', True)):
+            rows = make_rows(args.rows, distinct)
+            index = VulnIndex.load([feed], cache)
+            matched = timed(f"annotate {args.rows} ({label})",
+                            lambda: sum(1 for row in index.annotate(rows) if row.get('cves')))
+            print(f"{'':<36} {matched} rows with CVEs")
+
+
+if __name__ == "__main__":
+    main()
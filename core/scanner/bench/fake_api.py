@@ -0,0 +1,118 @@
+"""
+Local stand-in for the SPECTRE API's batched upload routes, for exercising
+`cli.py upload` without the real server or a database.
+
+Accepts POST /api/scans/{scan_id}/batches (gzip JSON Lines) and
+POST /api/scans/{scan_id}/complete, dedupes on Idempotency-Key like the
+real route, and can inject failures and latency to exercise retries.
+
+Usage (from core/scanner):
+    python bench/fake_api.py [--port 4000] [--fail-rate 0.2] [--latency 0.05]
+    python src/cli.py upload scan.csv.gz --url http://localhost:4000
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_PATH = re.compile(r'^/api/scans/([^/]+)/(batches|complete)$')
+
+
+class UploadState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = {}
+        self.scans = {}
+        self.connections = set()
+        self.requests = 0
+        self.failures = 0
+
+
+def make_handler(state: UploadState, fail_rate: float, latency: float, quiet: bool):
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real server behind Express
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            if not quiet:
+                super().log_message(format, *args)
+
+        def _reply(self, status: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with state.lock:
+                state.requests += 1
+                state.connections.add(self.client_address)
+
+            match = BATCH_PATH.match(self.path)
+            if not match:
+                return self._reply(404, {'error': 'Not found'})
+            if latency:
+                time.sleep(latency)
+            if random.random() < fail_rate:
+                with state.lock:
+                    state.failures += 1
+                return self._reply(503, {'error': 'Injected failure'}, {'Retry-After': '0'})
+
+            scan_id, action = match.groups()
+            key = self.headers.get('Idempotency-Key')
+            with state.lock:
+                if key and key in state.keys:
+                    return self._reply(200, dict(state.keys[key], duplicate=True))
+
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+
+            with state.lock:
+                scan = state.scans.setdefault(scan_id, {'rows': 0, 'batches': 0, 'complete': None})
+                if action == 'batches':
+                    rows = [json.loads(line) for line in body.decode('utf-8').splitlines() if line]
+                    scan['rows'] += len(rows)
+                    scan['batches'] += 1
+                    result = {'scan_id': scan_id, 'batch': self.headers.get('X-Batch-Index'), 'rows': len(rows)}
+                else:
+                    scan['complete'] = json.loads(body)
+                    result = {'scan_id': scan_id, 'rows': scan['rows'], 'batches': scan['batches']}
+                    print(f"[fake_api] scan {scan_id} complete: {scan['rows']} rows in {scan['batches']} "
+                          f"batches over {len(state.connections)} connections, "
+                          f"{state.failures} injected failures, {state.requests} requests")
+                if key:
+                    state.keys[key] = result
+            self._reply(202 if action == 'batches' else 200, result)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in upload API")
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--fail-rate', type=float, default=0, help='Fraction of requests answered with 503')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every request')
+    parser.add_argument('--quiet', action='store_true', help='Skip per-request logging')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port),
+                                 make_handler(UploadState(), args.fail_rate, args.latency, args.quiet))
+    print(f"[fake_api] listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Stand-in for nmap that prints -oX XML without touching the network.
+
+Accepts the same command line the scanner builds (sudo-less), expands the
+targets after `-oX -` (or listed in an -iL file) and emits one <host> per
+address, honouring --exclude and --excludefile. With --stats-every in the
+arguments it also emits <taskbegin>/<taskprogress>/<taskend> lines like a
+real scan.
+
+Behaviour is controlled through the environment so the scanner's own
+nmap arguments pass through untouched:
+
+    FAKE_NMAP_HOSTS    stop after this many hosts (default: every address)
+    FAKE_NMAP_PORTS    open ports per host (default: 3)
+    FAKE_NMAP_RATE     hosts per second, 0 for as fast as possible (default: 0)
+    FAKE_NMAP_REPLAY   replay a recorded -oX file instead of generating hosts
+    FAKE_NMAP_CAPACITY simulated link capacity in packets per second: hosts
+                       are paced at min(--max-rate, capacity) / 10 per second
+                       and a --max-rate above it inflates srtt and prints
+                       nmap's dropped-probe warnings on stderr
+
+Usage:
+    SPECTRE_NMAP=bench/fake_nmap.py python src/cli.py scan --no-sudo -t 10.0.0.0/24
+    FAKE_NMAP_HOSTS=1000 python bench/fake_nmap.py -oX - 10.0.0.0/16 > sample.xml
+"""
+import ipaddress
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional
+
+# (port, service, product, version) cycled through for synthetic hosts
+SERVICES = [
+    (22, 'ssh', 'OpenSSH', '8.9p1 Ubuntu 3ubuntu0.10'),
+    (80, 'http', 'nginx', '1.18.0'),
+    (443, 'https', 'nginx', '1.18.0'),
+    (3306, 'mysql', 'MySQL', '8.0.36'),
+    (5432, 'postgresql', 'PostgreSQL DB', '14.11'),
+    (6379, 'redis', 'Redis key-value store', '7.2.4'),
+    (8080, 'http-proxy', 'Apache Tomcat', '9.0.85'),
+    (21, 'ftp', 'vsftpd', '3.0.5'),
+    (25, 'smtp', 'Postfix smtpd', ''),
+    (53, 'domain', 'ISC BIND', '9.18.18')
+]
+
+OS_GUESSES = ['Linux 5.0 - 5.14', 'Linux 4.15 - 5.8', 'Microsoft Windows Server 2019', '']
+
+HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+          '<!DOCTYPE nmaprun>\n'
+          '<nmaprun scanner="nmap" args="fake_nmap" start="{start}" version="7.94" xmloutputversion="1.05">\n'
+          '<scaninfo type="syn" protocol="tcp" numservices="1000" services="1-1000"/>\n')
+
+
+# Smoothed RTT in microseconds reported for every host on an idle link
+BASE_SRTT = 2000
+
+# Simulated packets sent per host, turns a packet rate into a host rate
+PACKETS_PER_HOST = 10
+
+
+def host_xml(index: int, ip: str, ports: int = 3, srtt: int = BASE_SRTT) -> str:
+    """One synthetic <host> element, deterministic for a given index"""
+    lines = [f'<host starttime="0" endtime="0"><status state="up" reason="syn-ack"/>'
+             f'<address addr="{ip}" addrtype="ipv4"/>']
+    if index % 4 == 0:
+        lines.append(f'<hostnames><hostname name="host-{index}.example.internal" type="PTR"/></hostnames>')
+    lines.append('<ports>')
+    for n in range(ports):
+        port, service, product, version = SERVICES[(index + n) % len(SERVICES)]
+        lines.append(f'<port protocol="tcp" portid="{port}"><state state="open" reason="syn-ack"/>'
+                     f'<service name="{service}" product="{product}" version="{version}" method="probed" conf="10"/>'
+                     f'</port>')
+    lines.append('</ports>')
+    lines.append(f'<times srtt="{srtt}" rttvar="{srtt // 4}" to="{srtt * 2}"/>')
+    os_guess = OS_GUESSES[index % len(OS_GUESSES)]
+    if os_guess:
+        lines.append(f'<os><osmatch name="{os_guess}" accuracy="95"/></os>')
+    lines.append('</host>\n')
+    return ''.join(lines)
+
+
+def iter_addresses(targets: Iterable[str], exclude: Iterable[str] = ()) -> Iterator[str]:
+    excluded = set(exclude)
+    for target in targets:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            # Hostnames scan as a single placeholder address
+            network = ipaddress.ip_network('192.0.2.1')
+        for address in (network if network.num_addresses > 1 else [network.network_address]):
+            ip = str(address)
+            if ip not in excluded:
+                yield ip
+
+
+def generate_xml(targets: Iterable[str], hosts: Optional[int] = None, ports: int = 3,
+                 rate: float = 0, stats: bool = True, exclude: Iterable[str] = (),
+                 srtt: int = BASE_SRTT) -> Iterator[str]:
+    """
+    Yield nmap -oX output for the targets in chunks as a scan would print it.
+
+    Args:
+        targets: CIDRs or addresses to report
+        hosts: Stop after this many hosts
+        ports: Open ports per host
+        rate: Hosts per second, 0 for unthrottled
+        stats: Include <taskprogress> events (nmap --stats-every)
+        exclude: Addresses to skip
+        srtt: Smoothed RTT reported per host, in microseconds
+    """
+    start = time.time()
+    yield HEADER.format(start=int(start))
+
+    targets = list(targets)
+    total = sum(ipaddress.ip_network(t, strict=False).num_addresses
+                if _is_network(t) else 1 for t in targets)
+    if hosts is not None:
+        total = min(total, hosts)
+    step = max(1, total // 100)
+
+    if stats:
+        yield f'<taskbegin task="SYN Stealth Scan" time="{int(start)}"/>\n'
+
+    count = 0
+    for index, ip in enumerate(iter_addresses(targets, exclude)):
+        if hosts is not None and index >= hosts:
+            break
+        if rate:
+            # Sleep until this host is due so the average rate holds
+            delay = start + index / rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        if stats and index % step == 0 and index:
+            percent = 100.0 * index / total
+            elapsed = time.time() - start
+            remaining = int(elapsed * (total - index) / index)
+            yield (f'<taskprogress task="SYN Stealth Scan" time="{int(time.time())}" '
+                   f'percent="{percent:.2f}" remaining="{remaining}" etc="{int(time.time()) + remaining}"/>\n')
+        yield host_xml(index, ip, ports, srtt)
+        count += 1
+
+    if stats:
+        yield f'<taskend task="SYN Stealth Scan" time="{int(time.time())}"/>\n'
+    yield (f'<runstats><finished time="{int(time.time())}" elapsed="{time.time() - start:.2f}" exit="success"/>'
+           f'<hosts up="{count}" down="0" total="{count}"/></runstats>\n</nmaprun>\n')
+
+
+def replay_xml(path: str, rate: float = 0) -> Iterator[str]:
+    """Yield a recorded -oX file line by line, pacing each </host> to `rate`"""
+    start = time.time()
+    count = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if rate and '</host>' in line:
+                delay = start + count / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                count += 1
+            yield line
+
+
+def _is_network(target: str) -> bool:
+    try:
+        ipaddress.ip_network(target, strict=False)
+        return True
+    except ValueError:
+        return False
+
+
+def _option(args: List[str], name: str) -> Optional[str]:
+    if name in args:
+        i = args.index(name)
+        if i + 1 < len(args):
+            return args[i + 1]
+    return None
+
+
+def main(args: List[str]) -> int:
+    if '-oX' not in args:
+        print("fake_nmap: only -oX output is supported", file=sys.stderr)
+        return 1
+
+    rate = float(os.environ.get('FAKE_NMAP_RATE', 0) or 0)
+    replay = os.environ.get('FAKE_NMAP_REPLAY')
+    if replay:
+        chunks = replay_xml(replay, rate)
+    else:
+        hosts = os.environ.get('FAKE_NMAP_HOSTS')
+        exclude = _option(args, '--exclude')
+        exclude = exclude.split(',') if exclude else []
+        exclude_file = _option(args, '--excludefile')
+        if exclude_file:
+            with open(exclude_file, encoding='utf-8') as f:
+                exclude += f.read().split()
+        srtt = BASE_SRTT
+        capacity = float(os.environ.get('FAKE_NMAP_CAPACITY', 0) or 0)
+        if capacity:
+            max_rate = float(_option(args, '--max-rate') or capacity)
+            if not rate:
+                rate = min(max_rate, capacity) / PACKETS_PER_HOST
+            if max_rate > capacity:
+                # Queues build up past capacity, RTT grows and probes drop
+                srtt = int(BASE_SRTT * (1 + 4 * (max_rate / capacity - 1)))
+                dropped = int(100 * (1 - capacity / max_rate))
+                print(f"Increasing send delay for 192.0.2.1 from 0 to 5 due to {dropped} out of 100 "
+                      f"dropped probes since last increase.", file=sys.stderr)
+        targets = args[args.index('-oX') + 2:]
+        input_file = _option(args, '-iL')
+        if input_file:
+            with open(input_file, encoding='utf-8') as f:
+                targets = f.read().split()
+        chunks = generate_xml(
+            targets,
+            hosts=int(hosts) if hosts else None,
+            ports=int(os.environ.get('FAKE_NMAP_PORTS', 3)),
+            rate=rate,
+            stats='--stats-every' in args,
+            exclude=exclude,
+            srtt=srtt
+        )
+
+    out = sys.stdout
+    for chunk in chunks:
+        out.write(chunk)
+        if rate:
+            # Paced output should reach the reader as it's produced
+            out.flush()
+    out.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except (BrokenPipeError, KeyboardInterrupt):
+        # The scanner stopped reading (deadline or cancel)
+        sys.exit(1)
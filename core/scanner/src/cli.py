@@ -3,16 +3,352 @@ from utils import str
 import sys
 import os
 from datetime import datetime
-from colorama import init, Fore, Style
-from utils.thread import timeout_with_process, timeout
-import time
-import json
+from utils.formats import OUTPUT_FORMATS, check_format
+
+# Startup matters for --help and cron runs: colorama, the scanner modules
+# and the output writers are imported only once a command actually runs.
+
+# Scan options saved in checkpoints and restored by --resume
+CHECKPOINT_SETTINGS = [
+    'target', 'output', 'format', 'ports', 'timeout', 'rate', 'min_rate',
+    'host_timeout', 'timing', 'workers', 'verbose', 'quiet', 'nmap_path', 'no_sudo',
+    'cve_feed', 'cve_cache', 'target_file', 'exclude_file', 'adaptive_rate'
+]
+
+def print_resume_hint(journal):
+    """Tell the user how to pick up an unfinished checkpointed scan"""
+    from colorama import Fore, Style
+    if journal is not None and journal.exists():
+        scan_id = journal.header.get('scan_id')
+        print(f"Progress saved. Resume with: {Fore.YELLOW}spectre-scanner scan --resume {scan_id}{Style.RESET_ALL}")
+
+def save_profile(path, scanner, profiler=None):
+    """Write the --profile output: a cProfile dump or Prometheus stage metrics"""
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"[PROFILE] cProfile stats saved to {path}")
+    else:
+        scanner.metrics.write_prometheus(path, labels={'scan_id': scanner.scan_id})
+        print(f"[PROFILE] Stage metrics saved to {path}")
+
+def upload(args, Fore, Style):
+    """Stream a saved results file to the API in batches"""
+    from utils.parser import iter_results, read_metadata, results_format
+    from utils.upload import BatchUploader, UploadError
+
+    if not os.path.exists(args.file):
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} No such file: {args.file}")
+        sys.exit(1)
+    try:
+        results_format(args.file)
+    except ValueError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+        sys.exit(1)
+
+    # Metadata sits in the sidecar, or inside the document for json
+    metadata = read_metadata(args.file)
+
+    rows = iter_results(args.file)
+    scan_id = args.scan_id or metadata.get('scan_id')
+    if not scan_id:
+        # Fall back to the rows themselves
+        first = next(rows, None)
+        scan_id = first.get('scan_id') if first else None
+        if first is not None:
+            import itertools
+            rows = itertools.chain([first], rows)
+    if not scan_id:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} No scan ID found, pass --scan-id")
+        sys.exit(1)
+
+    uploader = BatchUploader(args.url, batch_size=args.batch_size, concurrency=args.concurrency,
+                             retries=args.retries, timeout=args.timeout, token=args.token,
+                             verbose=args.verbose)
+    print(f"[UPLOAD] Uploading scan {scan_id} from {args.file} to {args.url}")
+    try:
+        uploader.upload(scan_id, rows, metadata)
+    except UploadError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Upload failed after {uploader.batches_sent} batches: {e}")
+        print("Rerunning the same upload is safe, delivered batches are skipped by the server")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print(f"\n{Fore.YELLOW}[INTERRUPTED]{Style.RESET_ALL} Upload cancelled after {uploader.batches_sent} batches")
+        sys.exit(0)
+
+    print(f"[UPLOAD] Sent {uploader.rows_sent} rows in {uploader.batches_sent} batches "
+          f"({uploader.bytes_sent / 1024:.1f} KiB compressed"
+          + (f", {uploader.duplicates} already uploaded" if uploader.duplicates else "") + ")")
+
+def query(args, Fore, Style):
+    """Look services up across every indexed scan"""
+    import csv
+    import json
+    import sqlite3
+    from utils.scan_index import ScanIndex, QUERY_COLUMNS
+
+    try:
+        index = ScanIndex(args.index_path)
+    except (sqlite3.Error, OSError) as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot open scan index {args.index_path}: {e}")
+        sys.exit(1)
+
+    if args.add:
+        from utils.parser import iter_results, read_metadata
+        for path in args.add:
+            try:
+                rows = index.add_rows(iter_results(path), read_metadata(path), path)
+            except (OSError, ValueError, ImportError) as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot index {path}: {e}")
+                continue
+            print(f"[INDEX] Indexed {rows} rows from {path}")
+        return
+
+    if args.scans:
+        for scan in index.scans():
+            print(f"{scan['scan_id']}  {scan['start_time'] or '':<26}  {scan['rows']:>8} rows  "
+                  f"{scan['target'] or ''}  {scan['path'] or ''}")
+        return
+
+    try:
+        rows = index.query(
+            port=args.port, protocol=args.protocol, service=args.service, product=args.product,
+            version=args.version, ip=args.ip, since=args.since, until=args.until,
+            scan_id=args.scan_id, change=args.change, latest=args.latest, limit=args.limit
+        )
+        if args.count:
+            print(sum(1 for _ in rows))
+        elif args.format == 'json':
+            for row in rows:
+                print(json.dumps(row, ensure_ascii=False))
+        elif args.format == 'csv':
+            writer = csv.DictWriter(sys.stdout, fieldnames=QUERY_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                service = ' '.join(v for v in (row['product'], row['version']) if v) or row['service'] or ''
+                change = f"  [{row['change']}]" if row['change'] else ''
+                print(f"{(row['seen_at'] or '')[:19]}  {row['target_ip']:<15} {row['port']:>5}/{row['protocol']:<4} "
+                      f"{row['service'] or '':<12} {service}{change}")
+    except ValueError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+        sys.exit(1)
+    finally:
+        index.close()
+
+def serve(args, Fore, Style):
+    """Run the resident scan daemon over a job queue"""
+    import signal
+    import sqlite3
+    from core.daemon import ScanDaemon, DEFAULT_JOBS_DIR
+    from utils.helpers import check_dependencies
+    from utils.job_queue import JobQueue, DEFAULT_QUEUE_PATH
+
+    try:
+        check_format(args.format)
+    except ImportError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+        sys.exit(1)
+    if not check_dependencies():
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} nmap is not installed. Please install it first.")
+        sys.exit(1)
+
+    # Loaded once and shared by every job
+    vuln_index = None
+    if args.cve_feed:
+        from modules.vulndb import VulnIndex, DEFAULT_INDEX_CACHE
+        try:
+            vuln_index = VulnIndex.load(args.cve_feed, args.cve_cache or DEFAULT_INDEX_CACHE)
+        except (OSError, ValueError) as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot load CVE feed: {e}")
+            sys.exit(1)
+        print(f"[VULNS] {len(vuln_index)} CVEs indexed across {len(vuln_index.products)} products")
+
+    index_path = None
+    if not args.no_index:
+        from utils.scan_index import DEFAULT_INDEX_PATH
+        index_path = args.index_path or DEFAULT_INDEX_PATH
+
+    try:
+        queue = JobQueue(args.queue or DEFAULT_QUEUE_PATH)
+    except (sqlite3.Error, OSError) as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot open job queue: {e}")
+        sys.exit(1)
+
+    daemon = ScanDaemon(
+        queue,
+        slots=args.workers,
+        settings=dict(
+            ports=args.ports,
+            timeout=args.timeout,
+            rate=args.rate,
+            min_rate=args.min_rate,
+            host_timeout=args.host_timeout,
+            timing=args.timing,
+            format=args.format,
+            nmap_path=args.nmap_path,
+            # Already root, nothing to gain from sudo per job
+            sudo=not args.no_sudo and os.geteuid() != 0
+        ),
+        output_dir=args.output_dir or DEFAULT_JOBS_DIR,
+        vuln_index=vuln_index,
+        index_path=index_path,
+        verbose=args.verbose
+    )
+
+    def shutdown(signum, frame):
+        print(f"\n{Fore.YELLOW}[INTERRUPTED]{Style.RESET_ALL} Finishing running jobs, no new ones are started")
+        daemon.stop()
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        daemon.serve(exit_when_idle=args.exit_when_idle)
+    finally:
+        queue.close()
+
+def submit(args, Fore, Style):
+    """Queue scans for the daemon"""
+    import sqlite3
+    from modules.nmap_command import port_args
+    from utils.job_queue import JobQueue, DEFAULT_QUEUE_PATH, job_output_name
+
+    if not args.target and not args.target_file:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --target or --target-file is required")
+        sys.exit(1)
+
+    targets = [args.target] if args.target else []
+    for path in args.target_file or []:
+        try:
+            with (sys.stdin if path == '-' else open(path)) as f:
+                lines = [line.split('#', 1)[0].strip() for line in f]
+        except OSError as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot read target list: {e}")
+            sys.exit(1)
+        targets.extend(line for line in lines if line)
+
+    invalid = [target for target in targets if not str.validate_target(target)]
+    if invalid:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Invalid target: {invalid[0]}"
+              + (f" (and {len(invalid) - 1} more)" if len(invalid) > 1 else ""))
+        sys.exit(1)
+    if not targets:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} No targets to submit")
+        sys.exit(1)
+
+    # Only what was given, the daemon's own settings fill in the rest
+    options = {key: value for key, value in (
+        ('ports', args.ports), ('timeout', args.timeout), ('rate', args.rate), ('min_rate', args.min_rate),
+        ('host_timeout', args.host_timeout), ('timing', args.timing), ('format', args.format),
+        ('output', args.output)
+    ) if value is not None}
+    if args.two_phase:
+        options['two_phase'] = True
+    try:
+        job_output_name(options.get('output'))
+        if 'ports' in options:
+            port_args(options['ports'])
+        if 'format' in options:
+            check_format(options['format'])
+    except (ValueError, ImportError) as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+        sys.exit(1)
+
+    # One job per entry, or a single job over the whole list
+    if not args.each:
+        targets = [' '.join(targets)]
+    try:
+        with JobQueue(args.queue or DEFAULT_QUEUE_PATH) as queue:
+            ids = queue.submit_many(targets, options, priority=args.priority, concurrency=args.concurrency)
+    except (sqlite3.Error, OSError) as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot queue scan: {e}")
+        sys.exit(1)
+
+    if len(ids) == 1:
+        print(f"[JOBS] Queued job {ids[0]}")
+    else:
+        print(f"[JOBS] Queued {len(ids)} jobs, {ids[0]} to {ids[-1]}")
+
+def jobs(args, Fore, Style):
+    """Inspect, cancel or fetch the results of queued scans"""
+    import json
+    import shutil
+    import sqlite3
+    from utils.job_queue import JobQueue, DEFAULT_QUEUE_PATH
+
+    try:
+        queue = JobQueue(args.queue or DEFAULT_QUEUE_PATH)
+    except (sqlite3.Error, OSError) as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot open job queue: {e}")
+        sys.exit(1)
+
+    with queue:
+        if args.action == 'counts':
+            print(json.dumps(queue.counts()))
+            return
+
+        if args.action == 'list':
+            for job in queue.jobs(args.status, args.limit):
+                counts = f"{job.services} services on {job.hosts} hosts" if job.hosts is not None else ''
+                print(f"{job.id:>6}  {job.status:<9} p{job.priority:<3} {job.submitted_at[:19]}  "
+                      f"{job.target[:40]:<40}  {counts}")
+            return
+
+        if args.job_id is None:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} jobs {args.action} needs a job ID")
+            sys.exit(1)
+        job = queue.get(args.job_id)
+        if job is None:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} No such job: {args.job_id}")
+            sys.exit(1)
+
+        if args.action == 'show':
+            print(json.dumps(job.as_dict(), indent=2))
+        elif args.action == 'cancel':
+            status = queue.cancel(job.id)
+            if status == 'running':
+                print(f"[JOBS] Job {job.id} will stop at the daemon's next check")
+            else:
+                print(f"[JOBS] Job {job.id} is {status}")
+        elif args.action == 'result':
+            if job.status != 'done':
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Job {job.id} is {job.status}"
+                      + (f": {job.error}" if job.error else ""))
+                sys.exit(1)
+            try:
+                with open(job.output, 'rb') as f:
+                    shutil.copyfileobj(f, sys.stdout.buffer)
+            except OSError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot read results of job {job.id}: {e}")
+                sys.exit(1)
+
+def worker(args, Fore, Style):
+    """Serve a coordinator's leases until stopped"""
+    import signal
+    from core.cluster import ScanWorker
+    from utils.helpers import check_dependencies
+
+    if not check_dependencies():
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} nmap is not installed. Please install it first.")
+        sys.exit(1)
+    try:
+        node = ScanWorker(args.coordinator, slots=args.slots, token=args.token, name=args.name,
+                          nmap_path=args.nmap_path, sudo=not args.no_sudo and os.geteuid() != 0,
+                          verbose=args.verbose, once=args.once)
+    except ValueError as e:
+        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+        sys.exit(1)
+
+    def shutdown(signum, frame):
+        print(f"\n{Fore.YELLOW}[INTERRUPTED]{Style.RESET_ALL} Handing running leases back to the coordinator")
+        node.stop()
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    node.run()
 
 def main():
 
-    # ASCII banner
-    str.print_banner()
-    
     parser = argparse.ArgumentParser(
         prog="spectre-scanner",
         description="Scanner tool for SPECTRE, which collects network diagnostics for vulnerability analysis.",
@@ -26,9 +362,26 @@ def main():
     
     parser_scan.add_argument(
         '-t', '--target',
-        required=True,
+        default=None,
         help="Target to scan (IP/CIDR/hostname). Examples: 192.168.1.1, 192.168.1.0/24, scanme.nmap.org"
     )
+
+    parser_scan.add_argument(
+        '--target-file',
+        action='append',
+        default=None,
+        metavar='FILE',
+        help="Read targets from a file, one or more IPs/CIDRs/ranges/hostnames per line, # comments allowed, "
+             "- for stdin. Repeatable and combined with --target"
+    )
+
+    parser_scan.add_argument(
+        '--exclude-file',
+        action='append',
+        default=None,
+        metavar='FILE',
+        help="Skip every address, range or hostname listed in a file (same format as --target-file). Repeatable"
+    )
     
     parser_scan.add_argument(
         '-o', '--output',
@@ -38,9 +391,10 @@ def main():
     
     parser_scan.add_argument(
         '-f', '--format',
-        choices=['csv', 'json'],
+        choices=list(OUTPUT_FORMATS),
         default='csv',
-        help="Output format (default: csv)"
+        help="Output format (default: csv). Everything but json is written while the scan runs; "
+             "csv.zst needs zstandard and parquet needs pyarrow"
     )
     
     parser_scan.add_argument(
@@ -53,7 +407,22 @@ def main():
         '--timeout',
         type=int,
         default=300,
-        help='Scan timeout in seconds (default: 300)'
+        help='Overall scan deadline in seconds, nmap is stopped when it passes (default: 300, 0 disables)'
+    )
+
+    parser_scan.add_argument(
+        '--host-timeout',
+        type=int,
+        default=None,
+        help='Give up on a single host after this many seconds'
+    )
+
+    parser_scan.add_argument(
+        '-T', '--timing',
+        type=int,
+        choices=range(0, 6),
+        default=None,
+        help='nmap timing template, 0 (paranoid) to 5 (insane)'
     )
 
     parser_scan.add_argument(
@@ -62,6 +431,12 @@ def main():
         help="Enable verbose output"
     )
     
+    parser_scan.add_argument(
+        '-q', '--quiet',
+        action='store_true',
+        help='No progress display (implied when stderr is not a terminal)'
+    )
+    
     parser_scan.add_argument(
         '--rate',
         type=int,
@@ -69,71 +444,642 @@ def main():
         help='Packets per second rate limit (default: 1000)'
     )
 
+    parser_scan.add_argument(
+        '--min-rate',
+        type=int,
+        default=None,
+        help='Minimum packets per second nmap should sustain'
+    )
+
+    parser_scan.add_argument(
+        '--adaptive-rate',
+        default=None,
+        metavar='MIN:MAX',
+        help='Adapt the packet rate between MIN and MAX pps from nmap\'s RTT, drop and completion feedback, '
+             'starting at --rate. Later shards/batches also adapt parallelism up to --workers '
+             '(overrides --min-rate)'
+    )
+
+    parser_scan.add_argument(
+        '--nmap-path',
+        default=None,
+        help='nmap executable to run (default: $SPECTRE_NMAP or nmap on PATH)'
+    )
+
+    parser_scan.add_argument(
+        '--no-sudo',
+        action='store_true',
+        help='Run nmap directly instead of through sudo'
+    )
+
+    parser_scan.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Parallel nmap processes; the target is split into shards across them (default: 1)'
+    )
+
+    parser_scan.add_argument(
+        '--two-phase',
+        action='store_true',
+        help='Discover live hosts with a fast SYN sweep first, then run version/OS detection only on their open ports'
+    )
+
+    parser_scan.add_argument(
+        '--connect',
+        action='store_true',
+        help='Find open TCP ports with a built-in asyncio connect() sweep instead of nmap: no root or nmap '
+             'needed, --rate caps connects per second. With --two-phase it is the discovery phase '
+             'and nmap probes only the open ports it found'
+    )
+
+    parser_scan.add_argument(
+        '--connect-concurrency',
+        type=int,
+        default=None,
+        help='Connects in flight at once for --connect, capped by the open file limit (default: 1000)'
+    )
+
+    parser_scan.add_argument(
+        '--connect-timeout',
+        type=float,
+        default=None,
+        help='Seconds before an unanswered --connect attempt is retried once, then counted filtered (default: 1)'
+    )
+
+    parser_scan.add_argument(
+        '--host-rate',
+        type=float,
+        default=None,
+        help='Most --connect attempts per second against any single host'
+    )
+
+    parser_scan.add_argument(
+        '--coordinator',
+        metavar='[HOST:]PORT',
+        default=None,
+        help='Distribute the scan: listen here and hand slices of the target to `worker` nodes '
+             'instead of running nmap locally. --rate applies to each worker slot'
+    )
+
+    parser_scan.add_argument(
+        '--leases',
+        type=int,
+        default=None,
+        help='Slices the target is cut into for --coordinator (default: 64)'
+    )
+
+    parser_scan.add_argument(
+        '--lease-ttl',
+        type=float,
+        default=30,
+        help='Seconds without word from a worker before its lease is reassigned (default: 30)'
+    )
+
+    parser_scan.add_argument(
+        '--cluster-token',
+        default=os.environ.get('SPECTRE_CLUSTER_TOKEN'),
+        help='Shared secret workers must present, required unless --coordinator listens on loopback '
+             '(default: $SPECTRE_CLUSTER_TOKEN)'
+    )
+
+    parser_scan.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only probe hosts that changed since the last scan and output new, changed and gone services'
+    )
+
+    parser_scan.add_argument(
+        '--state-file',
+        default=None,
+        help='State file used by --incremental (default: ~/.spectre/state.csv)'
+    )
+
+    parser_scan.add_argument(
+        '--state-ttl',
+        type=int,
+        default=86400,
+        help='Seconds before an unchanged host is probed again in --incremental mode (default: 86400)'
+    )
+
+    parser_scan.add_argument(
+        '--resume',
+        metavar='SCAN_ID',
+        default=None,
+        help='Resume an interrupted scan from its checkpoint, reusing its original settings. '
+             'Not available for --two-phase, --incremental, --connect or --coordinator scans'
+    )
+
+    parser_scan.add_argument(
+        '--checkpoint-dir',
+        default=None,
+        help='Directory for scan checkpoints (default: ~/.spectre/checkpoints)'
+    )
+
+    parser_scan.add_argument(
+        '--no-checkpoint',
+        action='store_true',
+        help='Do not record a checkpoint while scanning'
+    )
+
+    parser_scan.add_argument(
+        '--cve-feed',
+        metavar='PATH',
+        action='append',
+        default=None,
+        help='Local NVD JSON feed file or directory (.json/.json.gz); adds cves, severity and cvss '
+             'columns to every row. Repeatable'
+    )
+
+    parser_scan.add_argument(
+        '--cve-cache',
+        default=None,
+        help='Where the compiled CVE index is cached between runs (default: ~/.spectre/cve_index.pickle)'
+    )
+
+    parser_scan.add_argument(
+        '--index-path',
+        default=None,
+        help='Cross-scan index the results are added to (default: ~/.spectre/index.db)'
+    )
+
+    parser_scan.add_argument(
+        '--no-index',
+        action='store_true',
+        help='Do not add this scan to the cross-scan index used by the query command'
+    )
+
+    parser_scan.add_argument(
+        '--profile',
+        metavar='FILE',
+        default=None,
+        help='Write stage timings as Prometheus text (FILE ending in .prom) or a cProfile dump (any other name)'
+    )
+
+    # Upload command
+    parser_upload = subparsers.add_parser('upload', help='Upload a saved scan to the SPECTRE API')
+
+    parser_upload.add_argument(
+        'file',
+        help='Results file written by the scan command (any --format)'
+    )
+
+    parser_upload.add_argument(
+        '--url',
+        default=os.environ.get('SPECTRE_API_URL', 'http://localhost:4000'),
+        help='API base URL (default: $SPECTRE_API_URL or http://localhost:4000)'
+    )
+
+    parser_upload.add_argument(
+        '--token',
+        default=os.environ.get('SPECTRE_API_TOKEN'),
+        help='Bearer token for the API (default: $SPECTRE_API_TOKEN)'
+    )
+
+    parser_upload.add_argument(
+        '--scan-id',
+        default=None,
+        help="Scan ID to upload under (default: from the file's metadata)"
+    )
+
+    parser_upload.add_argument(
+        '--batch-size',
+        type=int,
+        default=5000,
+        help='Rows per gzip batch (default: 5000)'
+    )
+
+    parser_upload.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Batches in flight at once (default: 4)'
+    )
+
+    parser_upload.add_argument(
+        '--retries',
+        type=int,
+        default=5,
+        help='Retries per batch on network errors, 429 and 5xx (default: 5)'
+    )
+
+    parser_upload.add_argument(
+        '--timeout',
+        type=float,
+        default=30,
+        help='Per-request timeout in seconds (default: 30)'
+    )
+
+    parser_upload.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Log every batch'
+    )
+
+    # Query command
+    parser_query = subparsers.add_parser('query', help='Search services across every indexed scan')
+
+    parser_query.add_argument('--port', type=int, default=None, help='Port number')
+    parser_query.add_argument('--protocol', default=None, help='tcp or udp')
+    parser_query.add_argument('--service', default=None, help='nmap service name, e.g. ssh')
+    parser_query.add_argument('--product', default=None, help='Product name, e.g. OpenSSH; a trailing * matches a prefix')
+    parser_query.add_argument('--version', default=None,
+                              help='Version prefix (1.18) or comparison (<8, >=7.4p1)')
+    parser_query.add_argument('--ip', default=None, help='Address or CIDR block')
+    parser_query.add_argument('--since', default=None, help='ISO date/time or age such as 7d, 12h')
+    parser_query.add_argument('--until', default=None, help='ISO date/time or age such as 1d')
+    parser_query.add_argument('--scan-id', default=None, help='Only this scan')
+    parser_query.add_argument('--change', choices=['new', 'changed', 'gone'], default=None,
+                              help='Only rows tagged by an --incremental scan')
+    parser_query.add_argument('--latest', action='store_true',
+                              help="Only each host's most recent scan (what is exposed now)")
+    parser_query.add_argument('--limit', type=int, default=1000, help='Maximum rows (default: 1000, 0 for all)')
+    parser_query.add_argument('--count', action='store_true', help='Print only the number of matches')
+    parser_query.add_argument('--format', choices=['table', 'csv', 'json'], default='table',
+                              help='Output format (default: table)')
+    parser_query.add_argument('--add', nargs='+', metavar='FILE', default=None,
+                              help='Index saved results files (e.g. scans from before the index existed)')
+    parser_query.add_argument('--scans', action='store_true', help='List indexed scans')
+    parser_query.add_argument('--index-path', default=None,
+                              help='Index database (default: ~/.spectre/index.db)')
+
+    # Serve command
+    parser_serve = subparsers.add_parser('serve', help='Run scans queued with submit from a resident daemon')
+
+    parser_serve.add_argument('--queue', default=None, help='Job queue database (default: ~/.spectre/jobs.db)')
+    parser_serve.add_argument('-w', '--workers', type=int, default=4,
+                              help='nmap processes shared by all running jobs (default: 4)')
+    parser_serve.add_argument('--output-dir', default=None,
+                              help='Where job results are written (default: ~/.spectre/jobs)')
+    parser_serve.add_argument('-p', '--ports', default='top1000', help='Default port specification (default: top1000)')
+    parser_serve.add_argument('-f', '--format', choices=list(OUTPUT_FORMATS), default='csv',
+                              help='Default output format (default: csv)')
+    parser_serve.add_argument('--timeout', type=int, default=300, help='Default per-job deadline in seconds (default: 300)')
+    parser_serve.add_argument('--host-timeout', type=int, default=None, help='Default per-host timeout in seconds')
+    parser_serve.add_argument('-T', '--timing', type=int, choices=range(0, 6), default=None,
+                              help='Default nmap timing template')
+    parser_serve.add_argument('--rate', type=int, default=1000, help='Default packets per second (default: 1000)')
+    parser_serve.add_argument('--min-rate', type=int, default=None, help='Default minimum packets per second')
+    parser_serve.add_argument('--nmap-path', default=None,
+                              help='nmap executable to run (default: $SPECTRE_NMAP or nmap on PATH)')
+    parser_serve.add_argument('--no-sudo', action='store_true', help='Run nmap directly instead of through sudo')
+    parser_serve.add_argument('--cve-feed', metavar='PATH', action='append', default=None,
+                              help='NVD feed loaded once and used to annotate every job. Repeatable')
+    parser_serve.add_argument('--cve-cache', default=None,
+                              help='Compiled CVE index cache (default: ~/.spectre/cve_index.pickle)')
+    parser_serve.add_argument('--index-path', default=None,
+                              help='Cross-scan index jobs are added to (default: ~/.spectre/index.db)')
+    parser_serve.add_argument('--no-index', action='store_true', help='Do not index job results')
+    parser_serve.add_argument('--exit-when-idle', action='store_true',
+                              help='Exit once the queue is empty instead of waiting for new jobs')
+    parser_serve.add_argument('-v', '--verbose', action='store_true', help='Log nmap commands and shards')
+
+    # Submit command
+    parser_submit = subparsers.add_parser('submit', help='Queue a scan for the serve daemon')
+
+    parser_submit.add_argument('-t', '--target', default=None, help='Target to scan (IP/CIDR/range/hostname)')
+    parser_submit.add_argument('--target-file', action='append', default=None, metavar='FILE',
+                               help='Read targets from a file, one per line, - for stdin. Repeatable')
+    parser_submit.add_argument('--each', action='store_true',
+                               help='Queue one job per target instead of a single job over all of them')
+    parser_submit.add_argument('--priority', type=int, default=0,
+                               help='Higher runs first (default: 0)')
+    parser_submit.add_argument('-c', '--concurrency', type=int, default=1,
+                               help='nmap processes this job may use at once (default: 1)')
+    parser_submit.add_argument('-p', '--ports', default=None, help="Port specification (default: the daemon's)")
+    parser_submit.add_argument('-f', '--format', choices=list(OUTPUT_FORMATS), default=None,
+                               help="Output format (default: the daemon's)")
+    parser_submit.add_argument('-o', '--output', default=None,
+                               help='Output file name within the daemon\'s output directory (default: SCAN_ID.FORMAT)')
+    parser_submit.add_argument('--timeout', type=int, default=None, help='Deadline in seconds')
+    parser_submit.add_argument('--host-timeout', type=int, default=None, help='Per-host timeout in seconds')
+    parser_submit.add_argument('-T', '--timing', type=int, choices=range(0, 6), default=None,
+                               help='nmap timing template')
+    parser_submit.add_argument('--rate', type=int, default=None, help='Packets per second')
+    parser_submit.add_argument('--min-rate', type=int, default=None, help='Minimum packets per second')
+    parser_submit.add_argument('--two-phase', action='store_true', help='Discovery sweep, then probe open ports')
+    parser_submit.add_argument('--queue', default=None, help='Job queue database (default: ~/.spectre/jobs.db)')
+
+    # Jobs command
+    parser_jobs = subparsers.add_parser('jobs', help='List, inspect, cancel or fetch queued scans')
+
+    parser_jobs.add_argument('action', nargs='?', choices=['list', 'show', 'result', 'cancel', 'counts'],
+                             default='list', help='What to do (default: list)')
+    parser_jobs.add_argument('job_id', nargs='?', type=int, default=None, help='Job ID for show/result/cancel')
+    parser_jobs.add_argument('--status', choices=['queued', 'running', 'done', 'failed', 'cancelled'],
+                             default=None, help='Only list jobs in this status')
+    parser_jobs.add_argument('--limit', type=int, default=50, help='Jobs to list (default: 50, 0 for all)')
+    parser_jobs.add_argument('--queue', default=None, help='Job queue database (default: ~/.spectre/jobs.db)')
+
+    # Worker command
+    parser_worker = subparsers.add_parser('worker', help='Scan leases handed out by a `scan --coordinator` node')
+
+    parser_worker.add_argument('coordinator', help='Coordinator URL, e.g. http://10.0.0.5:8731')
+    parser_worker.add_argument('-s', '--slots', type=int, default=1,
+                               help='Leases scanned at once, one nmap process each (default: 1)')
+    parser_worker.add_argument('--name', default=None, help='Worker name reported to the coordinator (default: HOST:PID)')
+    parser_worker.add_argument('--token', default=os.environ.get('SPECTRE_CLUSTER_TOKEN'),
+                               help='Shared secret (default: $SPECTRE_CLUSTER_TOKEN)')
+    parser_worker.add_argument('--nmap-path', default=None,
+                               help='nmap executable to run (default: $SPECTRE_NMAP or nmap on PATH)')
+    parser_worker.add_argument('--no-sudo', action='store_true', help='Run nmap directly instead of through sudo')
+    parser_worker.add_argument('--once', action='store_true',
+                               help='Exit when the current scan is over instead of waiting for the next one')
+    parser_worker.add_argument('-v', '--verbose', action='store_true', help='Log nmap commands')
+
     # Future commands
     # parser_report = subparsers.add_parser('report', help='Generate report from scan')
     
     args = parser.parse_args()
 
+    # ASCII banner, kept off piped query/job output
+    if args.command not in ('query', 'submit', 'jobs') or sys.stdout.isatty():
+        str.print_banner()
+
+    from colorama import Fore, Style
+
 
     # SCANNING CLI LOGIC
     if args.command == "scan":
 
+        journal = None
+        if args.resume:
+            from utils.checkpoint import CheckpointJournal
+            try:
+                journal = CheckpointJournal.for_scan(args.resume, args.checkpoint_dir).load()
+            except (OSError, ValueError) as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot resume scan {args.resume}: {e}")
+                sys.exit(1)
+
+            # Rerun with the settings the scan was started with
+            for key, value in journal.settings.items():
+                setattr(args, key, value)
+        elif not args.target and not args.target_file:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --target or --target-file is required")
+            sys.exit(1)
+
         # Handle commands
         if not args.output:
             args.output = str.generate_output_filename(args.format)
 
         # If target is not a valid target str
-        if not str.validate_target(args.target):
+        if args.target and not str.validate_target(args.target):
             print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Invalid target: {args.target}")
             sys.exit(1)
-        
+
+        # Target lists are collapsed into address ranges before anything runs
+        target = args.target
+        if args.resume:
+            # Shards come from the journal, the lists needn't be read again
+            target = journal.header['target']
+        elif args.target_file or args.exclude_file:
+            from utils.targets import TargetSet
+            target = TargetSet()
+            excluded = TargetSet()
+            try:
+                if args.target:
+                    target.add_text(args.target)
+                for path in args.target_file or []:
+                    target.add_file(path)
+                for path in args.exclude_file or []:
+                    excluded.add_file(path)
+            except OSError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot read target list: {e}")
+                sys.exit(1)
+            target.exclude(excluded)
+
+            print(f"[TARGETS] {target.summary()}")
+            for kind, entries in (('target', target), ('exclude', excluded)):
+                if entries.invalid:
+                    print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Skipped {entries.invalid} invalid {kind} "
+                          f"entries, e.g. {', '.join(entries.invalid_samples)}")
+            if not target:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} No targets left to scan")
+                sys.exit(1)
+
+        # Fail before scanning rather than after when the writer can't run
+        try:
+            check_format(args.format)
+        except ImportError as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+            sys.exit(1)
+
+        # Catch bad port specs before any scan starts
+        from modules.nmap_command import port_args
+        try:
+            port_args(args.ports)
+        except ValueError as e:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+            sys.exit(1)
+
+        listen = None
+        if args.coordinator:
+            from core.cluster import is_loopback, parse_listen
+            try:
+                listen = parse_listen(args.coordinator)
+            except ValueError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+                sys.exit(1)
+            if not args.cluster_token and not is_loopback(listen[0]):
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --coordinator on {listen[0]} needs --cluster-token "
+                      f"(or $SPECTRE_CLUSTER_TOKEN), only a loopback address may run without one")
+                sys.exit(1)
+            if args.two_phase or args.incremental or args.resume or args.adaptive_rate:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --coordinator can't be combined with "
+                      f"--two-phase, --incremental, --resume or --adaptive-rate")
+                sys.exit(1)
+
+        connect_options = None
+        if args.connect:
+            # No nmap runs to adapt the rate from unless nmap probes afterwards
+            if args.incremental or args.resume or listen or (args.adaptive_rate and not args.two_phase):
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --connect can't be combined with "
+                      f"--incremental, --resume, --coordinator or (without --two-phase) --adaptive-rate")
+                sys.exit(1)
+            from modules.connect_scan import resolve_ports
+            try:
+                resolve_ports(args.ports)
+            except ValueError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+                sys.exit(1)
+            connect_options = dict(concurrency=args.connect_concurrency, connect_timeout=args.connect_timeout,
+                                   host_rate=args.host_rate)
+
+        # Only plain and sharded nmap scans keep a checkpoint journal
+        unjournaled = [flag for flag, enabled in (
+            ('--two-phase', args.two_phase), ('--incremental', args.incremental),
+            ('--connect', args.connect), ('--coordinator', listen)
+        ) if enabled]
+        if unjournaled and args.resume:
+            print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} --resume can't be combined with {', '.join(unjournaled)}")
+            sys.exit(1)
+        if unjournaled and not args.no_checkpoint:
+            print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {', '.join(unjournaled)} scans are not checkpointed, "
+                  f"an interrupted scan can't be resumed")
+
+        rate_bounds = None
+        if args.adaptive_rate:
+            from modules.rate_control import parse_bounds
+            try:
+                rate_bounds = parse_bounds(args.adaptive_rate)
+            except ValueError as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {e}")
+                sys.exit(1)
+
+        # Load (or compile) the CVE index up front so a bad feed fails fast
+        vuln_index = None
+        if args.cve_feed:
+            from modules.vulndb import VulnIndex, DEFAULT_INDEX_CACHE
+            try:
+                vuln_index = VulnIndex.load(args.cve_feed, args.cve_cache or DEFAULT_INDEX_CACHE)
+            except (OSError, ValueError) as e:
+                print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Cannot load CVE feed: {e}")
+                sys.exit(1)
+            print(f"[VULNS] {len(vuln_index)} CVEs indexed across {len(vuln_index.products)} products")
+
         try:
             from modules.scanner import NetworkScanner
             from utils.helpers import check_dependencies
+            from utils.ids import generate_scan_id
             from utils.parser import OutputFormatter
+            from utils.progress import progress_enabled
             
-            # Check if nmap is installed
-            if not check_dependencies():
+            # Check if nmap is installed, a coordinator leaves nmap to its workers
+            # and a connect scan without --two-phase doesn't run it at all
+            nmap_needed = not listen and not (args.connect and not args.two_phase)
+            if nmap_needed and not check_dependencies():
                 print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} nmap is not installed. Please install it first.")
                 print(f"  Ubuntu/Debian: sudo apt-get install nmap")
                 print(f"  MacOS: brew install nmap")
                 print(f"  RHEL/CentOS: sudo yum install nmap")
                 sys.exit(1)
         
-            # Initialize formatter
-            formatter = OutputFormatter()
-            
             # Run scan
             scan_start = datetime.now()
-            scanner = NetworkScanner(verbose=args.verbose)
-            results = scanner.scan(
-                target=args.target,
+            scan_id = args.resume or generate_scan_id(scan_start)
+            fieldnames = None
+            nmap_options = dict(
+                verbose=args.verbose,
+                show_progress=progress_enabled(args.quiet),
+                timing=args.timing,
+                host_timeout=args.host_timeout,
+                min_rate=args.min_rate,
+                nmap_path=args.nmap_path,
+                sudo=not args.no_sudo
+            )
+            if listen:
+                from core.cluster import DistributedScanner
+                scanner = DistributedScanner(listen=listen, leases=args.leases, lease_ttl=args.lease_ttl,
+                                             token=args.cluster_token, **nmap_options)
+                print(f"[CLUSTER] Coordinating scan {scan_id} on {listen[0]}:{listen[1]}, start workers with: "
+                      f"{Fore.YELLOW}spectre-scanner worker http://HOST:{listen[1]}{Style.RESET_ALL}")
+            elif args.incremental:
+                from core.incremental import IncrementalScanner, INCREMENTAL_FIELDNAMES
+                from utils.state import ScanState, DEFAULT_STATE_PATH
+                state = ScanState(args.state_file or DEFAULT_STATE_PATH).load()
+                scanner = IncrementalScanner(state, ttl=args.state_ttl, workers=args.workers, **nmap_options)
+                fieldnames = INCREMENTAL_FIELDNAMES
+            elif args.two_phase:
+                from core.engine import ScanEngine
+                scanner = ScanEngine(workers=args.workers, connect=connect_options, **nmap_options)
+            elif args.connect:
+                from modules.connect_scan import ConnectScanner
+                scanner = ConnectScanner(**connect_options, **nmap_options)
+            elif not args.no_checkpoint or args.workers > 1:
+                from modules.sharding import ShardedScanner
+                from utils.checkpoint import CheckpointJournal
+                if args.resume:
+                    scan_start = datetime.fromisoformat(journal.header['scan_start'])
+                elif not args.no_checkpoint:
+                    journal = CheckpointJournal.for_scan(scan_id, args.checkpoint_dir, settings={
+                        key: getattr(args, key) for key in CHECKPOINT_SETTINGS
+                    })
+                scanner = ShardedScanner(workers=args.workers, journal=journal,
+                                         resume=bool(args.resume), **nmap_options)
+            else:
+                scanner = NetworkScanner(**nmap_options)
+
+            if rate_bounds:
+                from modules.rate_control import RateController
+                scanner.rate_control = RateController(args.rate, *rate_bounds, max_parallelism=args.workers)
+
+            profiler = None
+            if args.profile and not args.profile.endswith('.prom'):
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+
+            results = scanner.iter_scan(
+                target=target,
                 ports=args.ports,
                 timeout=args.timeout,
-                rate_limit=args.rate
+                rate_limit=args.rate,
+                scan_id=scan_id
             )
+            if vuln_index is not None:
+                from modules.vulndb import VULN_FIELDNAMES
+                from utils.parser import FIELDNAMES
+                fieldnames = (fieldnames or FIELDNAMES) + VULN_FIELDNAMES
+                results = vuln_index.annotate(results)
+
+            scan_index = None
+            if not args.no_index:
+                import sqlite3
+                from utils.scan_index import ScanIndex, DEFAULT_INDEX_PATH
+                try:
+                    scan_index = ScanIndex(args.index_path or DEFAULT_INDEX_PATH)
+                except (sqlite3.Error, OSError) as e:
+                    print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} Scan index unavailable, not indexing: {e}")
+
+            # Initialize formatter, writer timings join the scanner's
+            formatter = OutputFormatter(fieldnames=fieldnames, metrics=scanner.metrics, index=scan_index)
+
+            if args.format == 'json':
+                # A single JSON document needs every row up front
+                results = list(results)
+                summary = formatter._generate_summary(results)
+            else:
+                # Stream rows straight into the writer, metadata follows once totals are known
+                summary = formatter.save(results, args.output, args.format, write_metadata=False)
             scan_end = datetime.now()
             
-            # Calculate unique hosts
-            unique_hosts = len(set(r['target_ip'] for r in results)) if results else 0
-            
+            performance = scanner.metrics.as_dict()
+            if scanner.rate_control is not None:
+                control = scanner.rate_control
+                performance['rate_control'] = control.as_dict()
+                print(f"[RATE] Settled at {control.rate} pps, {control.parallelism} parallel shards "
+                      f"({control.increases} increases, {control.decreases} decreases over {control.runs} runs)")
+
+            if listen:
+                cluster = scanner.coordinator.status()
+                performance['cluster'] = cluster
+                print(f"[CLUSTER] {cluster['leases']} leases across {len(cluster['workers'])} workers, "
+                      f"{cluster['reassigned']} reassigned"
+                      + (f", {cluster['status']['failed']} failed" if cluster['status'].get('failed') else ""))
+
             # Set metadata
             formatter.set_metadata(
                 scan_start=scan_start,
                 scan_end=scan_end,
-                target=args.target,
-                total_hosts=unique_hosts,
-                total_services=len(results)
+                target=f"{target}",
+                total_hosts=summary['unique_hosts'],
+                total_services=summary['total_services'],
+                scan_id=scanner.scan_id,
+                performance=performance
             )
             
             # Save results
-            if args.format == 'csv':
-                formatter.save_as_csv(results, args.output)
-            else:
+            if args.format == 'json':
                 formatter.save_as_json(results, args.output)
+            else:
+                metadata_file = formatter.save_metadata(formatter.output_path)
+                print(f"[PARSER] Metadata saved to {metadata_file}")
             
             # Print summary
-            formatter.print_summary(results)
+            formatter.print_summary()
+
+            if args.profile:
+                save_profile(args.profile, scanner, profiler)
         except PermissionError:
             print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} Permission denied. Network scanning requires root privileges.")
             print(f"Try running with: {Fore.YELLOW}sudo python {' '.join(sys.argv)}{Style.RESET_ALL}")
@@ -141,13 +1087,16 @@ def main():
             
         except TimeoutError as e:
             print(f"Scanner timed out: {e}")
+            print_resume_hint(journal)
     
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}[INTERRUPTED]{Style.RESET_ALL} Scan cancelled by user")
+            print_resume_hint(journal)
             sys.exit(0)
             
         except Exception as e:
             print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} An unexpected error occurred: {e}")
+            import json
             traceback = json.dumps(e.with_traceback)
             print(traceback)
             if args.verbose:
@@ -155,6 +1104,32 @@ def main():
                 traceback.print_exc()
             sys.exit(1)
 
+
+    # UPLOAD CLI LOGIC
+    elif args.command == "upload":
+        upload(args, Fore, Style)
+
+    # QUERY CLI LOGIC
+    elif args.command == "query":
+        if not args.index_path:
+            from utils.scan_index import DEFAULT_INDEX_PATH
+            args.index_path = DEFAULT_INDEX_PATH
+        query(args, Fore, Style)
+
+    # DAEMON CLI LOGIC
+    elif args.command == "serve":
+        serve(args, Fore, Style)
+
+    elif args.command == "submit":
+        submit(args, Fore, Style)
+
+    elif args.command == "jobs":
+        jobs(args, Fore, Style)
+
+    # WORKER CLI LOGIC
+    elif args.command == "worker":
+        worker(args, Fore, Style)
+
             
 if __name__ == "__main__":
     main()
@@ -0,0 +1,669 @@
+import hmac
+import http.client
+import ipaddress
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+from modules.nmap_command import exclude_file
+from modules.scanner import NetworkScanner
+from utils.progress import make_progress
+from utils.records import Host
+from utils.targets import TargetSet, split_target
+from utils.upload import ConnectionPool
+
+DEFAULT_PORT = 8731
+
+# Environment variable holding the shared secret coordinator and workers check
+CLUSTER_TOKEN_ENV = "SPECTRE_CLUSTER_TOKEN"
+
+# Scanner settings a coordinator hands to workers with each lease. The
+# nmap executable, sudo and probe arguments are the worker's own.
+LEASE_OPTIONS = ('timing', 'host_timeout', 'min_rate', 'rate_limit')
+
+
+class ClusterError(Exception):
+    """The coordinator could not be reached or rejected a request"""
+
+
+def parse_listen(spec: str) -> Tuple[str, int]:
+    """
+    Parse a coordinator listen address, HOST:PORT, :PORT or PORT.
+
+    Raises:
+        ValueError: If the port is missing or out of range
+    """
+    host, _, port = spec.rpartition(':')
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Expected HOST:PORT to listen on, got: {spec}")
+    return host.strip('[]') or '0.0.0.0', int(port)
+
+
+def is_loopback(host: str) -> bool:
+    """Whether a listen host only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_lease_targets(entries) -> List[str]:
+    """
+    Validate lease targets before they reach a worker's nmap argv.
+
+    Workers often run nmap through sudo, so an entry such as `--script` or
+    `-oN` from a rogue coordinator would run with root's privileges.
+
+    Raises:
+        ValueError: If the entries are not a list of addresses, CIDRs,
+            ranges or hostnames
+    """
+    if not isinstance(entries, list):
+        raise ValueError(f"expected a target list, got {type(entries).__name__}")
+    checked = TargetSet()
+    for entry in entries:
+        if not isinstance(entry, str) or entry.startswith('-') or not checked.add(entry):
+            raise ValueError(f"invalid target {entry!r}")
+    return entries
+
+
+class Lease:
+    """One slice of the target space and who is scanning it"""
+
+    def __init__(self, index: int, targets: List[str]):
+        self.index = index
+        self.targets = targets
+        self.status = 'queued'  # queued -> leased -> done | failed
+        self.worker = None
+        self.expires = 0.0
+        self.attempts = 0
+        # Addresses already reported, excluded when the lease is reassigned
+        self.reported: List[str] = []
+        self.error = None
+
+    @property
+    def key(self) -> str:
+        """Lease id for the current attempt, stale workers' ids stop matching"""
+        return f"{self.index}.{self.attempts}"
+
+
+class ScanCoordinator:
+    """
+    Lease bookkeeping for a distributed scan (thread-safe).
+
+    Workers claim leases, report hosts while they scan and then complete or
+    fail them. Reporting doubles as a heartbeat: a lease not heard from in
+    `lease_ttl` seconds is taken back and handed to the next worker that
+    asks, with the hosts already received excluded. A lease that failed or
+    expired `max_attempts` times is given up on.
+
+    Received hosts and finished leases are put on `events` for the scanner
+    consuming them.
+    """
+
+    def __init__(self, scan_id: str, shards: List[List[str]], ports: str, options: Dict,
+                 lease_ttl: float = 30, max_attempts: int = 3, deadline: Optional[float] = None,
+                 log: Optional[Callable] = None):
+        self.scan_id = scan_id
+        self.ports = ports
+        self.options = options
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max(1, max_attempts)
+        self.deadline = deadline
+        self.leases = [Lease(i, shard) for i, shard in enumerate(shards)]
+        self.events: queue.Queue = queue.Queue()
+        self.workers: Dict[str, Dict] = {}
+        self.reassigned = 0
+        self.closed = False
+        self._queued = deque(range(len(self.leases)))
+        self._remaining = len(self.leases)
+        self._lock = threading.Lock()
+        self._log = log or (lambda message, level="INFO": None)
+
+    @property
+    def finished(self) -> bool:
+        return self._remaining == 0
+
+    def _seen(self, worker: str) -> Dict:
+        info = self.workers.get(worker)
+        if info is None:
+            info = self.workers[worker] = {'leases': 0, 'hosts': 0, 'last_seen': None}
+            self._log(f"Worker {worker} joined", "CLUSTER")
+        info['last_seen'] = time.time()
+        return info
+
+    def _lease(self, key: str, worker: str) -> Optional[Lease]:
+        """The lease `key` names, if `worker` still holds it"""
+        index, _, _ = key.partition('.')
+        if not index.isdigit() or int(index) >= len(self.leases):
+            return None
+        lease = self.leases[int(index)]
+        if lease.status != 'leased' or lease.key != key or lease.worker != worker:
+            return None
+        return lease
+
+    def _requeue(self, lease: Lease, reason: str) -> None:
+        if lease.attempts >= self.max_attempts:
+            lease.status = 'failed'
+            lease.error = reason
+            self._remaining -= 1
+            self.events.put(('failed', lease.index, reason))
+            self._log(f"Lease {lease.index} given up after {lease.attempts} attempts: {reason}", "WARNING")
+            return
+        lease.status = 'queued'
+        lease.worker = None
+        # Reassigned leases go first, they hold up the end of the scan
+        self._queued.appendleft(lease.index)
+        self._log(f"Lease {lease.index} requeued: {reason}", "CLUSTER")
+
+    def claim(self, worker: str) -> Tuple[int, Optional[Dict]]:
+        """
+        Hand the next queued lease to a worker.
+
+        Returns (200, lease), (204, None) while every lease is out, or
+        (410, None) once the scan is over.
+        """
+        with self._lock:
+            self._seen(worker)
+            if self.closed or self.finished:
+                return 410, None
+            if not self._queued:
+                return 204, None
+            lease = self.leases[self._queued.popleft()]
+            lease.status = 'leased'
+            lease.worker = worker
+            lease.attempts += 1
+            lease.expires = time.monotonic() + self.lease_ttl
+            if lease.attempts > 1:
+                self.reassigned += 1
+            self.workers[worker]['leases'] += 1
+            self._log(f"Lease {lease.key} ({len(lease.targets)} targets) to {worker}", "CLUSTER")
+            return 200, {
+                'lease': lease.key,
+                'scan_id': self.scan_id,
+                'targets': lease.targets,
+                'ports': self.ports,
+                'exclude': list(lease.reported),
+                'options': self.options,
+                'timeout': max(1, int(self.deadline - time.time())) if self.deadline else None,
+                'ttl': self.lease_ttl
+            }
+
+    def report(self, key: str, worker: str, hosts: List[Dict]) -> bool:
+        """Accept hosts (or just a heartbeat), False when the lease was lost"""
+        parsed = [Host.from_dict(host) for host in hosts]
+        with self._lock:
+            info = self._seen(worker)
+            lease = self._lease(key, worker)
+            if lease is None:
+                return False
+            lease.expires = time.monotonic() + self.lease_ttl
+            lease.reported.extend(host.ip for host in parsed)
+            info['hosts'] += len(parsed)
+            if parsed:
+                self.events.put(('hosts', lease.index, parsed))
+            return True
+
+    def complete(self, key: str, worker: str, metrics: Optional[Dict] = None) -> bool:
+        with self._lock:
+            self._seen(worker)
+            lease = self._lease(key, worker)
+            if lease is None:
+                return False
+            lease.status = 'done'
+            self._remaining -= 1
+            self.events.put(('done', lease.index, metrics or {}))
+            return True
+
+    def fail(self, key: str, worker: str, error: str) -> bool:
+        with self._lock:
+            self._seen(worker)
+            lease = self._lease(key, worker)
+            if lease is None:
+                return False
+            self._requeue(lease, f"{worker}: {error}")
+            return True
+
+    def reap(self) -> int:
+        """Take back leases whose worker stopped reporting, returns how many"""
+        now = time.monotonic()
+        expired = 0
+        with self._lock:
+            for lease in self.leases:
+                if lease.status == 'leased' and lease.expires < now:
+                    self._requeue(lease, f"no word from {lease.worker} for {self.lease_ttl:g}s")
+                    expired += 1
+        return expired
+
+    def close(self) -> None:
+        """Answer every later claim with 410"""
+        with self._lock:
+            self.closed = True
+
+    def status(self) -> Dict:
+        """Lease counts and per-worker totals, served on GET /status"""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for lease in self.leases:
+                counts[lease.status] = counts.get(lease.status, 0) + 1
+            return {
+                'scan_id': self.scan_id,
+                'leases': len(self.leases),
+                'status': counts,
+                'reassigned': self.reassigned,
+                'workers': {
+                    name: dict(info, last_seen=datetime.fromtimestamp(info['last_seen']).isoformat())
+                    for name, info in self.workers.items()
+                }
+            }
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP/1.1 keep-alive:
+
+        POST /lease                 {"worker"}            -> 200 lease | 204 | 410
+        POST /leases/KEY/hosts      {"worker", "hosts"}   -> 200 | 409 lease lost
+        POST /leases/KEY/done       {"worker", "metrics"} -> 200 | 409
+        POST /leases/KEY/fail       {"worker", "error"}   -> 200 | 409
+        GET  /status                                      -> 200 status
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Optional[Dict] = None) -> None:
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        supplied = self.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+            return True
+        self._reply(401, {'error': 'bad or missing token'})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/status':
+            self._reply(200, self.server.coordinator.status())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length) if length else b''
+        if not self._authorized():
+            return
+        try:
+            body = json.loads(data) if data else {}
+            worker = f"{body['worker']}"
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {'error': 'expected a JSON body with a worker name'})
+            return
+
+        coordinator = self.server.coordinator
+        if self.path == '/lease':
+            status, lease = coordinator.claim(worker)
+            self._reply(status, lease)
+            return
+
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'leases':
+            self._reply(404, {'error': 'not found'})
+            return
+        key, action = parts[1], parts[2]
+        try:
+            if action == 'hosts':
+                accepted = coordinator.report(key, worker, body.get('hosts') or [])
+            elif action == 'done':
+                accepted = coordinator.complete(key, worker, body.get('metrics'))
+            elif action == 'fail':
+                accepted = coordinator.fail(key, worker, f"{body.get('error') or 'unknown error'}")
+            else:
+                self._reply(404, {'error': 'not found'})
+                return
+        except (AttributeError, TypeError) as e:
+            self._reply(400, {'error': f"malformed {action} report: {e}"})
+            return
+        self._reply(200 if accepted else 409, {'accepted': accepted})
+
+
+class DistributedScanner(NetworkScanner):
+    """
+    NetworkScanner that coordinates `worker` nodes instead of running nmap.
+
+    The target is cut into `leases` slices and an HTTP coordinator is
+    started on `listen`. Workers (`spectre-scanner worker`, on this or other
+    machines) claim slices, run nmap and stream back each host as nmap
+    finishes it. The hosts go through the usual iter_scan()/scan() row
+    stream, so the scan keeps one scan ID and one output however many nodes
+    took part. Throughput grows with the number of worker slots since each
+    runs its own nmap, from its own network vantage point.
+
+    Leases of workers that die or stop reporting are reassigned, see
+    ScanCoordinator. Workers scan with their own nmap, sudo and probe
+    arguments; `rate_limit` and `min_rate` apply to each worker slot.
+
+    Without a `token` anyone reaching the port could claim leases or report
+    made-up hosts, so that is only allowed on a loopback address.
+    """
+
+    # Default number of slices, several per worker keeps fast nodes busy
+    DEFAULT_LEASES = 64
+
+    # Seconds between checks for dead workers and the deadline
+    REAP_INTERVAL = 1.0
+
+    def __init__(self, verbose: bool = False, show_progress: bool = True,
+                 listen: Tuple[str, int] = ('0.0.0.0', DEFAULT_PORT), leases: Optional[int] = None,
+                 lease_ttl: float = 30, max_attempts: int = 3, token: Optional[str] = None, **kwargs):
+        if not token and not is_loopback(listen[0]):
+            raise ValueError(f"A cluster token is required to coordinate on {listen[0]}, "
+                             f"set --cluster-token or listen on 127.0.0.1")
+        super().__init__(verbose=verbose, show_progress=show_progress, **kwargs)
+        self.listen = listen
+        self.leases = leases or self.DEFAULT_LEASES
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.token = token
+        # ScanCoordinator of the current scan, kept afterwards for its status()
+        self.coordinator: Optional[ScanCoordinator] = None
+
+    def _iter_nmap_hosts(self, target: Union[str, List[str], TargetSet], ports: str, additional_args=None,
+                         stream=None) -> Iterator[Host]:
+        """Serve leases until every slice is done and yield hosts as workers report them"""
+        if not isinstance(target, (str, TargetSet)):
+            target = ' '.join(target)
+
+        shards = split_target(target, self.leases)
+        options = {key: value for key, value in self.worker_options().items() if key in LEASE_OPTIONS}
+        coordinator = self.coordinator = ScanCoordinator(
+            self.scan_id, shards, ports, options, lease_ttl=self.lease_ttl,
+            max_attempts=self.max_attempts, deadline=self.deadline, log=self._log
+        )
+        server = ThreadingHTTPServer(self.listen, _CoordinatorHandler)
+        server.daemon_threads = True
+        server.coordinator = coordinator
+        server.token = self.token
+        thread = threading.Thread(target=server.serve_forever, name='coordinator', daemon=True)
+        thread.start()
+        host, port = server.server_address[:2]
+        self._log(f"Split {target} into {len(shards)} leases, coordinating on {host}:{port}", "CLUSTER")
+
+        progress = make_progress(self.show_progress, total_shards=len(shards), desc="Leases")
+        seen = set()
+        try:
+            last_reap = time.monotonic()
+            while not (coordinator.finished and coordinator.events.empty()):
+                # Live workers reporting steadily must not hold up reassigning
+                # a dead worker's lease, so this runs whether or not events arrive
+                if time.monotonic() - last_reap >= self.REAP_INTERVAL:
+                    last_reap = time.monotonic()
+                    coordinator.reap()
+                    if self.deadline is not None and time.time() > self.deadline:
+                        raise TimeoutError(f"Workers did not finish before the scan deadline "
+                                           f"({coordinator.status()['status']})")
+                try:
+                    kind, index, payload = coordinator.events.get(
+                        timeout=max(0.0, self.REAP_INTERVAL - (time.monotonic() - last_reap)))
+                except queue.Empty:
+                    continue
+
+                if kind == 'hosts':
+                    for host in payload:
+                        # A reassigned lease may report a host twice
+                        if host.ip not in seen:
+                            seen.add(host.ip)
+                            yield host
+                elif kind == 'done':
+                    self.metrics.merge(payload)
+                    self._log(f"Lease {index} finished", "CLUSTER")
+                    progress.shard_done(index)
+                else:
+                    progress.shard_done(index)
+        finally:
+            coordinator.close()
+            server.shutdown()
+            server.server_close()
+            progress.close()
+
+
+class ScanWorker:
+    """
+    Worker node: claims leases from a coordinator and scans them with nmap.
+
+    Each of `slots` threads loops claim -> scan -> report on its own. Hosts
+    are posted in batches as nmap finishes them, at least every
+    FLUSH_INTERVAL seconds (an empty batch is the heartbeat keeping the
+    lease alive). When the coordinator answers that the lease was taken
+    back, nmap is stopped and the lease dropped.
+
+    Workers outlive scans: with no coordinator or nothing to do they keep
+    polling, so one fleet serves scan after scan. With `once` they exit
+    when the coordinator says the scan is over or goes away.
+    """
+
+    # Seconds between claims while the coordinator has nothing to hand out
+    POLL_INTERVAL = 1.0
+
+    # Longest wait between connection attempts while the coordinator is down
+    MAX_BACKOFF = 30.0
+
+    # Seconds and hosts after which a batch of hosts is posted
+    FLUSH_INTERVAL = 1.0
+    FLUSH_HOSTS = 256
+
+    # Attempts per request before a lease is abandoned
+    RETRIES = 3
+
+    def __init__(self, url: str, slots: int = 1, token: Optional[str] = None, name: Optional[str] = None,
+                 nmap_path: Optional[str] = None, sudo: bool = True, verbose: bool = False,
+                 once: bool = False, timeout: float = 30):
+        self.url = url
+        self.slots = max(1, slots)
+        self.token = token
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.nmap_path = nmap_path
+        self.sudo = sudo
+        self.verbose = verbose
+        self.once = once
+        self.pool = ConnectionPool(url, size=self.slots, timeout=timeout)
+        self.leases_done = 0
+        self.hosts_sent = 0
+        self._counter_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _log(self, message: str) -> None:
+        print(f"[WORKER] {datetime.now().isoformat(timespec='seconds')} {message}", flush=True)
+
+    def stop(self) -> None:
+        """Stop claiming, running leases are handed back to the coordinator"""
+        self._stop.set()
+
+    def run(self) -> None:
+        """Serve leases on every slot until stop() (or the scan ends with `once`)"""
+        self._log(f"{self.name} working for {self.url} with {self.slots} slots")
+        threads = [
+            threading.Thread(target=self._slot, args=(f"{self.name}/{n}",), name=f"slot-{n}", daemon=True)
+            for n in range(self.slots)
+        ]
+        for thread in threads:
+            thread.start()
+        # Joining with a timeout keeps the main thread responsive to signals
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(0.5)
+        self.pool.close()
+        self._log(f"Stopped after {self.leases_done} leases, {self.hosts_sent} hosts")
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Optional[Dict]]:
+        """One request to the coordinator, retried on connection errors"""
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        for attempt in range(self.RETRIES):
+            try:
+                status, _, response = self.pool.request(method, path, data, headers)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == self.RETRIES - 1 or self._stop.is_set():
+                    raise ClusterError(f"{method} {path} failed: {e}") from e
+                time.sleep(0.5 * 2 ** attempt)
+                continue
+            if status in (401, 400):
+                # Retrying won't help with a wrong token or an incompatible coordinator
+                self._stop.set()
+                raise ClusterError(f"{method} {path} rejected ({status}): {response[:200].decode('utf-8', 'replace')}")
+            return status, json.loads(response) if response else None
+
+    def _slot(self, name: str) -> None:
+        backoff = self.POLL_INTERVAL
+        connected = False
+        while not self._stop.is_set():
+            try:
+                status, lease = self._request('POST', '/lease', {'worker': name})
+            except ClusterError as e:
+                if self._stop.is_set():
+                    self._log(f"{name}: {e}")
+                    return
+                if self.once and connected:
+                    return
+                if backoff == self.POLL_INTERVAL:
+                    # Once per outage, not on every retry
+                    self._log(f"{name}: {e}, retrying until the coordinator is reachable")
+                self._stop.wait(backoff)
+                backoff = min(self.MAX_BACKOFF, backoff * 2)
+                continue
+            connected = True
+            backoff = self.POLL_INTERVAL
+
+            if status == 200:
+                self._scan(name, lease)
+            elif status == 410 and self.once:
+                return
+            else:
+                self._stop.wait(self.POLL_INTERVAL)
+
+    def _scan(self, name: str, lease: Dict) -> None:
+        """Run nmap over one lease, streaming hosts back, then complete or fail it"""
+        key = lease['lease']
+        options = lease.get('options') or {}
+        scanner = NetworkScanner(
+            verbose=self.verbose,
+            show_progress=False,
+            timing=options.get('timing'),
+            host_timeout=options.get('host_timeout'),
+            min_rate=options.get('min_rate'),
+            nmap_path=self.nmap_path,
+            sudo=self.sudo
+        )
+        scanner.rate_limit = options.get('rate_limit')
+        scanner.deadline = time.time() + lease['timeout'] if lease.get('timeout') else None
+        try:
+            targets = check_lease_targets(lease['targets'])
+            exclude = check_lease_targets(lease.get('exclude') or [])
+        except ValueError as e:
+            self._log(f"Lease {key} rejected: {e}")
+            try:
+                self._request('POST', f"/leases/{key}/fail", {'worker': name, 'error': f"rejected: {e}"})
+            except ClusterError:
+                pass
+            return
+
+        # Hosts a reassigned lease already reported, as a file since
+        # thousands of them would overflow the argv limit as one argument
+        with exclude_file(exclude) as args:
+            self._stream(name, lease, scanner, targets, args)
+
+    def _stream(self, name: str, lease: Dict, scanner: NetworkScanner, targets: List[str],
+                additional_args: List[str]) -> None:
+        """Run nmap for _scan() and stream hosts back until the lease ends"""
+        key = lease['lease']
+
+        # nmap runs on a reader thread so heartbeats go out while it is quiet
+        found: queue.Queue = queue.Queue()
+        finished = object()
+
+        def read():
+            try:
+                for host in scanner._iter_nmap_hosts(targets, lease['ports'], additional_args):
+                    found.put(host)
+                found.put(finished)
+            except Exception as e:
+                found.put(e)
+
+        started = time.monotonic()
+        reader = threading.Thread(target=read, name=f"nmap-{key}", daemon=True)
+        reader.start()
+
+        heartbeat = min(self.FLUSH_INTERVAL, lease.get('ttl', 30) / 3)
+        batch: List[Host] = []
+        flushed = time.monotonic()
+        outcome = None
+        hosts = 0
+        try:
+            while outcome is None:
+                try:
+                    item = found.get(timeout=max(0.05, heartbeat - (time.monotonic() - flushed)))
+                except queue.Empty:
+                    item = None
+                if item is finished or isinstance(item, Exception):
+                    outcome = item
+                elif item is not None:
+                    batch.append(item)
+
+                if self._stop.is_set():
+                    raise ClusterError("worker stopping")
+                if outcome is not None or len(batch) >= self.FLUSH_HOSTS or time.monotonic() - flushed >= heartbeat:
+                    status, _ = self._request('POST', f"/leases/{key}/hosts",
+                                              {'worker': name, 'hosts': [host.as_dict() for host in batch]})
+                    if status != 200:
+                        raise ClusterError("lease taken back by the coordinator")
+                    hosts += len(batch)
+                    batch = []
+                    flushed = time.monotonic()
+
+            if isinstance(outcome, Exception):
+                self._request('POST', f"/leases/{key}/fail",
+                              {'worker': name, 'error': f"{type(outcome).__name__}: {outcome}"})
+                self._log(f"Lease {key} failed: {outcome}")
+                return
+            status, _ = self._request('POST', f"/leases/{key}/done",
+                                      {'worker': name, 'metrics': scanner.metrics.as_dict()})
+            if status != 200:
+                raise ClusterError("lease taken back by the coordinator")
+        except ClusterError as e:
+            scanner.stop()
+            reader.join()
+            self._log(f"Lease {key} abandoned: {e}")
+            if self._stop.is_set():
+                try:
+                    # Hand it back now rather than after the lease expires
+                    self._request('POST', f"/leases/{key}/fail", {'worker': name, 'error': 'worker stopped'})
+                except ClusterError:
+                    pass
+            return
+
+        with self._counter_lock:
+            self.leases_done += 1
+            self.hosts_sent += hosts
+        self._log(f"Lease {key} done: {hosts} hosts in {time.monotonic() - started:.1f}s")
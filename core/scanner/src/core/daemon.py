@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+from modules.scanner import NetworkScanner
+from utils.formats import check_format
+from utils.ids import generate_scan_id
+from utils.job_queue import Job, JobQueue, job_output_name
+from utils.parser import FIELDNAMES, OutputFormatter
+from utils.records import Row
+
+DEFAULT_JOBS_DIR = os.path.join(os.path.expanduser('~'), '.spectre', 'jobs')
+
+# Scan settings a job may override. nmap_path/sudo stay daemon-wide so
+# whoever can write to the queue can't choose what runs as root, and
+# `output` is only a file name inside the daemon's output directory.
+JOB_OPTIONS = ('ports', 'timeout', 'rate', 'min_rate', 'host_timeout', 'timing', 'format', 'two_phase', 'output')
+
+# Daemon-wide settings, overridden by `serve` flags
+DEFAULT_SETTINGS = {
+    'ports': 'top1000',
+    'timeout': 300,
+    'rate': 1000,
+    'min_rate': None,
+    'host_timeout': None,
+    'timing': None,
+    'format': 'csv',
+    'two_phase': False,
+    'nmap_path': None,
+    'sudo': True
+}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once `jobs cancel` flagged it"""
+
+
+class ScanDaemon:
+    """
+    Resident scanner serving jobs from a JobQueue.
+
+    Interpreter start-up, imports, configuration and the CVE index are paid
+    once for the daemon instead of once per scan, and when the daemon runs
+    as root nmap needs no sudo per job. Jobs run on a thread pool. Each
+    claims as many of the `slots` nmap processes as its concurrency allows
+    (sharded across a process pool when above one), so the total never
+    exceeds `slots` however jobs are mixed.
+
+    Every job is written like a `scan` run: a results file and metadata in
+    `output_dir` (named after the job's `output` if it has one), plus the
+    scan index. Status, counts and the output path are kept in the queue
+    while it runs.
+    """
+
+    # Seconds between queue polls while idle or waiting for free slots
+    POLL_INTERVAL = 1.0
+
+    # Seconds between progress updates and cancel checks of a running job
+    CHECK_INTERVAL = 1.0
+
+    def __init__(self, queue: JobQueue, slots: int = 4, settings: Optional[Dict] = None,
+                 output_dir: str = DEFAULT_JOBS_DIR, vuln_index=None,
+                 index_path: Optional[str] = None, verbose: bool = False):
+        self.queue = queue
+        self.slots = max(1, slots)
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.output_dir = output_dir
+        self.vuln_index = vuln_index
+        self.index_path = index_path
+        self.verbose = verbose
+        self.free = self.slots
+        self.running: Dict[int, Job] = {}
+        self._stop = threading.Event()
+        # One scan index connection per worker thread, reused across jobs
+        self._local = threading.local()
+
+    def _log(self, message: str) -> None:
+        print(f"[DAEMON] {datetime.now().isoformat(timespec='seconds')} {message}", flush=True)
+
+    def stop(self) -> None:
+        """Stop claiming jobs, serve() returns once running ones finish"""
+        self._stop.set()
+
+    def serve(self, exit_when_idle: bool = False) -> None:
+        """
+        Claim and run jobs until stop() is called (or, with `exit_when_idle`,
+        until the queue is empty and nothing is running).
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            self._log(f"Requeued {recovered} jobs left running by a previous daemon")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._log(f"Serving {self.queue.path} with {self.slots} nmap slots")
+
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.slots, thread_name_prefix='scan-job') as pool:
+            while not self._stop.is_set():
+                job = self.queue.claim(self.free, max_concurrency=self.slots)
+                if job is not None:
+                    self.free -= job.concurrency
+                    self.running[job.id] = job
+                    futures[pool.submit(self._run, job)] = job
+                    continue
+
+                if exit_when_idle and not futures:
+                    break
+                if not futures:
+                    self._stop.wait(self.POLL_INTERVAL)
+                    continue
+                done, _ = wait(futures, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished = futures.pop(future)
+                    self.free += finished.concurrency
+                    self.running.pop(finished.id, None)
+
+            if futures:
+                self._log(f"Waiting for {len(futures)} running jobs")
+        self._log("Stopped")
+
+    def _run(self, job: Job) -> None:
+        """Run one job on a pool thread and record how it ended"""
+        self._log(f"Job {job.id} started: {job.target} (priority {job.priority}, {job.concurrency} slots)")
+        try:
+            summary = self._execute(job)
+        except JobCancelled:
+            self.queue.finish(job.id, 'cancelled', error='Cancelled while running')
+            self._log(f"Job {job.id} cancelled")
+        except Exception as e:
+            self.queue.finish(job.id, 'failed', error=f"{type(e).__name__}: {e}")
+            self._log(f"Job {job.id} failed: {e}")
+        else:
+            self.queue.finish(job.id, 'done', hosts=summary['unique_hosts'], services=summary['total_services'])
+            self._log(f"Job {job.id} done: {summary['total_services']} services on {summary['unique_hosts']} hosts")
+
+    def _settings(self, job: Job) -> Dict:
+        settings = dict(self.settings)
+        settings.update({key: value for key, value in job.options.items() if key in JOB_OPTIONS})
+        return settings
+
+    def _scanner(self, job: Job, settings: Dict) -> NetworkScanner:
+        options = dict(
+            verbose=self.verbose,
+            show_progress=False,
+            timing=settings['timing'],
+            host_timeout=settings['host_timeout'],
+            min_rate=settings['min_rate'],
+            nmap_path=settings['nmap_path'],
+            sudo=settings['sudo']
+        )
+        if settings['two_phase']:
+            from core.engine import ScanEngine
+            return ScanEngine(workers=job.concurrency, **options)
+        if job.concurrency > 1:
+            from modules.sharding import ShardedScanner
+            return ShardedScanner(workers=job.concurrency, **options)
+        return NetworkScanner(**options)
+
+    def _scan_index(self):
+        """This thread's ScanIndex, opened on first use"""
+        if self.index_path is None:
+            return None
+        index = getattr(self._local, 'index', None)
+        if index is None:
+            from utils.scan_index import ScanIndex
+            index = self._local.index = ScanIndex(self.index_path)
+        return index
+
+    def _watch(self, job: Job, scanner: NetworkScanner, rows: Iterator[Row]) -> Iterator[Row]:
+        """Pass rows through, publishing progress and honouring cancellation"""
+        checked = time.monotonic()
+        try:
+            for row in rows:
+                yield row
+                now = time.monotonic()
+                if now - checked >= self.CHECK_INTERVAL:
+                    checked = now
+                    self.queue.update(job.id, hosts=scanner.hosts_found, services=scanner.services_found)
+                    if self.queue.cancel_requested(job.id):
+                        raise JobCancelled(f"Job {job.id} cancelled")
+            if self.queue.cancel_requested(job.id):
+                raise JobCancelled(f"Job {job.id} cancelled")
+        finally:
+            # Stops nmap when the job ends early
+            rows.close()
+
+    def _execute(self, job: Job) -> Dict:
+        """Scan one job's target and save it like `scan` would, returns the summary"""
+        settings = self._settings(job)
+        fmt = settings['format']
+        check_format(fmt)
+
+        scan_start = datetime.now()
+        scan_id = generate_scan_id(scan_start)
+        output = os.path.join(self.output_dir, job_output_name(settings.get('output')) or f"{scan_id}.{fmt}")
+        self.queue.update(job.id, scan_id=scan_id, output=output)
+
+        scanner = self._scanner(job, settings)
+        results: Iterable[Row] = self._watch(job, scanner, scanner.iter_scan(
+            target=job.target,
+            ports=settings['ports'],
+            timeout=settings['timeout'],
+            rate_limit=settings['rate'],
+            scan_id=scan_id
+        ))
+
+        fieldnames = None
+        if self.vuln_index is not None:
+            from modules.vulndb import VULN_FIELDNAMES
+            fieldnames = FIELDNAMES + VULN_FIELDNAMES
+            results = self.vuln_index.annotate(results)
+
+        formatter = OutputFormatter(fieldnames=fieldnames, metrics=scanner.metrics, index=self._scan_index())
+        if fmt == 'json':
+            results = list(results)
+            summary = formatter._generate_summary(results)
+        else:
+            summary = formatter.save(results, output, fmt, write_metadata=False)
+
+        formatter.set_metadata(
+            scan_start=scan_start,
+            scan_end=datetime.now(),
+            target=job.target,
+            total_hosts=summary['unique_hosts'],
+            total_services=summary['total_services'],
+            scan_id=scanner.scan_id,
+            performance=scanner.metrics.as_dict()
+        )
+        if fmt == 'json':
+            formatter.save_as_json(results, output)
+        else:
+            formatter.save_metadata(formatter.output_path)
+        self.queue.update(job.id, output=formatter.output_path)
+        return summary
@@ -0,0 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Union
+from modules.scanner import NetworkScanner
+from modules.sharding import ShardedScanner, _scan_shard
+from utils.records import Host
+
+# Phase 1: ping + SYN sweep, no DNS, only report open ports
+DISCOVERY_ARGS = ["-sS", "-n", "--open"]
+
+# Phase 2 targets are already known to be up
+PROBE_EXTRA_ARGS = ["-Pn"]
+
+
+class ScanEngine(NetworkScanner):
+    """
+    Two-phase scan engine.
+
+    Phase 1 runs a cheap host discovery and SYN port sweep over the whole
+    target. Phase 2 runs the expensive version and OS detection only against
+    live hosts with open ports, restricted to the ports phase 1 found. On
+    sparse networks this skips -sV/-O work for every empty address.
+
+    With `connect` settings (see ConnectScanner) phase 1 is an unprivileged
+    asyncio connect() sweep instead of the nmap SYN sweep.
+
+    Hosts come out of the same _iter_nmap_hosts() hook as NetworkScanner,
+    so iter_scan()/scan() and the output writers work unchanged.
+    """
+
+    def __init__(self, verbose: bool = False, show_progress: bool = True,
+                 workers: int = 1, batch_size: int = 64, connect: Optional[Dict] = None, **kwargs):
+        super().__init__(verbose=verbose, show_progress=show_progress, **kwargs)
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.connect = connect
+
+    def _discovery_scanner(self) -> NetworkScanner:
+        if self.connect is not None:
+            from modules.connect_scan import ConnectScanner
+            scanner = ConnectScanner.from_options(
+                dict(self.worker_options(show_progress=self.show_progress), **self.connect)
+            )
+            scanner.metrics = self.metrics
+            return scanner
+
+        options = self.worker_options(probe_args=DISCOVERY_ARGS, show_progress=self.show_progress)
+        if self.workers > 1:
+            scanner = ShardedScanner.from_options(dict(options, workers=self.workers))
+        else:
+            scanner = NetworkScanner.from_options(options)
+        scanner.metrics = self.metrics
+        scanner.rate_control = self.rate_control
+        return scanner
+
+    def discover(self, target: Union[str, List[str]], ports: str) -> Dict[str, Host]:
+        """Phase 1: return live hosts with at least one open port, keyed by IP"""
+        live = {}
+        for host in self._discovery_scanner()._iter_nmap_hosts(target, ports):
+            if host.ports:
+                live[host.ip] = host
+
+        self._log(f"Discovery found {len(live)} live hosts with open ports")
+        return live
+
+    def _batches(self, live: Dict[str, Host]) -> List[Dict]:
+        """Group live hosts into phase 2 batches with the union of their open ports"""
+        batches = []
+        ips = list(live)
+        for i in range(0, len(ips), self.batch_size):
+            batch_ips = ips[i:i + self.batch_size]
+            ports = sorted({int(p.port) for ip in batch_ips for p in live[ip].ports})
+            batches.append({
+                'targets': batch_ips,
+                'ports': ','.join(str(p) for p in ports)
+            })
+        return batches
+
+    def _probe(self, batches: List[Dict]) -> Iterator[Host]:
+        """Phase 2: version and OS detection on each batch"""
+        if self.workers == 1:
+            for batch in batches:
+                yield from super()._iter_nmap_hosts(batch['targets'], batch['ports'], PROBE_EXTRA_ARGS)
+            return
+
+        if self.rate_control is not None:
+            # Probe with the rate discovery settled on
+            self.rate_limit, self.min_rate = self.rate_control.rate, self.rate_control.min_rate
+        options = self.worker_options(share=min(self.workers, len(batches)))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(_scan_shard, i, batch['targets'], batch['ports'], PROBE_EXTRA_ARGS, options)
+                for i, batch in enumerate(batches)
+            ]
+            for future in as_completed(futures):
+                _, hosts, metrics, _ = future.result()
+                self.metrics.merge(metrics)
+                yield from hosts
+
+    def probe(self, live: Dict[str, Host]) -> Iterator[Host]:
+        """Phase 2 for the given discovery results, yielding one host each"""
+        live = dict(live)
+        if not live:
+            return
+
+        for host in self._probe(self._batches(live)):
+            if live.pop(host.ip, None) is not None:
+                yield host
+
+        # Hosts phase 2 lost (e.g. went down) still report their open ports
+        for host in live.values():
+            self._log(f"No probe results for {host.ip}, keeping discovery data", "WARNING")
+            yield host
+
+    def _iter_nmap_hosts(self, target: Union[str, List[str]], ports: str, additional_args=None,
+                         stream=None) -> Iterator[Host]:
+        yield from self.probe(self.discover(target, ports))
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Dict, Iterator, List, Union
+from core.engine import ScanEngine
+from utils.parser import FIELDNAMES
+from utils.records import Host, Row
+from utils.state import ScanState
+from utils.targets import TargetSet
+
+# Result rows carry an extra column saying what happened to the service
+INCREMENTAL_FIELDNAMES = FIELDNAMES + ['change']
+
+
+class IncrementalScanner(ScanEngine):
+    """
+    Differential rescans against a persistent ScanState.
+
+    Every target still gets the cheap discovery sweep. Hosts whose open
+    ports match the stored state and were probed within `ttl` seconds skip
+    version/OS detection entirely. Only new, changed and disappeared
+    services are yielded, each tagged in the `change` column.
+    """
+
+    def __init__(self, state: ScanState, ttl: float = 86400, **kwargs):
+        super().__init__(**kwargs)
+        self.state = state
+        self.ttl = ttl
+        self.hosts_skipped = 0
+
+    def _unchanged(self, host: Host) -> bool:
+        ip = host.ip
+        ports = {(p.port, p.protocol) for p in host.ports}
+        return ports == self.state.host_ports(ip) and self.state.is_fresh(ip, self.ttl)
+
+    def _iter_rows(self, target: Union[str, List[str], TargetSet], ports: str) -> Iterator[Row]:
+        live = self.discover(target, ports)
+
+        stale = {}
+        for ip, host in live.items():
+            if self._unchanged(host):
+                self.hosts_skipped += 1
+            else:
+                stale[ip] = host
+        self._log(f"{self.hosts_skipped} hosts unchanged within TTL, probing {len(stale)}")
+
+        for host in self.probe(stale):
+            self.hosts_found += 1
+            with self.metrics.stage('row_build'):
+                rows = list(self._host_rows(host))
+            self.metrics.count('hosts')
+            self.metrics.count('ports', len(rows))
+            for row in rows:
+                change = self.state.diff(row)
+                if change:
+                    self.services_found += 1
+                    self._log(f"{change.capitalize()}: {row['target_ip']}:{row['port']} - {row['service']} {row['version']}")
+                    yield row.annotate(change=change)
+
+            # Ports that closed on a host that's still up
+            seen = {(p.port, p.protocol) for p in host.ports}
+            for previous in self.state.host_rows(host.ip):
+                if (previous['port'], previous['protocol']) not in seen:
+                    yield self._gone(previous)
+
+            self.state.replace_host(host.ip, rows)
+
+        # Hosts in scope that no longer answer or have no open ports
+        scope = target
+        if not isinstance(target, TargetSet):
+            scope = TargetSet.parse(target if isinstance(target, str) else ' '.join(target))
+        for ip in self.state.hosts():
+            if ip not in live and ip in scope:
+                for previous in self.state.host_rows(ip):
+                    yield self._gone(previous)
+                self.state.remove_host(ip)
+
+        self.state.save()
+        self._finish()
+
+    def _gone(self, previous: Dict) -> Dict:
+        self.services_found += 1
+        self._log(f"Gone: {previous['target_ip']}:{previous['port']} - {previous['service']}")
+        return dict(previous, timestamp=datetime.now().isoformat(), scan_id=self.scan_id, change='gone')
@@ -0,0 +1,273 @@
+import asyncio
+import os
+import signal
+import time
+import xml.etree.ElementTree as ET
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+from modules.nmap_xml import NmapXmlStream
+from modules.scanner import NetworkScanner
+from utils.records import Host
+from utils.metrics import ScanMetrics
+from utils.progress import NullProgress, make_progress
+
+
+class ScanJob:
+    """One nmap run managed by AsyncScanOrchestrator"""
+
+    def __init__(self, targets: Union[str, List[str]], ports: Optional[str] = None,
+                 additional_args: Optional[List[str]] = None, timeout: Optional[float] = None,
+                 job_id: Optional[str] = None):
+        self.targets = [targets] if isinstance(targets, str) else list(targets)
+        self.ports = ports
+        self.additional_args = additional_args or []
+        self.timeout = timeout
+        self.job_id = job_id or ' '.join(self.targets)
+
+        self.status = 'pending'  # pending -> running -> done | failed | timeout | cancelled
+        self.hosts: List[Host] = []
+        self.task = ''
+        self.progress = 0.0
+        self.returncode = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        # perf_counter() when nmap was spawned, for time-to-first-byte
+        self.spawned = None
+
+    def __repr__(self):
+        return f"<ScanJob {self.job_id} {self.status} hosts={len(self.hosts)}>"
+
+
+class AsyncScanOrchestrator:
+    """
+    Runs many nmap processes concurrently from one event loop.
+
+    At most `concurrency` nmap processes run at once. Their stdout is read
+    without blocking and fed through NmapXmlStream, so hosts surface while
+    each scan is still running. Every job can have its own timeout, and
+    `global_timeout` bounds the whole batch; when either expires the nmap
+    process is terminated (then killed) rather than left running.
+
+    Commands are built by a template NetworkScanner, so probe args, rate
+    limits and timing settings are shared with the synchronous scanner.
+    """
+
+    KILL_GRACE = 5
+
+    # Longest nmap output line read, each <script output="..."> is one line
+    # and easily outgrows asyncio's 64 KiB default. Longer fails the job.
+    LINE_LIMIT = 16 * 1024 * 1024
+
+    def __init__(self, scanner: Optional[NetworkScanner] = None, concurrency: int = 8,
+                 global_timeout: Optional[float] = None, show_progress: bool = True,
+                 on_host: Optional[Callable[[ScanJob, Host], None]] = None,
+                 keep_hosts: bool = True):
+        self.scanner = scanner or NetworkScanner(show_progress=False)
+        self.concurrency = max(1, concurrency)
+        self.global_timeout = global_timeout
+        self.show_progress = show_progress
+        self.on_host = on_host
+        # Streaming consumers can drop hosts from jobs to keep memory flat
+        self.keep_hosts = keep_hosts
+        self._deadline = None
+        self._progress = NullProgress()
+        # Spawn/first byte/parse timings and counters across every job
+        self.metrics = ScanMetrics()
+
+    def _log(self, message: str, level: str = "INFO"):
+        self.scanner._log(message, level)
+
+    def _remaining(self, job: ScanJob) -> Optional[float]:
+        """Seconds this job may still run given its own and the global deadline"""
+        limits = []
+        if job.timeout is not None:
+            limits.append(job.timeout)
+        if self._deadline is not None:
+            limits.append(self._deadline - time.monotonic())
+        return min(limits) if limits else None
+
+    async def _terminate(self, proc: asyncio.subprocess.Process) -> None:
+        """SIGTERM the nmap process group, SIGKILL if it doesn't exit in time"""
+        if proc.returncode is not None:
+            return
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                if os.getpgid(proc.pid) == proc.pid:
+                    os.killpg(proc.pid, sig)
+                else:
+                    proc.send_signal(sig)
+            except ProcessLookupError:
+                return
+            try:
+                await asyncio.wait_for(proc.wait(), self.KILL_GRACE)
+                return
+            except asyncio.TimeoutError:
+                continue
+
+    def _on_progress(self, job: ScanJob, event: Dict) -> None:
+        """Record the job's current nmap phase and feed the shared tracker"""
+        job.task = event.get('task', job.task)
+        if event['event'] == 'taskprogress':
+            job.progress = event.get('percent', job.progress)
+        self._progress.handle(event, job.job_id)
+
+    async def _read(self, job: ScanJob, proc: asyncio.subprocess.Process,
+                    emit: Callable[[ScanJob, Host], None]) -> None:
+        stream = NmapXmlStream(on_progress=lambda event: self._on_progress(job, event))
+        metrics = self.metrics
+        first = True
+        while True:
+            raw = await proc.stdout.readline()
+            if not raw:
+                break
+            parse_start = time.perf_counter()
+            if first:
+                metrics.add('first_byte', parse_start - job.spawned)
+                first = False
+            metrics.count('bytes_read', len(raw))
+            line = raw.decode('utf-8', errors='replace')
+            try:
+                hosts = list(stream.feed_line(line))
+                metrics.add('xml_parse', time.perf_counter() - parse_start)
+                for host in hosts:
+                    emit(job, host)
+            except ET.ParseError as e:
+                job.error = f"Malformed nmap XML: {e}"
+                self._log(f"[{job.job_id}] {job.error}", "WARNING")
+                # Nobody reads the pipe any more, nmap would block on it
+                await self._terminate(proc)
+                return
+
+        if stream.started and not stream.finished:
+            try:
+                for host in stream.close():
+                    emit(job, host)
+            except ET.ParseError as e:
+                self._log(f"[{job.job_id}] Incomplete nmap XML: {e}", "WARNING")
+
+    async def run_job(self, job: ScanJob, semaphore: asyncio.Semaphore,
+                      emit: Optional[Callable[[ScanJob, Host], None]] = None) -> ScanJob:
+        """Run one job once a concurrency slot is free"""
+        def record(job, host):
+            self.metrics.count('hosts')
+            self.metrics.count('ports', len(host.ports))
+            if self.keep_hosts:
+                job.hosts.append(host)
+            if self.on_host:
+                self.on_host(job, host)
+            if emit:
+                emit(job, host)
+
+        async with semaphore:
+            remaining = self._remaining(job)
+            if remaining is not None and remaining <= 0:
+                job.status = 'timeout'
+                job.error = 'Deadline passed before the job started'
+                return job
+
+            cmd = self.scanner._build_command(job.targets, job.ports, job.additional_args,
+                                              stats=self._progress.enabled)
+            self._log(f"[{job.job_id}] Running: {' '.join(cmd)}", "DEBUG")
+
+            job.status = 'running'
+            job.started = time.time()
+            spawn_start = time.perf_counter()
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    start_new_session=os.geteuid() == 0,
+                    limit=self.LINE_LIMIT
+                )
+            except OSError as e:
+                job.status = 'failed'
+                job.error = f"Cannot start nmap: {e}"
+                job.finished = time.time()
+                self._progress.shard_done(job.job_id)
+                return job
+            job.spawned = time.perf_counter()
+            self.metrics.add('spawn', job.spawned - spawn_start)
+            self.metrics.count('nmap_runs')
+
+            async def finish() -> int:
+                await self._read(job, proc, record)
+                return await proc.wait()
+
+            try:
+                # The deadline covers nmap exiting too, not just its output ending
+                job.returncode = await asyncio.wait_for(finish(), remaining)
+                if job.returncode and job.error is None:
+                    job.error = f"nmap exited with code {job.returncode}"
+                job.status = 'failed' if job.error else 'done'
+            except (ValueError, asyncio.LimitOverrunError) as e:
+                # A line beyond LINE_LIMIT
+                job.status = 'failed'
+                job.error = f"Unreadable nmap output: {e}"
+                self._log(f"[{job.job_id}] {job.error}", "WARNING")
+            except asyncio.TimeoutError:
+                job.status = 'timeout'
+                job.error = f"Job exceeded its deadline after {time.time() - job.started:.1f}s"
+                self._log(f"[{job.job_id}] {job.error}", "WARNING")
+            except asyncio.CancelledError:
+                job.status = 'cancelled'
+                raise
+            finally:
+                await self._terminate(proc)
+                job.finished = time.time()
+                self._progress.shard_done(job.job_id)
+
+        return job
+
+    def _start(self, jobs: List[ScanJob]) -> asyncio.Semaphore:
+        if self.global_timeout is not None:
+            self._deadline = time.monotonic() + self.global_timeout
+        self._progress = make_progress(self.show_progress, total_shards=len(jobs))
+        return asyncio.Semaphore(self.concurrency)
+
+    def _stop(self) -> None:
+        self._progress.close()
+        self._progress = NullProgress()
+
+    async def run(self, jobs: Iterable[ScanJob]) -> List[ScanJob]:
+        """Run every job and return them once all have finished"""
+        jobs = list(jobs)
+        semaphore = self._start(jobs)
+        try:
+            await asyncio.gather(*(self.run_job(job, semaphore) for job in jobs))
+        finally:
+            self._stop()
+        return jobs
+
+    async def stream(self, jobs: Iterable[ScanJob]) -> AsyncIterator[tuple]:
+        """Yield (job, host) pairs from all jobs as hosts complete"""
+        jobs = list(jobs)
+        semaphore = self._start(jobs)
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def runner(job):
+            try:
+                await self.run_job(job, semaphore, emit=lambda j, h: queue.put_nowait((j, h)))
+            finally:
+                queue.put_nowait(done)
+
+        tasks = [asyncio.ensure_future(runner(job)) for job in jobs]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            # Consumer stopped early or was cancelled: stop every nmap process
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._stop()
+
+    def run_sync(self, jobs: Iterable[ScanJob]) -> List[ScanJob]:
+        """Blocking wrapper around run() for non-async callers"""
+        return asyncio.run(self.run(jobs))
@@ -0,0 +1,417 @@
+import asyncio
+import errno
+import functools
+import os
+import resource
+import socket
+import struct
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+from modules.nmap_command import TOP_PORTS_RE, port_args
+from modules.scanner import NetworkScanner
+from utils.progress import make_progress
+from utils.records import Host, Port, intern
+from utils.targets import TargetSet
+
+# nmap's port frequency table, used for topN port specs when present
+NMAP_SERVICES_PATHS = (
+    '/usr/share/nmap/nmap-services',
+    '/usr/local/share/nmap/nmap-services',
+    '/opt/homebrew/share/nmap/nmap-services'
+)
+
+# nmap's 100 most frequent TCP ports in order, for topN without nmap-services
+TOP_TCP_PORTS = (
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000,
+    32768, 554, 26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081,
+    2049, 88, 79, 5800, 106, 2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144,
+    7, 389, 8009, 3128, 444, 9999, 5009, 7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646,
+    49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37
+)
+
+# Out of file descriptors: wait and retry rather than call the port closed
+FD_EXHAUSTED = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS}
+
+# SO_LINGER 0 closes with a RST, so sweeps don't leave TIME_WAIT sockets behind
+LINGER_RESET = struct.pack('ii', 1, 0)
+
+
+@functools.lru_cache(maxsize=None)
+def _frequent_ports() -> List[int]:
+    """TCP ports by descending frequency from nmap-services, empty when not installed"""
+    for path in NMAP_SERVICES_PATHS:
+        try:
+            with open(path) as f:
+                ranked = []
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 3 and not line.startswith('#') and fields[1].endswith('/tcp'):
+                        ranked.append((-float(fields[2]), int(fields[1][:-4])))
+        except (OSError, ValueError):
+            continue
+        return [port for _, port in sorted(ranked)]
+    return []
+
+
+def resolve_ports(ports: Optional[str]) -> List[int]:
+    """
+    TCP port numbers for a --ports value, in scan order.
+
+    Accepts the same specifications as port_args(). topN uses nmap's
+    frequency table when nmap is installed and TOP_TCP_PORTS otherwise,
+    padded with the remaining ports in ascending order. UDP (U:) and SCTP
+    (S:) items are skipped, a connect scan only covers TCP.
+
+    Raises:
+        ValueError: If the specification is malformed or selects no TCP port
+    """
+    port_args(ports)
+    spec = (ports or 'top1000').strip().replace(' ', '')
+    if spec.lower() == 'all':
+        return list(range(1, 65536))
+
+    top = TOP_PORTS_RE.match(spec)
+    if top:
+        count = min(65535, int(top.group(1)))
+        ranked = _frequent_ports() or list(TOP_TCP_PORTS)
+        if len(ranked) < count:
+            known = set(ranked)
+            ranked = ranked + [port for port in range(1, 65536) if port not in known]
+        return ranked[:count]
+
+    selected, seen, protocol = [], set(), 'T'
+    for item in spec.upper().split(','):
+        if ':' in item:
+            # nmap applies a protocol prefix to every item up to the next one
+            protocol, item = item.split(':', 1)
+        if protocol != 'T':
+            continue
+        low, _, high = item.partition('-')
+        for port in range(max(1, int(low)), int(high or low) + 1):
+            if port not in seen:
+                seen.add(port)
+                selected.append(port)
+    if not selected:
+        raise ValueError(f"No TCP ports in: {ports}")
+    return selected
+
+
+@functools.lru_cache(maxsize=4096)
+def _service_name(port: int) -> str:
+    """Service name from the system's services database, '' when unknown"""
+    try:
+        return intern(socket.getservbyport(port, 'tcp'))
+    except OSError:
+        return ''
+
+
+def _is_address(entry: str) -> bool:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, entry)
+            return True
+        except OSError:
+            pass
+    return False
+
+
+def open_fds() -> int:
+    """File descriptors this process has open, 0 when it can't be told"""
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return 0
+
+
+def fd_budget(requested: int, reserve: int) -> int:
+    """
+    Concurrent sockets the file descriptor limit allows, up to `requested`.
+
+    The soft RLIMIT_NOFILE is raised towards the hard limit first when it
+    is too low, which needs no privileges. `reserve` descriptors on top of
+    those already open are kept for everything else.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    in_use = open_fds() + reserve
+    wanted = requested + in_use
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        raised = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        if raised > soft:
+            try:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (raised, hard))
+                soft = raised
+            except (ValueError, OSError):
+                pass
+    if soft == resource.RLIM_INFINITY:
+        return max(1, requested)
+    return max(1, min(requested, soft - in_use))
+
+
+class RateLimiter:
+    """
+    Paces events to `rate` per second (asyncio).
+
+    Each acquire() reserves the next free slot on a virtual schedule and
+    sleeps until it comes up, so thousands of waiters cost one timer each
+    and are served in order. Up to `burst` events may go out back to back
+    after an idle spell.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.interval = 1.0 / rate
+        self.burst = burst or max(1, int(rate // 100))
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next, now - (self.burst - 1) * self.interval)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class ConnectScanner(NetworkScanner):
+    """
+    Unprivileged TCP connect() scanner on asyncio.
+
+    Needs neither root nor nmap: every port is probed with a plain
+    non-blocking connect(). Up to `concurrency` connects are in flight at
+    once (capped by the file descriptor limit), `rate_limit` paces connect
+    attempts across the whole scan and `host_rate` per target host. A port
+    that accepts is open, one that refuses is closed, and one that stays
+    silent for `connect_timeout` seconds is tried `retries` more times
+    before it counts as filtered.
+
+    Hosts come out of the same _iter_nmap_hosts() hook as NetworkScanner,
+    once all their ports are done, with open ports named from the system
+    services database. Only hosts that answered on some port are reported.
+    Use it alone for a fast open-port sweep, or as ScanEngine's discovery
+    phase so nmap only probes what it found. sweep() is the asyncio API.
+    """
+
+    # Connects in flight at once unless told otherwise
+    DEFAULT_CONCURRENCY = 1000
+
+    # Seconds per connect attempt, nmap's initial RTT timeout at -T3
+    DEFAULT_CONNECT_TIMEOUT = 1.0
+
+    # File descriptors kept free for output files, nmap and the interpreter
+    FD_RESERVE = 64
+
+    # Seconds to wait when the process runs out of descriptors anyway
+    FD_WAIT = 0.05
+
+    # Upper bound on hosts probed at once, each keeps its ports' state
+    MAX_ACTIVE_HOSTS = 4096
+
+    def __init__(self, verbose: bool = False, show_progress: bool = True,
+                 concurrency: Optional[int] = None, connect_timeout: Optional[float] = None,
+                 retries: int = 1, host_rate: Optional[float] = None, **kwargs):
+        super().__init__(verbose=verbose, show_progress=show_progress, **kwargs)
+        self.concurrency = max(1, concurrency or self.DEFAULT_CONCURRENCY)
+        self.connect_timeout = connect_timeout or self.DEFAULT_CONNECT_TIMEOUT
+        self.retries = max(0, retries)
+        self.host_rate = host_rate
+        # Concurrency the descriptor limit allowed for the last sweep
+        self.effective_concurrency = None
+
+    def worker_options(self, share: int = 1, **overrides) -> Dict:
+        options = super().worker_options(share, **overrides)
+        connect = {
+            'concurrency': max(1, self.concurrency // share),
+            'connect_timeout': self.connect_timeout,
+            'retries': self.retries,
+            'host_rate': self.host_rate
+        }
+        connect.update({key: value for key, value in overrides.items() if key in connect})
+        options.update(connect)
+        return options
+
+    def _window(self, ports: int, concurrency: int) -> int:
+        """Hosts to probe at once so the connect slots and the rate stay busy"""
+        window = 2 * -(-concurrency // ports)
+        if self.host_rate:
+            # The per-host rate needs enough hosts side by side to reach the global one
+            window = max(window, -(-(self.rate_limit or concurrency) // self.host_rate))
+        return max(1, min(self.MAX_ACTIVE_HOSTS, int(window)))
+
+    async def _resolve(self, name: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        try:
+            addresses = await loop.getaddrinfo(name, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError) as e:
+            self._log(f"Cannot resolve {name}: {e}", "WARNING")
+            return None
+        return addresses[0][4][0] if addresses else None
+
+    async def _probe(self, ip: str, port: int, slots: asyncio.Semaphore) -> Optional[bool]:
+        """True when the port accepted, False when it refused, None when nothing answered"""
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        metrics = self.metrics
+        attempts = 0
+        try:
+            while attempts <= self.retries:
+                try:
+                    sock = socket.socket(family, socket.SOCK_STREAM)
+                except OSError as e:
+                    if e.errno not in FD_EXHAUSTED:
+                        raise
+                    metrics.count('fd_waits')
+                    await asyncio.sleep(self.FD_WAIT)
+                    continue
+                sock.setblocking(False)
+                metrics.count('connects')
+                try:
+                    await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), self.connect_timeout)
+                except asyncio.TimeoutError:
+                    metrics.count('connect_timeouts')
+                    attempts += 1
+                except ConnectionRefusedError:
+                    return False
+                except OSError as e:
+                    if e.errno in FD_EXHAUSTED:
+                        metrics.count('fd_waits')
+                        await asyncio.sleep(self.FD_WAIT)
+                        continue
+                    # Unreachable, reset and the like: nothing we can talk to
+                    return None
+                else:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RESET)
+                    # A closed loopback port in the ephemeral range can be
+                    # "reached" by connecting to itself (TCP simultaneous open)
+                    return sock.getsockname() != sock.getpeername()
+                finally:
+                    sock.close()
+            return None
+        finally:
+            slots.release()
+
+    async def sweep(self, target: Union[str, List[str], TargetSet], ports: str) -> AsyncIterator[Host]:
+        """
+        Connect to every port of every target address, yielding each host
+        that answered as soon as all of its ports are done.
+
+        Raises:
+            ValueError: If the port specification is malformed
+        """
+        port_list = resolve_ports(ports)
+        if not isinstance(target, TargetSet):
+            target = TargetSet.parse(target if isinstance(target, str) else ' '.join(target))
+
+        concurrency = self.effective_concurrency = fd_budget(self.concurrency, self.FD_RESERVE)
+        if concurrency < self.concurrency:
+            self._log(f"File descriptor limit allows {concurrency} of {self.concurrency} concurrent connects",
+                      "WARNING")
+        window = self._window(len(port_list), concurrency)
+        self._log(f"Connect scan of {target.num_addresses} addresses x {len(port_list)} ports, "
+                  f"{concurrency} concurrent connects over up to {window} hosts")
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(concurrency)
+        host_slots = asyncio.Semaphore(window)
+        limiter = RateLimiter(self.rate_limit) if self.rate_limit else None
+        finished: asyncio.Queue = asyncio.Queue()
+        running = set()
+
+        progress = self.progress if self.progress is not None else make_progress(self.show_progress, desc="Connect Scan")
+        total = max(1, target.num_addresses)
+        completed = 0
+
+        async def scan_host(address: str) -> None:
+            nonlocal completed
+            probes = []
+            try:
+                ip, hostname = address, ''
+                if not _is_address(address):
+                    ip, hostname = await self._resolve(address), address
+                    if ip is None:
+                        return
+                host_limiter = RateLimiter(self.host_rate) if self.host_rate else None
+                for port in port_list:
+                    if host_limiter is not None:
+                        await host_limiter.acquire()
+                    if limiter is not None:
+                        await limiter.acquire()
+                    await slots.acquire()
+                    probes.append(loop.create_task(self._probe(ip, port, slots)))
+                states = await asyncio.gather(*probes)
+
+                open_ports = tuple(
+                    Port(intern(str(port)), 'tcp', 'open', _service_name(port))
+                    for port, state in zip(port_list, states) if state
+                )
+                if open_ports or False in states:
+                    finished.put_nowait(Host(ip, hostname, 'up', '', open_ports))
+            finally:
+                for probe in probes:
+                    probe.cancel()
+                host_slots.release()
+                completed += 1
+                if progress.enabled:
+                    progress.handle({'event': 'taskprogress', 'percent': 100.0 * completed / total}, 'connect')
+
+        async def feed() -> None:
+            try:
+                for address in target.addresses():
+                    await host_slots.acquire()
+                    task = loop.create_task(scan_host(address))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                # Surfaces the first error from any host
+                while running:
+                    await asyncio.gather(*running)
+            finally:
+                finished.put_nowait(None)
+
+        started = time.perf_counter()
+        feeder = loop.create_task(feed())
+        try:
+            while True:
+                host = await finished.get()
+                if host is None:
+                    break
+                yield host
+            await feeder
+        finally:
+            feeder.cancel()
+            for task in list(running):
+                task.cancel()
+            self.metrics.add('connect_sweep', time.perf_counter() - started)
+            if self.progress is None:
+                progress.close()
+            else:
+                progress.shard_done('connect')
+
+    def _iter_nmap_hosts(self, target: Union[str, List[str], TargetSet], ports: str, additional_args=None,
+                         stream=None) -> Iterator[Host]:
+        """Run sweep() on a private event loop, handing hosts over as they finish"""
+        loop = asyncio.new_event_loop()
+        hosts = self.sweep(target, ports)
+        try:
+            while True:
+                step = hosts.__anext__()
+                if self.deadline is not None:
+                    step = asyncio.wait_for(step, max(0.0, self.deadline - time.time()))
+                try:
+                    host = loop.run_until_complete(step)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    raise TimeoutError("Connect scan did not finish before the scan deadline")
+                yield host
+        finally:
+            try:
+                loop.run_until_complete(hosts.aclose())
+                # Probes still waiting when the scan stopped early
+                pending = asyncio.all_tasks(loop)
+                if pending:
+                    for task in pending:
+                        task.cancel()
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
@@ -0,0 +1,134 @@
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+# 80 | 1-1000 | T:80,U:53 | 22,80,8000-8100
+_PORT_ITEM = r'(?:[TUS]:)?\d{1,5}(?:-\d{1,5})?'
+PORT_SPEC_RE = re.compile(rf'^{_PORT_ITEM}(?:,{_PORT_ITEM})*$', re.IGNORECASE)
+TOP_PORTS_RE = re.compile(r'^top(\d+)$', re.IGNORECASE)
+
+TIMING_TEMPLATES = range(0, 6)
+
+
+def port_args(ports: Optional[str]) -> List[str]:
+    """
+    Translate a --ports value into nmap arguments.
+
+    Supports `all`, `topN` (e.g. top1000) and regular nmap port lists such as
+    `22,80,443`, `1-1024` or `T:80,U:53`.
+
+    Raises:
+        ValueError: If the specification is malformed or out of range
+    """
+    if ports is None or not ports.strip():
+        return []
+
+    spec = ports.strip().replace(' ', '')
+    if spec.lower() == 'all':
+        return ['-p-']
+
+    top = TOP_PORTS_RE.match(spec)
+    if top:
+        count = int(top.group(1))
+        if count < 1:
+            raise ValueError(f"Invalid port specification: {ports}")
+        return ['--top-ports', str(count)]
+
+    if not PORT_SPEC_RE.match(spec):
+        raise ValueError(f"Invalid port specification: {ports}")
+
+    for item in spec.split(','):
+        bounds = [int(p) for p in item.split(':')[-1].split('-')]
+        if any(p > 65535 for p in bounds) or bounds != sorted(bounds):
+            raise ValueError(f"Invalid port range '{item}' in: {ports}")
+
+    return ['-p', spec.upper()]
+
+
+def build_nmap_command(targets: Sequence[str],
+                       ports: Optional[str] = None,
+                       probe_args: Sequence[str] = (),
+                       additional_args: Sequence[str] = (),
+                       max_rate: Optional[int] = None,
+                       min_rate: Optional[int] = None,
+                       host_timeout: Optional[int] = None,
+                       timing: Optional[int] = None,
+                       stats_every: Optional[str] = "1s",
+                       nmap_path: str = "nmap",
+                       sudo: bool = True,
+                       input_file: Optional[str] = None) -> List[str]:
+    """
+    Build the argv for an nmap run that writes XML to stdout.
+
+    Args:
+        targets: nmap target arguments (IPs, CIDRs, hostnames)
+        ports: Port specification, see port_args()
+        probe_args: Scan/probe type flags, e.g. ["-sV", "-O"]
+        additional_args: Extra flags appended after the probe flags
+        max_rate: Upper bound on packets per second (--max-rate)
+        min_rate: Lower bound on packets per second (--min-rate)
+        host_timeout: Give up on a single host after this many seconds
+        timing: Timing template 0-5 (-T)
+        stats_every: Interval for <taskprogress> updates, None to disable
+        nmap_path: nmap executable
+        sudo: Prefix the command with sudo
+        input_file: Read targets from this file (-iL) instead of the argv
+
+    Returns:
+        Argument list suitable for subprocess
+    """
+    if not targets and not input_file:
+        raise ValueError("No targets to scan")
+
+    cmd = ["sudo"] if sudo else []
+    cmd += [nmap_path, *probe_args, *port_args(ports)]
+
+    if timing is not None:
+        if timing not in TIMING_TEMPLATES:
+            raise ValueError(f"Timing template must be 0-5, got {timing}")
+        cmd.append(f"-T{timing}")
+
+    if min_rate is not None and max_rate is not None and min_rate > max_rate:
+        raise ValueError(f"--min-rate {min_rate} is above --max-rate {max_rate}")
+    if min_rate is not None:
+        cmd += ["--min-rate", str(int(min_rate))]
+    if max_rate is not None:
+        cmd += ["--max-rate", str(int(max_rate))]
+
+    if host_timeout is not None:
+        cmd += ["--host-timeout", f"{int(host_timeout)}s"]
+
+    cmd += list(additional_args)
+
+    if stats_every:
+        cmd += ["--stats-every", stats_every]
+
+    cmd += ["-oX", "-"]
+    cmd += ["-iL", input_file] if input_file else list(targets)
+    return cmd
+
+
+@contextmanager
+def exclude_file(addresses: Iterable[str]) -> Iterator[List[str]]:
+    """
+    nmap arguments excluding `addresses`, written to an --excludefile.
+
+    A comma separated --exclude is a single argv string, which the kernel
+    caps at 128 KiB (about 12k addresses). The file is removed on exit.
+
+    Yields:
+        ['--excludefile', path], or [] when there is nothing to exclude
+    """
+    addresses = list(addresses)
+    if not addresses:
+        yield []
+        return
+
+    with tempfile.NamedTemporaryFile('w', prefix='spectre-exclude-', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(addresses))
+    try:
+        yield ['--excludefile', f.name]
+    finally:
+        os.unlink(f.name)
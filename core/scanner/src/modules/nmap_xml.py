@@ -0,0 +1,176 @@
+import statistics
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import Dict, Iterator, Optional
+from utils.records import Host, Port, intern
+
+
+def parse_host(host_elem) -> Optional[Host]:
+    """Parse individual host from XML"""
+    # Get IP address
+    addr = host_elem.find('.//address[@addrtype="ipv4"]')
+    ip = addr.get('addr', '') if addr is not None else ''
+    if not ip:
+        return None
+
+    # Get hostname
+    hostname = host_elem.find('.//hostname')
+
+    # Get host state
+    status = host_elem.find('.//status')
+
+    # Get OS guess
+    os_match = host_elem.find('.//osmatch')
+
+    # Parse ports
+    ports = []
+    for port in host_elem.findall('.//port'):
+        port_data = parse_port(port)
+        if port_data:
+            ports.append(port_data)
+
+    return Host(
+        ip=ip,
+        hostname=hostname.get('name', '') if hostname is not None else '',
+        state=intern(status.get('state', '')) if status is not None else '',
+        os_guess=intern(os_match.get('name', '')) if os_match is not None else '',
+        ports=tuple(ports)
+    )
+
+
+def parse_port(port_elem) -> Optional[Port]:
+    """Parse individual port from XML"""
+    # Get port state
+    state = port_elem.find('.//state')
+    if state is None or state.get('state') != 'open':
+        return None
+
+    # Get service info, values repeat across hosts so share the strings
+    service = port_elem.find('.//service')
+    if service is None:
+        service = {}
+
+    return Port(
+        port=intern(port_elem.get('portid', '')),
+        protocol=intern(port_elem.get('protocol', '')),
+        state='open',
+        service=intern(service.get('name', '')),
+        version=intern(service.get('version', '')),
+        product=intern(service.get('product', ''))
+    )
+
+
+TASK_EVENTS = ('taskbegin', 'taskprogress', 'taskend')
+
+# Most recent per-host srtt samples kept for median_srtt()
+SRTT_WINDOW = 1024
+
+
+def task_event(elem) -> Dict:
+    """Convert a <taskbegin>/<taskprogress>/<taskend> element to a progress event"""
+    event = {'event': elem.tag, 'task': elem.get('task', '')}
+    if elem.tag == 'taskprogress':
+        event['percent'] = float(elem.get('percent', 0) or 0)
+        if elem.get('remaining'):
+            event['remaining'] = int(elem.get('remaining'))
+        if elem.get('etc'):
+            event['etc'] = int(elem.get('etc'))
+    return event
+
+
+class NmapXmlStream:
+    """
+    Incremental parser for nmap's -oX output.
+
+    Text is fed in as it arrives from the nmap process and every completed
+    <host> element is parsed and yielded as soon as its closing tag is seen.
+    Finished top-level elements are detached from the document root, so
+    memory stays flat regardless of how many hosts the scan covers.
+    """
+
+    def __init__(self, host_parser=parse_host, on_progress=None):
+        self._host_parser = host_parser
+        # Called with a dict for every <taskbegin>/<taskprogress>/<taskend>
+        self.on_progress = on_progress
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._depth = 0
+        self.started = False
+        self.finished = False
+        self.scan_info = {}
+        self.hosts_seen = 0
+        # Per-host smoothed RTTs (microseconds) and the <runstats> totals
+        self.srtts = deque(maxlen=SRTT_WINDOW)
+        self.run_stats = {}
+
+    def feed_line(self, line: str) -> Iterator[Host]:
+        """
+        Feed one line of nmap output.
+
+        Anything before the opening <nmaprun> tag (warnings, DTD, stylesheet)
+        is skipped, matching how nmap output was collected previously.
+        """
+        if not self.started:
+            stripped = line.lstrip()
+            if not stripped.startswith('<nmaprun'):
+                return iter(())
+            self.started = True
+            line = stripped
+        return self.feed(line)
+
+    def feed(self, data: str) -> Iterator[Host]:
+        """Feed raw XML text and yield any hosts completed by it"""
+        self.started = True
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> Iterator[Host]:
+        """Flush the parser at end of input and yield remaining hosts"""
+        self._parser.close()
+        return self._drain()
+
+    def median_srtt(self) -> Optional[float]:
+        """Median smoothed RTT of recent hosts in microseconds, None before any"""
+        return statistics.median(self.srtts) if self.srtts else None
+
+    def _drain(self) -> Iterator[Host]:
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                self._depth += 1
+                continue
+
+            self._depth -= 1
+
+            if elem.tag == 'scaninfo':
+                self.scan_info = {
+                    'type': elem.get('type', ''),
+                    'protocol': elem.get('protocol', ''),
+                    'services': elem.get('services', '')
+                }
+            elif elem.tag == 'host':
+                self.hosts_seen += 1
+                times = elem.find('times')
+                if times is not None and times.get('srtt', '').isdigit():
+                    self.srtts.append(int(times.get('srtt')))
+                host_data = self._host_parser(elem)
+                if host_data:
+                    yield host_data
+            elif elem.tag in TASK_EVENTS:
+                if self.on_progress is not None:
+                    self.on_progress(task_event(elem))
+            elif elem.tag == 'hosts' and self._depth == 2:
+                # <runstats><hosts up="" down="" total=""/>
+                for key in ('up', 'down', 'total'):
+                    if elem.get(key, '').isdigit():
+                        self.run_stats[key] = int(elem.get(key))
+            elif elem.tag == 'finished':
+                self.run_stats['elapsed'] = float(elem.get('elapsed', 0) or 0)
+            elif elem is self._root:
+                self.finished = True
+
+            # Detach finished top-level children so the tree never grows
+            if self._depth == 1 and self._root is not None:
+                self._root.remove(elem)
+                elem.clear()
@@ -0,0 +1,157 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# nmap's own congestion messages, "Increasing send delay for 10.0.0.1 from 0 to 5
+# due to 11 out of 33 dropped probes" and "giving up on port because retransmission cap hit"
+DROP_RE = re.compile(r'dropped probes|retransmission cap hit|Increasing send delay', re.IGNORECASE)
+
+# --adaptive-rate MIN:MAX
+BOUNDS_RE = re.compile(r'^(\d+):(\d+)$')
+
+
+class RunStats(NamedTuple):
+    """Feedback from one finished nmap run (a shard or a batch)"""
+    addresses: int
+    hosts: int
+    elapsed: float
+    rate: Optional[int] = None
+    srtt: Optional[float] = None
+    drops: int = 0
+
+    @property
+    def throughput(self) -> float:
+        """Addresses completed per second"""
+        return self.addresses / max(self.elapsed, 0.001)
+
+
+def parse_bounds(spec: str) -> Tuple[int, int]:
+    """
+    Parse an --adaptive-rate MIN:MAX value.
+
+    Raises:
+        ValueError: If the bounds are malformed or MIN is above MAX
+    """
+    match = BOUNDS_RE.match(spec.strip()) if spec else None
+    if not match:
+        raise ValueError(f"--adaptive-rate expects MIN:MAX packets per second, got: {spec}")
+    low, high = int(match.group(1)), int(match.group(2))
+    if low < 1 or low > high:
+        raise ValueError(f"--adaptive-rate minimum must be between 1 and the maximum, got: {spec}")
+    return low, high
+
+
+def count_drops(stderr: str) -> int:
+    """Lines in nmap's stderr reporting dropped probes or retransmission caps"""
+    return sum(1 for line in stderr.splitlines() if DROP_RE.search(line))
+
+
+class RateController:
+    """
+    AIMD control of nmap's packet rate and shard parallelism.
+
+    Each finished nmap run reports a RunStats. A run is congested when nmap
+    complained about dropped probes, when its median smoothed RTT (from the
+    per-host <times srtt>) rose above `rtt_tolerance` times the lowest
+    median seen so far, or when its completion rate fell below `slowdown`
+    of the best run despite being allotted at least the same rate.
+
+    Congestion multiplies the rate by `decrease` and halves parallelism, a
+    clean run adds `increase` packets per second and one more concurrent
+    shard. Later runs are built from `rate`, `min_rate` and `parallelism`,
+    always within the operator's bounds, so throughput climbs until the
+    link pushes back.
+    """
+
+    # Share of the rate passed as --min-rate after a clean run, so nmap's
+    # own slow start doesn't undo the increase
+    MIN_RATE_SHARE = 0.5
+
+    def __init__(self, rate: int, floor: int, ceiling: int, max_parallelism: int = 1,
+                 increase: Optional[int] = None, decrease: float = 0.5,
+                 rtt_tolerance: float = 2.0, slowdown: float = 0.33):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.rate = min(self.ceiling, max(self.floor, rate))
+        self.max_parallelism = max(1, max_parallelism)
+        self.parallelism = self.max_parallelism
+        # Additive step defaults to a twentieth of the range
+        self.increase = increase or max(1, (self.ceiling - self.floor) // 20)
+        self.decrease = decrease
+        self.rtt_tolerance = rtt_tolerance
+        self.slowdown = slowdown
+        self.congested = False
+        self.base_srtt = None
+        # (addresses per second, allotted rate) of the fastest run
+        self.best = None
+        self.runs = 0
+        self.increases = 0
+        self.decreases = 0
+        self.history: List[Dict] = []
+
+    @property
+    def min_rate(self) -> Optional[int]:
+        """--min-rate for the next run, None while backing off so nmap can slow down"""
+        if self.congested or not self.runs:
+            return None
+        return max(self.floor, int(self.rate * self.MIN_RATE_SHARE))
+
+    def _congestion(self, stats: RunStats) -> Optional[str]:
+        """Why a run looks congested, None when it doesn't"""
+        if stats.drops:
+            return f"{stats.drops} drop warnings"
+        if stats.srtt and self.base_srtt and stats.srtt > self.base_srtt * self.rtt_tolerance:
+            return f"srtt {stats.srtt / 1000:.1f}ms vs {self.base_srtt / 1000:.1f}ms baseline"
+        if self.best and stats.addresses and stats.rate and stats.rate >= self.best[1]:
+            if stats.throughput < self.best[0] * self.slowdown:
+                return f"completion rate {stats.throughput:.0f} addr/s vs {self.best[0]:.0f} at a lower rate"
+        return None
+
+    def observe(self, stats: RunStats) -> Optional[str]:
+        """
+        Adjust rate and parallelism after a run.
+
+        Returns the congestion reason when the run triggered a decrease.
+        """
+        self.runs += 1
+        reason = self._congestion(stats)
+
+        if stats.srtt:
+            self.base_srtt = min(self.base_srtt or stats.srtt, stats.srtt)
+        if stats.addresses and (self.best is None or stats.throughput > self.best[0]):
+            self.best = (stats.throughput, stats.rate or 0)
+
+        previous = self.rate
+        if reason:
+            self.rate = max(self.floor, int(self.rate * self.decrease))
+            self.parallelism = max(1, self.parallelism // 2)
+            self.decreases += 1
+        else:
+            self.rate = min(self.ceiling, self.rate + self.increase)
+            self.parallelism = min(self.max_parallelism, self.parallelism + 1)
+            if self.rate > previous:
+                self.increases += 1
+        self.congested = reason is not None
+
+        self.history.append({
+            'rate': previous,
+            'next_rate': self.rate,
+            'parallelism': self.parallelism,
+            'throughput': round(stats.throughput, 1),
+            'srtt_ms': round(stats.srtt / 1000, 2) if stats.srtt else None,
+            'drops': stats.drops,
+            'congestion': reason
+        })
+        return reason
+
+    def as_dict(self) -> Dict:
+        """Summary for the scan's performance metadata"""
+        return {
+            'floor': self.floor,
+            'ceiling': self.ceiling,
+            'final_rate': self.rate,
+            'parallelism': self.parallelism,
+            'runs': self.runs,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'history': self.history
+        }
@@ -1,173 +1,357 @@
+import os
+import signal
 import time
 import subprocess
+import tempfile
+import threading
 import xml.etree.ElementTree as ET
 import json
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Union
 import re
 from datetime import datetime
-from tqdm import tqdm
-from sshkey_tools.keys import RsaPrivateKey
+from utils.ids import generate_scan_id
+from utils.records import Host, Port, Result, intern
+from modules.nmap_xml import NmapXmlStream, parse_host, parse_port
+from modules.nmap_command import build_nmap_command, port_args
+from modules.rate_control import RateController, RunStats, count_drops
+from utils.metrics import ScanMetrics
+from utils.progress import STATS_INTERVAL, make_progress
+from utils.targets import TargetSet
+
+# Characters handed to the XML parser at a time by _parse_nmap_xml
+XML_FEED_CHUNK = 64 * 1024
 
 class NetworkScanner:
-    def __init__(self, verbose: bool = False):
+    # Service/OS probes run against every target by default
+    DEFAULT_PROBE_ARGS = ["-sV", "-O"]
+
+    # Seconds between SIGTERM and SIGKILL when the scan deadline passes
+    KILL_GRACE = 5
+
+    # Environment variable overriding the nmap executable
+    NMAP_PATH_ENV = "SPECTRE_NMAP"
+
+    # Addresses per nmap run when scanning a TargetSet
+    TARGET_BATCH = 65536
+
+    # Longer target lists go to nmap through an -iL file instead of argv
+    MAX_ARGV_TARGETS = 256
+
+    def __init__(self, verbose: bool = False, show_progress: bool = True,
+                 probe_args: Optional[List[str]] = None,
+                 timing: Optional[int] = None, host_timeout: Optional[int] = None,
+                 min_rate: Optional[int] = None,
+                 nmap_path: Optional[str] = None, sudo: bool = True):
         self.verbose = verbose
+        self.show_progress = show_progress
+        self.probe_args = list(self.DEFAULT_PROBE_ARGS if probe_args is None else probe_args)
+        self.timing = timing
+        self.host_timeout = host_timeout
+        self.min_rate = min_rate
+        self.nmap_path = nmap_path or os.environ.get(self.NMAP_PATH_ENV) or "nmap"
+        self.sudo = sudo
+        # Shared ProgressTracker when a caller drives several nmap runs
+        self.progress = None
+        # Adjusts rate_limit/min_rate between nmap runs when set
+        self.rate_control: Optional[RateController] = None
+        # RunStats of the most recent nmap run
+        self.last_run: Optional[RunStats] = None
+        # The nmap process currently running, for stop()
+        self.process: Optional[subprocess.Popen] = None
+        # Stage timings and counters, replaced per scan by iter_scan()
+        self.metrics = ScanMetrics()
+        # Set per scan by iter_scan()
+        self.rate_limit = None
+        self.deadline = None
         self.scan_start = None
         self.scan_end = None
+        self.scan_id = None
+        self.hosts_found = 0
+        self.services_found = 0
     
     def _log(self, message: str, level: str = "INFO"):
         """Print log messages if verbose mode is enabled"""
         if self.verbose:
             print(f"[{level}] {message}")
+
+    def worker_options(self, share: int = 1, **overrides) -> Dict:
+        """
+        Picklable settings for recreating this scanner in another process.
+
+        `share` splits the packet rate budget between that many concurrent
+        nmap processes so the overall --rate still holds.
+        """
+        options = {
+            'verbose': self.verbose,
+            'show_progress': False,
+            'probe_args': self.probe_args,
+            'timing': self.timing,
+            'host_timeout': self.host_timeout,
+            'min_rate': self.min_rate,
+            'nmap_path': self.nmap_path,
+            'sudo': self.sudo,
+            'rate_limit': self.rate_limit,
+            'deadline': self.deadline
+        }
+        if share > 1:
+            if options['rate_limit']:
+                options['rate_limit'] = max(1, options['rate_limit'] // share)
+            if options['min_rate']:
+                options['min_rate'] = max(1, options['min_rate'] // share)
+        options.update(overrides)
+        return options
+
+    @classmethod
+    def from_options(cls, options: Dict) -> 'NetworkScanner':
+        """Inverse of worker_options()"""
+        options = dict(options)
+        rate_limit = options.pop('rate_limit', None)
+        deadline = options.pop('deadline', None)
+        scanner = cls(**options)
+        scanner.rate_limit = rate_limit
+        scanner.deadline = deadline
+        return scanner
+
+    def _build_command(self, targets: List[str], ports: Optional[str], additional_args=None,
+                       stats: Optional[bool] = None, input_file: Optional[str] = None) -> List[str]:
+        """nmap argv for this scanner's settings, `stats` forces progress output on or off"""
+        if stats is None:
+            # Progress events are only worth nmap's extra output when shown
+            stats = self.show_progress or self.progress is not None
+        min_rate = self.min_rate
+        if min_rate and self.rate_limit:
+            min_rate = min(min_rate, self.rate_limit)
+        return build_nmap_command(
+            targets,
+            ports=ports,
+            probe_args=self.probe_args,
+            additional_args=additional_args or [],
+            max_rate=self.rate_limit,
+            min_rate=min_rate,
+            host_timeout=self.host_timeout,
+            timing=self.timing,
+            stats_every=STATS_INTERVAL if stats else None,
+            nmap_path=self.nmap_path,
+            sudo=self.sudo,
+            input_file=input_file
+        )
+
+    def _terminate(self, proc: subprocess.Popen) -> None:
+        """Stop nmap, escalating to SIGKILL if it ignores SIGTERM"""
+        if proc.poll() is not None:
+            return
+        # When nmap runs in its own process group, signal all of it so no
+        # child keeps the stdout pipe open. sudo relays SIGTERM to nmap.
+        self._signal(proc, signal.SIGTERM)
+        try:
+            proc.wait(self.KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            self._signal(proc, signal.SIGKILL)
+            proc.wait()
+
+    def stop(self) -> None:
+        """Terminate the running nmap process, if any, from another thread"""
+        proc = self.process
+        if proc is not None:
+            self._terminate(proc)
+
+    def _signal(self, proc: subprocess.Popen, sig: int) -> None:
+        try:
+            if os.getpgid(proc.pid) == proc.pid:
+                os.killpg(proc.pid, sig)
+                return
+        except (ProcessLookupError, PermissionError):
+            pass
+        proc.send_signal(sig)
     
-    import subprocess
+    def _run_nmap(self, target: str, ports: str, additional_args=None) -> Dict:
+        """Run nmap and collect every parsed host into a single result dict"""
+        stream = NmapXmlStream()
+        hosts = list(self._iter_nmap_hosts(target, ports, additional_args, stream=stream))
+        return {
+            'scan_info': stream.scan_info,
+            'hosts': hosts
+        }
 
-    def _run_nmap(self, target: str, ports: str, additional_args=None):
-        cmd = [
-            "sudo", "nmap", "-sV", "-O",
-            "--stats-every", "1s",
-            "-oX", "-",
-            target
-        ]
+    def _iter_nmap_hosts(self, target: Union[str, List[str], TargetSet], ports: str, additional_args=None,
+                         stream: Optional[NmapXmlStream] = None) -> Iterator[Host]:
+        """
+        Run nmap and yield each host as soon as nmap finishes reporting it.
 
-        taskprogress_re = re.compile(r'<taskprogress.*?percent="([\d\.]+)".*?/>')
+        Output lines are fed straight into an incremental XML parser, so the
+        full document is never buffered and results are available while the
+        scan is still running. `target` may be a list of nmap target arguments
+        or a TargetSet, which is scanned TARGET_BATCH addresses per nmap run.
+        """
+        if isinstance(target, TargetSet):
+            for batch in target.batches(self.TARGET_BATCH):
+                yield from self._iter_nmap_hosts(batch, ports, additional_args)
+            return
+
+        targets = [target] if isinstance(target, str) else list(target)
+        if self.rate_control is not None:
+            # Each run starts from whatever the previous runs settled on
+            self.rate_limit = self.rate_control.rate
+            self.min_rate = self.rate_control.min_rate
+
+        input_file = None
+        if len(targets) > self.MAX_ARGV_TARGETS:
+            # Keeps the command under ARG_MAX however long the list gets
+            with tempfile.NamedTemporaryFile('w', prefix='spectre-targets-', suffix='.txt', delete=False) as f:
+                f.write('\n'.join(targets))
+                input_file = f.name
+        try:
+            cmd = self._build_command(targets, ports, additional_args, input_file=input_file)
+            yield from self._run_command(cmd, targets, stream)
+        finally:
+            if input_file:
+                os.unlink(input_file)
 
-        xml_started = False
-        xml_lines = []
-        pbar = tqdm(total=100, desc="Nmap Progress", unit="%")
-        last_percent = 0
+    def _run_command(self, cmd: List[str], targets: List[str],
+                     stream: Optional[NmapXmlStream] = None) -> Iterator[Host]:
+        """Spawn one nmap process and stream its hosts, see _iter_nmap_hosts()"""
+        self._log(f"Running: {' '.join(cmd)}", "DEBUG")
 
+        remaining = None
+        if self.deadline is not None:
+            remaining = self.deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("Scan deadline passed before nmap could start")
+
+        if stream is None:
+            stream = NmapXmlStream()
+
+        shard = ' '.join(targets) if len(targets) <= 4 else f"{targets[0]} .. {targets[-1]} ({len(targets)} targets)"
+        progress = self.progress if self.progress is not None else make_progress(self.show_progress)
+        if progress.enabled:
+            stream.on_progress = lambda event: progress.handle(event, shard)
+
+        # Keep stderr apart from the XML on stdout so warnings can't corrupt it
+        stderr_file = tempfile.TemporaryFile(mode='w+')
+
+        metrics = self.metrics
+        spawned = time.perf_counter()
         proc = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+            stderr=stderr_file,
             text=True,
             bufsize=1,
-            universal_newlines=True
+            universal_newlines=True,
+            # A separate session would leave sudo without a tty to prompt on,
+            # so only isolate nmap when we're already root
+            start_new_session=os.geteuid() == 0
         )
+        self.process = proc
+        now = time.perf_counter()
+        metrics.add('spawn', now - spawned)
+        metrics.count('nmap_runs')
+        spawned = now
+
+        # Hard deadline: a timer thread stops nmap, which ends the read loop
+        expired = threading.Event()
+        timer = None
+        if remaining is not None:
+            def expire():
+                expired.set()
+                self._terminate(proc)
+            timer = threading.Timer(remaining, expire)
+            timer.daemon = True
+            timer.start()
 
         try:
+            first = True
             for line in proc.stdout:
-                line = line.strip()
-                i = line.find("percent=")
+                parse_start = time.perf_counter()
+                if first:
+                    metrics.add('first_byte', parse_start - spawned)
+                    first = False
+                metrics.count('bytes_read', len(line))
+                try:
+                    hosts = list(stream.feed_line(line))
+                    metrics.add('xml_parse', time.perf_counter() - parse_start)
+                    yield from hosts
+                except ET.ParseError as e:
+                    self._log(f"Malformed nmap XML, stopping parse: {e}", "WARNING")
+                    # Nobody reads the pipe any more, nmap would block on it
+                    self._terminate(proc)
+                    break
 
-                if i>1: 
-                    percent = float(line[i+9:i+13])
-                    increment = percent - last_percent
-                    if increment > 0:
-                        pbar.update(increment)
-                        last_percent = percent
-                    elif line.find("Parallel DNS resolution of"):
-                        pbar.update(increment)
-                        last_percent = percent
+            proc.wait()
 
+            if expired.is_set():
+                raise TimeoutError(f"nmap did not finish before the scan deadline ({shard})")
 
-                # Detect start of main XML document
-                if line.startswith("<nmaprun"):
-                    xml_started = True
+            if stream.started and not stream.finished:
+                try:
+                    with metrics.stage('xml_parse'):
+                        hosts = list(stream.close())
+                    yield from hosts
+                except ET.ParseError as e:
+                    self._log(f"Incomplete nmap XML: {e}", "WARNING")
 
-                # Collect XML output lines (including <taskprogress> lines after xml_started)
-                if xml_started:
-                    xml_lines.append(line)
+            stderr_file.seek(0)
+            stderr = stderr_file.read()
+            if proc.returncode:
+                self._log(f"nmap exited with code {proc.returncode}: {stderr.strip()}", "WARNING")
 
-            proc.wait()
+            self._observe_run(RunStats(
+                addresses=stream.run_stats.get('total', stream.hosts_seen),
+                hosts=stream.run_stats.get('up', stream.hosts_seen),
+                elapsed=time.perf_counter() - spawned,
+                rate=self.rate_limit,
+                srtt=stream.median_srtt(),
+                drops=count_drops(stderr)
+            ))
         finally:
-            pbar.close()
+            if timer is not None:
+                timer.cancel()
+            self._terminate(proc)
+            self.process = None
+            stderr_file.close()
+            if self.progress is None:
+                progress.close()
+            else:
+                progress.shard_done(shard)
 
-        xml_output = "\n".join(xml_lines)
-        return self._parse_nmap_xml(xml_output)
+    def _observe_run(self, stats: RunStats) -> None:
+        """Record a finished run and let the rate controller react to it"""
+        self.last_run = stats
+        if self.rate_control is None:
+            return
+        previous = self.rate_control.rate
+        reason = self.rate_control.observe(stats)
+        if reason:
+            self._log(f"Congestion ({reason}), rate {previous} -> {self.rate_control.rate} pps", "RATE")
+        else:
+            self._log(f"{stats.throughput:.0f} addresses/s, rate {previous} -> {self.rate_control.rate} pps", "RATE")
 
     def _parse_nmap_xml(self, xml_output: str) -> Dict:
         """Parse nmap XML output into structured data"""
         try:
-            root = ET.fromstring(xml_output)
-            results = {
-                'scan_info': {},
-                'hosts': []
+            stream = NmapXmlStream(host_parser=self._parse_host)
+            hosts = []
+            # Feeding in slices lets finished hosts be detached as parsing
+            # goes instead of the whole document's tree existing at once
+            for i in range(0, len(xml_output), XML_FEED_CHUNK):
+                hosts.extend(stream.feed(xml_output[i:i + XML_FEED_CHUNK]))
+            hosts.extend(stream.close())
+            return {
+                'scan_info': stream.scan_info,
+                'hosts': hosts
             }
             
-            # Get scan info
-            scan_info = root.find('.//scaninfo')
-            if scan_info is not None:
-                results['scan_info'] = {
-                    'type': scan_info.get('type', ''),
-                    'protocol': scan_info.get('protocol', ''),
-                    'services': scan_info.get('services', '')
-                }
-            
-            # Parse each host
-            for host in root.findall('.//host'):
-                host_data = self._parse_host(host)
-                if host_data:
-                    results['hosts'].append(host_data)
-            
-            return results
-            
         except ET.ParseError as e:
             # Fallback to basic text parsing if XML fails
             return self._parse_nmap_text(xml_output)
 
-    
-    def _parse_host(self, host_elem) -> Optional[Dict]:
+    def _parse_host(self, host_elem) -> Optional[Host]:
         """Parse individual host from XML"""
-        host_data = {
-            'ip': '',
-            'hostname': '',
-            'state': '',
-            'ports': []
-        }
-        
-        # Get IP address
-        addr = host_elem.find('.//address[@addrtype="ipv4"]')
-        if addr is not None:
-            host_data['ip'] = addr.get('addr', '')
-        
-        # Get hostname
-        hostname = host_elem.find('.//hostname')
-        if hostname is not None:
-            host_data['hostname'] = hostname.get('name', '')
-        
-        # Get host state
-        status = host_elem.find('.//status')
-        if status is not None:
-            host_data['state'] = status.get('state', '')
-        
-        # Get OS guess
-        os_match = host_elem.find('.//osmatch')
-        if os_match is not None:
-            host_data['os_guess'] = os_match.get('name', '')
-        
-        # Parse ports
-        for port in host_elem.findall('.//port'):
-            port_data = self._parse_port(port)
-            if port_data:
-                host_data['ports'].append(port_data)
-        
-        return host_data if host_data['ip'] else None
+        return parse_host(host_elem)
     
-    def _parse_port(self, port_elem) -> Optional[Dict]:
+    def _parse_port(self, port_elem) -> Optional[Port]:
         """Parse individual port from XML"""
-        port_data = {
-            'port': port_elem.get('portid', ''),
-            'protocol': port_elem.get('protocol', ''),
-            'state': '',
-            'service': '',
-            'version': '',
-            'product': ''
-        }
-        
-        # Get port state
-        state = port_elem.find('.//state')
-        if state is not None:
-            port_data['state'] = state.get('state', '')
-        
-        # Get service info
-        service = port_elem.find('.//service')
-        if service is not None:
-            port_data['service'] = service.get('name', '')
-            port_data['product'] = service.get('product', '')
-            port_data['version'] = service.get('version', '')
-        
-        return port_data if port_data['state'] == 'open' else None
+        return parse_port(port_elem)
     
     def _parse_nmap_text(self, text_output: str) -> Dict:
         """Fallback text parser for nmap output"""
@@ -180,7 +364,8 @@ class NetworkScanner:
             ip_match = re.match(r'Nmap scan report for (.+?)( \((.+?)\))?$', line)
             if ip_match:
                 if current_host and current_host['ports']:
-                    results['hosts'].append(current_host)
+                    results['hosts'].append(Host(current_host['ip'], current_host['hostname'],
+                                                 ports=tuple(current_host['ports'])))
                 
                 current_host = {
                     'ip': ip_match.group(3) if ip_match.group(3) else ip_match.group(1),
@@ -191,53 +376,76 @@ class NetworkScanner:
             # Match open ports
             port_match = re.match(r'(\d+)/(tcp|udp)\s+open\s+(\S+)\s*(.*)?$', line)
             if port_match and current_host:
-                port_info = {
-                    'port': port_match.group(1),
-                    'protocol': port_match.group(2),
-                    'state': 'open',
-                    'service': port_match.group(3),
-                    'version': port_match.group(4).strip() if port_match.group(4) else ''
-                }
+                port_info = Port(
+                    port=intern(port_match.group(1)),
+                    protocol=intern(port_match.group(2)),
+                    state='open',
+                    service=intern(port_match.group(3)),
+                    version=intern(port_match.group(4).strip() if port_match.group(4) else '')
+                )
                 current_host['ports'].append(port_info)
         
         if current_host and current_host['ports']:
-            results['hosts'].append(current_host)
+            results['hosts'].append(Host(current_host['ip'], current_host['hostname'],
+                                         ports=tuple(current_host['ports'])))
         
         return results
     
-    def scan(self, target: str, ports: str = "1-1000", timeout: int = 300, rate_limit: int = 1000) -> List[Dict]:
-        """Main scan method that returns list of services found"""
+    def iter_scan(self, target: str, ports: str = "1-1000", timeout: int = 300, rate_limit: int = 1000,
+                  scan_id: Optional[str] = None) -> Iterator[Result]:
+        """
+        Streaming scan that yields one result row per open service.
+
+        Rows are produced as soon as nmap finishes each host, so only the
+        current host's rows are ever held in memory. scan_id and scan_start
+        are set before the first row is requested.
 
-        self.scan_id = rsa_priv = RsaPrivateKey.generate().to_string()
+        `rate_limit` caps packets per second (--max-rate) and `timeout` is a
+        hard deadline for the whole scan; nmap is killed when it passes.
+        Pass `scan_id` to continue an existing scan instead of starting a new one.
+        """
+        port_args(ports)  # Fail fast on a bad port spec before anything runs
         self.scan_start = datetime.now()
+        self.scan_id = scan_id or generate_scan_id(self.scan_start)
+        self.rate_limit = rate_limit
+        self.deadline = time.time() + timeout if timeout else None
+        self.hosts_found = 0
+        self.services_found = 0
+        self.metrics = ScanMetrics()
         self._log(f"Starting scan of {target} on ports {ports}")
-        
-        # Run the scan
-        scan_results = self._run_nmap(target, ports)
-        
-        # Convert to flat list format for CSV output
-        results = []
-        for host in scan_results.get('hosts', []):
-            for port in host.get('ports', []):
-                result = {
-                    'timestamp': datetime.now().isoformat(),
-                    'scan_id': self.scan_id,
-                    'target_ip': host.get('ip', ''),
-                    'hostname': host.get('hostname', ''),
-                    'port': port.get('port', ''),
-                    'protocol': port.get('protocol', ''),
-                    'service': port.get('service', ''),
-                    'version': port.get('version', ''),
-                    'product': port.get('product', ''),
-                    'os_guess': host.get('os_guess', '')
-                }
-                results.append(result)
+
+        return self._iter_rows(target, ports)
+
+    def _host_rows(self, host: Host) -> Iterator[Result]:
+        """Result rows for each open port of one parsed host"""
+        # One timestamp per host, every row shares the host's fields
+        timestamp = datetime.now().isoformat()
+        for port in host.ports:
+            yield Result(timestamp, self.scan_id, host, port)
+
+    def _iter_rows(self, target: str, ports: str) -> Iterator[Result]:
+        """Flatten hosts into result rows as nmap reports them"""
+        metrics = self.metrics
+        for host in self._iter_nmap_hosts(target, ports):
+            self.hosts_found += 1
+            with metrics.stage('row_build'):
+                rows = list(self._host_rows(host))
+            metrics.count('hosts')
+            metrics.count('ports', len(rows))
+            for result in rows:
+                self.services_found += 1
                 
-                self._log(f"Found: {result['target_ip']}:{result['port']} - {result['service']} {result['version']}")
-        
+                if self.verbose:
+                    self._log(f"Found: {host.ip}:{result.port.port} - {result.port.service} {result.port.version}")
+                yield result
         
+        self._finish()
+
+    def _finish(self) -> None:
         self.scan_end = datetime.now()
         self._log(f"Scan completed in {(self.scan_end - self.scan_start).total_seconds():.1f}s")
-        self._log(f"Found {len(results)} services on {len(scan_results.get('hosts', []))} hosts")
-        
-        return results
\ No newline at end of file
+        self._log(f"Found {self.services_found} services on {self.hosts_found} hosts")
+
+    def scan(self, target: str, ports: str = "1-1000", timeout: int = 300, rate_limit: int = 1000) -> List[Result]:
+        """Main scan method that returns list of services found"""
+        return list(self.iter_scan(target, ports, timeout, rate_limit))
@@ -0,0 +1,198 @@
+import os
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from modules.nmap_command import exclude_file
+from modules.rate_control import RunStats
+from modules.scanner import NetworkScanner
+from utils.checkpoint import CheckpointJournal
+from utils.records import Host
+from utils.progress import make_progress
+from utils.targets import TargetSet, split_target
+
+
+def _scan_shard(index: int, targets: List[str], ports: str, additional_args=None,
+                options: Optional[Dict] = None,
+                journal_path: Optional[str] = None) -> Tuple[int, List[Host], Dict, Optional[RunStats]]:
+    """
+    Run one nmap process over a shard (executed inside a worker process).
+
+    Returns the shard index, its hosts, the worker's ScanMetrics as a dict
+    and the RunStats of its nmap run.
+    """
+    scanner = NetworkScanner.from_options(options or {'show_progress': False})
+    journal = CheckpointJournal(journal_path) if journal_path else None
+
+    hosts = []
+    for host in scanner._iter_nmap_hosts(targets, ports, additional_args):
+        if journal:
+            journal.record_host(index, host)
+        hosts.append(host)
+    return index, hosts, scanner.metrics.as_dict(), scanner.last_run
+
+
+class ShardedScanner(NetworkScanner):
+    """
+    NetworkScanner that splits the target into shards and runs one nmap
+    process per shard across a process pool.
+
+    Hosts from every shard are merged into the normal iter_scan()/scan()
+    row stream, so output and metadata look exactly like a single scan.
+
+    With a CheckpointJournal every finished host and shard is recorded as
+    it completes. Passing resume=True replays a loaded journal instead:
+    finished shards come straight from the file and unfinished ones are
+    rescanned with their already recorded hosts excluded.
+
+    With a RateController in `rate_control`, shards are handed to the pool
+    only as slots free up, each with the rate and parallelism the
+    controller settled on after the shards before it finished.
+    """
+
+    def __init__(self, verbose: bool = False, show_progress: bool = True,
+                 probe_args: Optional[List[str]] = None,
+                 workers: Optional[int] = None, shards: Optional[int] = None,
+                 journal: Optional[CheckpointJournal] = None, resume: bool = False, **kwargs):
+        super().__init__(verbose=verbose, show_progress=show_progress, probe_args=probe_args, **kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        # None plans one shard per scan with a single worker, see _shard_count()
+        self.shards = shards
+        self.journal = journal
+        self.resume = resume
+
+    def _shard_count(self) -> int:
+        if self.shards:
+            return self.shards
+        # Several shards per worker keeps the pool busy when ranges are uneven.
+        # A single worker gains nothing from them, every shard would repeat
+        # discovery and OS detection, unless a RateController needs the
+        # separate runs to adapt between.
+        if self.workers == 1 and self.rate_control is None:
+            return 1
+        return self.workers * 4
+
+    def _plan(self, target: Union[str, TargetSet], ports: str) -> List[List[str]]:
+        """Shard list for this scan, from the journal when resuming"""
+        if self.resume:
+            return self.journal.header['shards']
+
+        shards = split_target(target, self._shard_count())
+        if self.journal:
+            self.journal.start({
+                'scan_id': self.scan_id,
+                'scan_start': self.scan_start.isoformat() if self.scan_start else None,
+                'target': str(target),
+                'ports': ports,
+                'shards': shards
+            })
+        return shards
+
+    def _iter_nmap_hosts(self, target: Union[str, List[str], TargetSet], ports: str, additional_args=None,
+                         stream=None) -> Iterator[Host]:
+        """Scan every shard in parallel and yield hosts as shards finish"""
+        if not isinstance(target, (str, TargetSet)):
+            target = ' '.join(target)
+
+        shards = self._plan(target, ports)
+        seen = set()
+
+        def fresh(hosts):
+            # Shards can overlap when the target list does
+            for host in hosts:
+                if host.ip not in seen:
+                    seen.add(host.ip)
+                    yield host
+
+        with ExitStack() as exclude_files:
+            pending = []
+            for i, shard in enumerate(shards):
+                recorded = self.journal.hosts.get(i, []) if self.resume else []
+                yield from fresh(recorded)
+
+                if self.resume and i in self.journal.done_shards:
+                    continue
+
+                # Recorded hosts go through a file, thousands of them would
+                # overflow the argv limit as one --exclude argument
+                args = list(additional_args or [])
+                args += exclude_files.enter_context(exclude_file(h.ip for h in recorded))
+                pending.append((i, shard, args))
+
+            if self.resume:
+                self._log(f"Resuming {len(pending)} of {len(shards)} shards")
+            else:
+                self._log(f"Split {target} into {len(shards)} shards across {self.workers} workers")
+
+            if self.workers == 1:
+                yield from fresh(self._run_sequential(pending, ports))
+            else:
+                yield from fresh(self._run_pool(pending, ports))
+
+        if self.journal:
+            self.journal.finish()
+
+    def _run_sequential(self, pending: List[Tuple], ports: str) -> Iterator[Host]:
+        """Scan shards one by one in this process, streaming every host"""
+        scanner = NetworkScanner.from_options(self.worker_options(show_progress=self.show_progress))
+        scanner.progress = make_progress(self.show_progress, total_shards=len(pending))
+        scanner.metrics = self.metrics
+        scanner.rate_control = self.rate_control
+        try:
+            yield from self._scan_pending(scanner, pending, ports)
+        finally:
+            scanner.progress.close()
+
+    def _scan_pending(self, scanner: NetworkScanner, pending: List[Tuple], ports: str) -> Iterator[Host]:
+        for i, shard, args in pending:
+            for host in scanner._iter_nmap_hosts(shard, ports, args):
+                if self.journal:
+                    self.journal.record_host(i, host)
+                yield host
+            if self.journal:
+                self.journal.record_shard(i)
+
+    def _run_pool(self, pending: List[Tuple], ports: str) -> Iterator[Host]:
+        """Scan shards across the process pool, yielding hosts as shards finish"""
+        if not pending:
+            return
+
+        journal_path = self.journal.path if self.journal else None
+        progress = make_progress(self.show_progress, total_shards=len(pending), desc="Shards")
+        queue = list(reversed(pending))
+        running = {}
+
+        def submit(pool):
+            control = self.rate_control
+            limit = min(self.workers, control.parallelism) if control else self.workers
+            if control:
+                self.rate_limit, self.min_rate = control.rate, control.min_rate
+            while queue and len(running) < limit:
+                # The rate budget is split across every shard that can run at once
+                options = self.worker_options(share=min(limit, len(running) + len(queue)))
+                i, shard, args = queue.pop()
+                running[pool.submit(_scan_shard, i, shard, ports, args, options, journal_path)] = i
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                try:
+                    submit(pool)
+                    while running:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            del running[future]
+                            index, hosts, metrics, stats = future.result()
+                            self.metrics.merge(metrics)
+                            self._log(f"Shard {index} finished with {len(hosts)} hosts")
+                            if stats is not None:
+                                self._observe_run(stats)
+                            if self.journal:
+                                self.journal.record_shard(index)
+                            progress.shard_done(index)
+                            yield from hosts
+                        submit(pool)
+                except BaseException:
+                    for future in running:
+                        future.cancel()
+                    raise
+        finally:
+            progress.close()
@@ -0,0 +1,389 @@
+import glob
+import gzip
+import json
+import os
+import pickle
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from utils.records import Result, Row
+
+DEFAULT_INDEX_CACHE = os.path.join(os.path.expanduser('~'), '.spectre', 'cve_index.pickle')
+
+# Bump when the compiled layout changes so stale caches are rebuilt
+INDEX_VERSION = 2
+
+# Columns added to every output row
+VULN_FIELDNAMES = ['cves', 'severity', 'cvss']
+
+SEVERITY_ORDER = {'': 0, 'NONE': 0, 'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
+
+# nmap product names -> CPE vendor:product, where the product alone is
+# ambiguous or differs. Generic CPE products (http_server, tomcat, server)
+# exist under many vendors, so only the vendor tells them apart.
+PRODUCT_ALIASES = {
+    'apache httpd': 'apache:http_server',
+    'apache tomcat': 'apache:tomcat',
+    'apache tomcat/coyote jsp engine': 'apache:tomcat',
+    'apache jserv': 'apache:tomcat',
+    'microsoft iis httpd': 'microsoft:internet_information_services',
+    'microsoft sql server': 'microsoft:sql_server',
+    'microsoft terminal services': 'microsoft:remote_desktop_services',
+    'isc bind': 'isc:bind',
+    'postgresql db': 'postgresql:postgresql',
+    'mysql': 'oracle:mysql',
+    'mariadb': 'mariadb:mariadb',
+    'openssh': 'openbsd:openssh',
+    'samba smbd': 'samba:samba',
+    'exim smtpd': 'exim:exim',
+    'postfix smtpd': 'postfix:postfix',
+    'dovecot imapd': 'dovecot:dovecot',
+    'dovecot pop3d': 'dovecot:dovecot',
+    'dropbear sshd': 'dropbear_ssh_project:dropbear_ssh',
+    'squid http proxy': 'squid-cache:squid',
+    'redis key-value store': 'redis:redis',
+    'elasticsearch rest api': 'elastic:elasticsearch',
+    'node.js express framework': 'expressjs:express',
+    'openresty web app server': 'openresty:openresty',
+}
+
+# Role words nmap appends to product names ("nginx httpd", "ProFTPD ftpd")
+_ROLE_WORDS = {'httpd', 'sshd', 'ftpd', 'smtpd', 'imapd', 'pop3d', 'daemon', 'server', 'db'}
+
+_VERSION_TOKEN = re.compile(r'\d+|[a-z]+')
+_CPE_SPLIT = re.compile(r'(?<!\\):')
+
+VersionKey = Tuple[Tuple[int, int, str], ...]
+
+# (CPE vendor, CPE product), the vendor is None when nmap's name doesn't say
+ProductKey = Tuple[Optional[str], str]
+
+
+def normalize_product(name: str) -> ProductKey:
+    """Map an nmap product name onto the CPE vendor and product it is indexed under"""
+    key = ' '.join(name.lower().replace('_', ' ').split())
+    alias = PRODUCT_ALIASES.get(key)
+    if alias:
+        vendor, product = alias.split(':', 1)
+        return vendor, product
+    words = [w for w in key.split() if w not in _ROLE_WORDS] or key.split()
+    return None, '_'.join(words)
+
+
+def version_key(version: str) -> Optional[VersionKey]:
+    """
+    Sortable key for a version string.
+
+    Numeric and alphabetic runs are compared separately, so "7.4p1" sorts
+    as (7, 4, "p", 1) and "1.10" after "1.9". Returns None when there is
+    nothing to compare.
+    """
+    tokens = _VERSION_TOKEN.findall(version.lower())
+    if not tokens:
+        return None
+    return tuple((1, int(t), '') if t.isdigit() else (0, 0, t) for t in tokens)
+
+
+def nmap_version(version: str) -> str:
+    """The version number out of nmap's version field ("7.4p1 Debian 10+deb9u7" -> "7.4p1")"""
+    return version.split(None, 1)[0] if version else ''
+
+
+def _open_feed(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def feed_files(paths: Sequence[str]) -> List[str]:
+    """Expand feed directories into their .json/.json.gz files"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json')) +
+                                glob.glob(os.path.join(path, '*.json.gz'))))
+        else:
+            files.append(path)
+    return files
+
+
+def _iter_feed_items(document: Dict) -> Iterator[Dict]:
+    # NVD 1.1 feeds list CVE_Items, the 2.0 API lists vulnerabilities[].cve
+    for item in document.get('CVE_Items', ()):
+        yield item
+    for item in document.get('vulnerabilities', ()):
+        yield item.get('cve', item)
+
+
+def _cve_id(item: Dict) -> str:
+    if 'id' in item:
+        return item['id']
+    return item.get('cve', {}).get('CVE_data_meta', {}).get('ID', '')
+
+
+def _cve_score(item: Dict) -> Tuple[float, str]:
+    """Highest-version CVSS base score and severity of a CVE"""
+    impact = item.get('impact')
+    if impact:
+        v3 = impact.get('baseMetricV3', {}).get('cvssV3')
+        if v3:
+            return float(v3.get('baseScore', 0)), v3.get('baseSeverity', '')
+        v2 = impact.get('baseMetricV2')
+        if v2:
+            return float(v2.get('cvssV2', {}).get('baseScore', 0)), v2.get('severity', '')
+        return 0.0, ''
+
+    metrics = item.get('metrics', {})
+    for name in ('cvssMetricV40', 'cvssMetricV31', 'cvssMetricV30'):
+        if metrics.get(name):
+            data = metrics[name][0].get('cvssData', {})
+            return float(data.get('baseScore', 0)), data.get('baseSeverity', '')
+    if metrics.get('cvssMetricV2'):
+        entry = metrics['cvssMetricV2'][0]
+        return float(entry.get('cvssData', {}).get('baseScore', 0)), entry.get('baseSeverity', '')
+    return 0.0, ''
+
+
+def _iter_cpe_matches(node) -> Iterator[Dict]:
+    """Every cpe match under a configuration tree, both feed layouts"""
+    if isinstance(node, list):
+        for child in node:
+            yield from _iter_cpe_matches(child)
+    elif isinstance(node, dict):
+        yield from node.get('cpe_match', ())
+        yield from node.get('cpeMatch', ())
+        for key in ('nodes', 'children'):
+            if key in node:
+                yield from _iter_cpe_matches(node[key])
+
+
+# A version range: (start, start inclusive, end, end inclusive), None = unbounded
+Range = Tuple[Optional[VersionKey], bool, Optional[VersionKey], bool]
+
+
+def _cpe_range(match: Dict) -> Optional[Tuple[Tuple[str, str], Range]]:
+    """((vendor, product), version range) of one vulnerable cpe match"""
+    if not match.get('vulnerable', True):
+        return None
+    fields = _CPE_SPLIT.split(match.get('cpe23Uri') or match.get('criteria') or '')
+    if len(fields) < 7 or fields[2] != 'a':
+        return None
+    product = fields[3].replace('\\', '').lower(), fields[4].replace('\\', '').lower()
+    version, update = fields[5], fields[6]
+
+    start_in = match.get('versionStartIncluding')
+    start_ex = match.get('versionStartExcluding')
+    end_in = match.get('versionEndIncluding')
+    end_ex = match.get('versionEndExcluding')
+    if start_in or start_ex or end_in or end_ex:
+        start = version_key(start_in or start_ex) if (start_in or start_ex) else None
+        end = version_key(end_in or end_ex) if (end_in or end_ex) else None
+        return product, (start, bool(start_in), end, bool(end_in))
+
+    if version == '-':
+        return None
+    if version == '*':
+        # Every version of the product
+        return product, (None, True, None, True)
+    if update not in ('*', '-', ''):
+        version += update
+    key = version_key(version.replace('\\', ''))
+    if key is None:
+        return None
+    return product, (key, True, key, True)
+
+
+class ProductIndex:
+    """
+    Precomputed version lookup for one product.
+
+    The distinct range boundaries are sorted, which cuts the version line
+    into 2n+1 slots: each boundary point and the open gaps around them.
+    Every slot stores the CVEs covering it, so a lookup is one bisect.
+    """
+
+    __slots__ = ('bounds', 'slots')
+
+    def __init__(self, ranges: List[Tuple[Range, int]]):
+        bounds = sorted({key for (start, _, end, _), _ in ranges for key in (start, end) if key is not None})
+        position = {key: i for i, key in enumerate(bounds)}
+        last = 2 * len(bounds)
+
+        opens: Dict[int, List[int]] = {}
+        closes: Dict[int, List[int]] = {}
+        for (start, start_inclusive, end, end_inclusive), cve in ranges:
+            if start is None:
+                low = 0
+            else:
+                low = 2 * position[start] + (1 if start_inclusive else 2)
+            if end is None:
+                high = last
+            else:
+                high = 2 * position[end] + (1 if end_inclusive else 0)
+            if low <= high:
+                opens.setdefault(low, []).append(cve)
+                closes.setdefault(high + 1, []).append(cve)
+
+        # Sweep the slots, sharing one tuple between runs of identical sets
+        slots = []
+        active: Dict[int, int] = {}
+        current: Tuple[int, ...] = ()
+        for slot in range(last + 1):
+            changed = False
+            for cve in closes.get(slot, ()):
+                active[cve] -= 1
+                if not active[cve]:
+                    del active[cve]
+                changed = True
+            for cve in opens.get(slot, ()):
+                active[cve] = active.get(cve, 0) + 1
+                changed = True
+            if changed:
+                current = tuple(sorted(active))
+            slots.append(current)
+
+        self.bounds = bounds
+        self.slots = slots
+
+    def lookup(self, key: VersionKey) -> Tuple[int, ...]:
+        i = bisect_left(self.bounds, key)
+        if i < len(self.bounds) and self.bounds[i] == key:
+            return self.slots[2 * i + 1]
+        return self.slots[2 * i]
+
+
+class VulnIndex:
+    """
+    Offline CVE matching for detected services.
+
+    Built once from local NVD JSON feed files (1.1 feeds or 2.0 API dumps,
+    optionally gzipped) and cached on disk, then queried per service by
+    CPE vendor, product and version. Repeated (product, version) pairs,
+    the common case across a network, are answered from a memo.
+
+    nmap names without a PRODUCT_ALIASES entry carry no vendor. They match
+    a CPE product indexed under a single vendor, or under the vendor of
+    the same name (nginx:nginx), never another vendor's same-named product.
+    """
+
+    def __init__(self, cves: List[Tuple[str, float, str]], products: Dict[Tuple[str, str], ProductIndex],
+                 sources: Optional[List] = None):
+        self.cves = cves
+        self.products = products
+        self.sources = sources or []
+        self._vendors: Dict[str, List[str]] = {}
+        for vendor, product in products:
+            self._vendors.setdefault(product, []).append(vendor)
+        self._memo: Dict[Tuple[str, str], Tuple[str, str, str]] = {}
+
+    @classmethod
+    def build(cls, paths: Sequence[str]) -> 'VulnIndex':
+        """Compile an index from feed files or directories"""
+        cves: List[Tuple[str, float, str]] = []
+        ranges: Dict[Tuple[str, str], set] = {}
+        for path in feed_files(paths):
+            with _open_feed(path) as f:
+                document = json.load(f)
+            for item in _iter_feed_items(document):
+                cve = len(cves)
+                score, severity = _cve_score(item)
+                cves.append((_cve_id(item), score, severity.upper()))
+                for match in _iter_cpe_matches(item.get('configurations', ())):
+                    entry = _cpe_range(match)
+                    if entry:
+                        product, version_range = entry
+                        ranges.setdefault(product, set()).add((version_range, cve))
+
+        products = {product: ProductIndex(list(entries)) for product, entries in ranges.items()}
+        return cls(cves, products, _feed_signature(paths))
+
+    @classmethod
+    def load(cls, paths: Sequence[str], cache_path: Optional[str] = DEFAULT_INDEX_CACHE) -> 'VulnIndex':
+        """The cached index if the feeds haven't changed since it was built, else a fresh one"""
+        signature = _feed_signature(paths)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    data = pickle.load(f)
+                if data.get('version') == INDEX_VERSION and data.get('sources') == signature:
+                    return cls(data['cves'], data['products'], signature)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+                pass
+
+        index = cls.build(paths)
+        if cache_path:
+            index.save(cache_path)
+        return index
+
+    def save(self, cache_path: str) -> None:
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': INDEX_VERSION,
+                'sources': self.sources,
+                'cves': self.cves,
+                'products': self.products
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    def _product_index(self, product: str) -> Optional[ProductIndex]:
+        vendor, name = normalize_product(product)
+        if vendor is None:
+            vendors = self._vendors.get(name, ())
+            if len(vendors) == 1:
+                vendor = vendors[0]
+            elif name in vendors:
+                vendor = name
+            else:
+                return None
+        return self.products.get((vendor, name))
+
+    def match(self, product: str, version: str) -> List[Tuple[str, float, str]]:
+        """(cve id, cvss score, severity) for every CVE affecting a product version"""
+        index = self._product_index(product) if product else None
+        key = version_key(nmap_version(version)) if index else None
+        if key is None:
+            return []
+        return [self.cves[i] for i in index.lookup(key)]
+
+    def columns(self, product: str, version: str) -> Tuple[str, str, str]:
+        """cves, severity and cvss column values for a service"""
+        memo_key = (product, version)
+        cached = self._memo.get(memo_key)
+        if cached is None:
+            matches = self.match(product, version)
+            if matches:
+                # Worst first, so the list reads in triage order
+                matches.sort(key=lambda c: (-c[1], c[0]))
+                severity = max((c[2] for c in matches), key=lambda s: SEVERITY_ORDER.get(s, 0))
+                cached = (';'.join(c[0] for c in matches), severity, f"{matches[0][1]:.1f}")
+            else:
+                cached = ('', '', '')
+            self._memo[memo_key] = cached
+        return cached
+
+    def annotate(self, rows: Iterable[Row]) -> Iterator[Row]:
+        """Add cves/severity/cvss columns to each row as it streams past"""
+        for row in rows:
+            cves, severity, cvss = self.columns(row.get('product', ''), row.get('version', ''))
+            if cves:
+                if isinstance(row, Result):
+                    row.annotate(cves=cves, severity=severity, cvss=cvss)
+                else:
+                    row.update(cves=cves, severity=severity, cvss=cvss)
+            yield row
+
+    def __len__(self) -> int:
+        return len(self.cves)
+
+
+def _feed_signature(paths: Sequence[str]) -> List:
+    """Identifies a set of feed files by path, size and modification time"""
+    signature = []
+    for path in feed_files(paths):
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return signature
@@ -0,0 +1,102 @@
+import json
+import os
+from typing import Dict, List, Optional
+from utils.records import Host
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser('~'), '.spectre', 'checkpoints')
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of scan progress, one JSON record per line.
+
+    Records:
+        {"type": "scan", ...}            header with the scan settings and shard plan
+        {"type": "host", "shard": i, "host": {...}}   a host nmap finished
+        {"type": "shard", "shard": i}    every host of shard i is recorded
+        {"type": "done"}                 the scan completed
+
+    Each record is written with a single O_APPEND write, so shard worker
+    processes can record hosts into the same file concurrently. A torn last
+    line from a crash is ignored on load.
+    """
+
+    def __init__(self, path: str, settings: Optional[Dict] = None):
+        self.path = path
+        # Caller settings (CLI options) stored in the header for --resume
+        self.settings = settings or {}
+        self.header: Dict = {}
+        self.hosts: Dict[int, List[Host]] = {}
+        self.done_shards = set()
+        self.finished = False
+
+    @classmethod
+    def for_scan(cls, scan_id: str, directory: Optional[str] = None,
+                 settings: Optional[Dict] = None) -> 'CheckpointJournal':
+        return cls(os.path.join(directory or DEFAULT_CHECKPOINT_DIR, f"{scan_id}.jsonl"), settings)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _append(self, record: Dict) -> None:
+        data = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def start(self, header: Dict) -> None:
+        """Create a fresh journal with the scan header"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.header = dict(header, settings=self.settings)
+        self._append(dict(self.header, type='scan'))
+
+    def record_host(self, shard: int, host: Host) -> None:
+        self._append({'type': 'host', 'shard': shard, 'host': host.as_dict()})
+
+    def record_shard(self, shard: int) -> None:
+        self.done_shards.add(shard)
+        self._append({'type': 'shard', 'shard': shard})
+
+    def finish(self, keep: bool = False) -> None:
+        """Mark the scan complete, removing the journal unless asked to keep it"""
+        self.finished = True
+        if keep:
+            self._append({'type': 'done'})
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self) -> 'CheckpointJournal':
+        """Read back an existing journal"""
+        self.header = {}
+        self.hosts = {}
+        self.done_shards = set()
+        self.finished = False
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Partially written record from an interrupted run
+                    continue
+
+                kind = record.pop('type', None)
+                if kind == 'scan':
+                    self.header = record
+                    self.settings = record.get('settings', {})
+                elif kind == 'host':
+                    self.hosts.setdefault(record['shard'], []).append(Host.from_dict(record['host']))
+                elif kind == 'shard':
+                    self.done_shards.add(record['shard'])
+                elif kind == 'done':
+                    self.finished = True
+
+        if not self.header:
+            raise ValueError(f"Checkpoint {self.path} has no scan header")
+        return self
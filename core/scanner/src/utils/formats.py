@@ -0,0 +1,29 @@
+# Output format registry, kept import-light so the CLI can build --help
+# without loading the writers
+
+# --format name -> (OutputFormatter method, keyword arguments)
+OUTPUT_FORMATS = {
+    'csv': ('save_as_csv', {}),
+    'csv.gz': ('save_as_csv', {'compression': 'gzip'}),
+    'csv.zst': ('save_as_csv', {'compression': 'zstd'}),
+    'jsonl': ('save_as_jsonl', {}),
+    'jsonl.gz': ('save_as_jsonl', {'compression': 'gzip'}),
+    'parquet': ('save_as_parquet', {}),
+    'json': ('save_as_json', {})
+}
+
+# Optional packages a format needs: format -> (module, pip package)
+FORMAT_DEPENDENCIES = {
+    'csv.zst': ('zstandard', 'zstandard'),
+    'parquet': ('pyarrow.parquet', 'pyarrow')
+}
+
+
+def check_format(fmt: str) -> None:
+    """Raise ImportError early when an output format's optional package is missing"""
+    if fmt in FORMAT_DEPENDENCIES:
+        module, package = FORMAT_DEPENDENCIES[fmt]
+        try:
+            __import__(module)
+        except ImportError:
+            raise ImportError(f"{fmt} output requires the {package} package: pip install {package}")
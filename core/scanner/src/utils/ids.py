@@ -0,0 +1,56 @@
+import os
+import time
+from datetime import datetime
+from typing import Optional
+
+# Crockford base32 (no I, L, O, U) keeps IDs case-insensitive and URL/CSV safe
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {c: i for i, c in enumerate(_ALPHABET)}
+
+SCAN_ID_LENGTH = 26
+
+
+def generate_scan_id(when: Optional[datetime] = None) -> str:
+    """
+    Generate a compact, time-ordered scan identifier (ULID layout).
+
+    The first 10 characters encode a 48-bit millisecond timestamp and the
+    remaining 16 encode 80 random bits, so IDs sort lexically by creation
+    time and are always 26 characters wide.
+
+    Args:
+        when: Timestamp to embed (default: now)
+
+    Returns:
+        26 character Crockford base32 string
+    """
+    if when is None:
+        millis = time.time_ns() // 1_000_000
+    else:
+        millis = int(when.timestamp() * 1000)
+
+    value = (millis & 0xFFFFFFFFFFFF) << 80 | int.from_bytes(os.urandom(10), 'big')
+
+    chars = []
+    for _ in range(SCAN_ID_LENGTH):
+        chars.append(_ALPHABET[value & 0x1F])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def is_scan_id(value: str) -> bool:
+    """Check whether a string looks like a scan ID from generate_scan_id"""
+    if len(value) != SCAN_ID_LENGTH:
+        return False
+    return all(c in _DECODE for c in value.upper())
+
+
+def scan_id_timestamp(scan_id: str) -> datetime:
+    """Recover the creation time embedded in a scan ID"""
+    if not is_scan_id(scan_id):
+        raise ValueError(f"Invalid scan ID: {scan_id}")
+
+    millis = 0
+    for c in scan_id[:10].upper():
+        millis = (millis << 5) | _DECODE[c]
+    return datetime.fromtimestamp(millis / 1000)
@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser('~'), '.spectre', 'jobs.db')
+
+# queued -> running -> done | failed | cancelled
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+# Columns a running job may update through JobQueue.update()
+UPDATABLE = ('status', 'started_at', 'finished_at', 'scan_id', 'output', 'hosts', 'services', 'error')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    status        TEXT NOT NULL DEFAULT 'queued',
+    priority      INTEGER NOT NULL DEFAULT 0,
+    concurrency   INTEGER NOT NULL DEFAULT 1,
+    target        TEXT NOT NULL,
+    options       TEXT NOT NULL DEFAULT '{}',
+    submitted_at  TEXT NOT NULL,
+    started_at    TEXT,
+    finished_at   TEXT,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    cancel        INTEGER NOT NULL DEFAULT 0,
+    scan_id       TEXT,
+    output        TEXT,
+    hosts         INTEGER,
+    services      INTEGER,
+    error         TEXT
+);
+
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, id);
+"""
+
+def job_output_name(name: Optional[str]) -> Optional[str]:
+    """
+    Check a job's `output` option, a bare file name within the output directory.
+
+    Raises:
+        ValueError: If the name has a directory part or is a dot file
+    """
+    if name is None:
+        return None
+    if not name or os.path.basename(name) != name or '\\' in name or name.startswith('.'):
+        raise ValueError(f"Job output must be a plain file name, got: {name!r}")
+    return name
+
+
+_COLUMNS = ('id', 'status', 'priority', 'concurrency', 'target', 'options', 'submitted_at', 'started_at',
+            'finished_at', 'attempts', 'cancel', 'scan_id', 'output', 'hosts', 'services', 'error')
+
+
+class Job(NamedTuple):
+    """One queued scan and its outcome"""
+    id: int
+    status: str
+    priority: int
+    concurrency: int
+    target: str
+    options: Dict
+    submitted_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    attempts: int = 0
+    cancel: bool = False
+    scan_id: Optional[str] = None
+    output: Optional[str] = None
+    hosts: Optional[int] = None
+    services: Optional[int] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: Tuple) -> 'Job':
+        data = dict(zip(_COLUMNS, row))
+        data['options'] = json.loads(data['options'] or '{}')
+        data['cancel'] = bool(data['cancel'])
+        return cls(**data)
+
+    def as_dict(self) -> Dict:
+        return self._asdict()
+
+
+class JobQueue:
+    """
+    Durable scan job queue in a local SQLite database.
+
+    Jobs are claimed highest priority first (oldest first within a
+    priority) inside an IMMEDIATE transaction, so several processes can
+    share one queue file. `submit` and `jobs` only touch the database,
+    which is what keeps queueing a scan cheap compared to running one.
+
+    A job's `concurrency` is how many nmap processes it may run at once.
+    Running jobs left behind by a daemon that died are put back in the
+    queue by recover().
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit so claim() controls its own transaction. The daemon's
+        # worker threads share this connection under the lock.
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> 'JobQueue':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, target: str, options: Optional[Dict] = None, priority: int = 0,
+               concurrency: int = 1) -> int:
+        """Queue one scan, returns its job id"""
+        return self.submit_many([target], options, priority, concurrency)[0]
+
+    def submit_many(self, targets: Iterable[str], options: Optional[Dict] = None, priority: int = 0,
+                    concurrency: int = 1) -> List[int]:
+        """Queue one scan per target with shared settings in a single transaction"""
+        now = datetime.now().isoformat()
+        encoded = json.dumps(options or {}, sort_keys=True)
+        ids = []
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                for target in targets:
+                    cursor = self.conn.execute(
+                        'INSERT INTO jobs (target, options, priority, concurrency, submitted_at) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        (target, encoded, priority, max(1, concurrency), now)
+                    )
+                    ids.append(cursor.lastrowid)
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return ids
+
+    def claim(self, free_slots: int, max_concurrency: Optional[int] = None) -> Optional[Job]:
+        """
+        Mark the next queued job running and return it.
+
+        Scheduling is strict priority: when the head of the queue needs more
+        nmap slots than `free_slots` nothing is claimed, so small jobs can't
+        starve a large one. A job's concurrency is capped at `max_concurrency`.
+        """
+        with self._lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'queued' "
+                    'ORDER BY priority DESC, id LIMIT 1'
+                ).fetchone()
+                job = Job.from_row(row) if row else None
+                if job is not None and max_concurrency:
+                    job = job._replace(concurrency=min(job.concurrency, max_concurrency))
+                if job is None or job.concurrency > free_slots:
+                    self.conn.execute('ROLLBACK')
+                    return None
+                started = datetime.now().isoformat()
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (started, job.id)
+                )
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return job._replace(status='running', started_at=started, attempts=job.attempts + 1)
+
+    def update(self, job_id: int, **fields) -> None:
+        """Set progress or outcome columns of a job"""
+        unknown = set(fields) - set(UPDATABLE)
+        if unknown:
+            raise ValueError(f"Cannot update job columns: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def finish(self, job_id: int, status: str, **fields) -> None:
+        """Record a job's final status"""
+        if status not in JOB_STATUSES[2:]:
+            raise ValueError(f"Not a final job status: {status}")
+        self.update(job_id, status=status, finished_at=datetime.now().isoformat(), **fields)
+
+    def cancel(self, job_id: int) -> Optional[str]:
+        """
+        Cancel a job. Queued jobs are cancelled at once, running ones are
+        flagged for the daemon to stop. Returns the job's status afterwards,
+        None for an unknown job.
+        """
+        with self._lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (datetime.now().isoformat(), job_id)
+            )
+            self.conn.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            row = self.conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def cancel_requested(self, job_id: int) -> bool:
+        with self._lock:
+            row = self.conn.execute('SELECT cancel FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def recover(self) -> int:
+        """Requeue jobs a previous daemon left running, returns how many"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running' AND cancel = 0"
+            )
+            self.conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE status = 'running'",
+                (datetime.now().isoformat(),)
+            )
+        return cursor.rowcount
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self.conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Job]:
+        """Most recent jobs first, optionally only those in one status"""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = []
+        if status:
+            sql += ' WHERE status = ?'
+            params.append(status)
+        sql += ' ORDER BY id DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        with self._lock:
+            rows = self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
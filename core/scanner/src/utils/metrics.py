@@ -0,0 +1,104 @@
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Pipeline stages in the order they happen for a row
+STAGES = ('spawn', 'first_byte', 'xml_parse', 'row_build', 'serialize', 'write', 'index')
+
+COUNTERS = ('hosts', 'ports', 'bytes_read', 'bytes_written', 'nmap_runs')
+
+
+class ScanMetrics:
+    """
+    Per-stage timings and counters for one scan.
+
+        spawn        starting the nmap process
+        first_byte   nmap start until its first line of output
+        xml_parse    feeding nmap output through the XML parser
+        row_build    turning parsed hosts into result rows
+        serialize    flattening rows into the output format
+        write        writing (and compressing) the output file
+        index        adding saved rows to the cross-scan query index
+
+    Stage times are wall-clock seconds summed over every occurrence, so with
+    several shard workers they add up across processes. Counters are plain
+    totals. Everything is cheap enough to stay on for every scan.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.counters: Dict[str, int] = {counter: 0 for counter in COUNTERS}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block into a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def merge(self, other: Dict) -> None:
+        """Fold in as_dict() output from another process"""
+        for stage, seconds in other.get('stages', {}).items():
+            self.add(stage, seconds)
+        for counter, amount in other.get('counters', {}).items():
+            self.count(counter, amount)
+
+    def as_dict(self) -> Dict:
+        """Stage seconds, counters and peak memory for the metadata sidecar"""
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return {
+            'stages': {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            # ru_maxrss is KiB on Linux; children covers nmap and shard workers
+            'peak_rss_kib': own,
+            'peak_child_rss_kib': children
+        }
+
+    def write_prometheus(self, path: str, labels: Optional[Dict[str, str]] = None) -> None:
+        """
+        Write the metrics in Prometheus text exposition format.
+
+        The file is replaced atomically, so it can sit in a node_exporter
+        textfile collector directory.
+        """
+        data = self.as_dict()
+        label_text = ','.join(f'{k}="{v}"' for k, v in (labels or {}).items())
+
+        def series(name: str, extra: str = '') -> str:
+            inner = ','.join(part for part in (label_text, extra) if part)
+            return f"{name}{{{inner}}}" if inner else name
+
+        lines = [
+            '# HELP spectre_scan_stage_seconds Wall-clock seconds spent in each scan stage',
+            '# TYPE spectre_scan_stage_seconds gauge'
+        ]
+        for stage, seconds in data['stages'].items():
+            stage_label = 'stage="%s"' % stage
+            lines.append(f'{series("spectre_scan_stage_seconds", stage_label)} {seconds}')
+        for counter, amount in data['counters'].items():
+            name = f"spectre_scan_{counter}_total"
+            lines.append(f'# TYPE {name} counter')
+            lines.append(f'{series(name)} {amount}')
+        lines.append('# TYPE spectre_scan_peak_rss_bytes gauge')
+        lines.append(f'{series("spectre_scan_peak_rss_bytes")} {data["peak_rss_kib"] * 1024}')
+        lines.append('# TYPE spectre_scan_peak_child_rss_bytes gauge')
+        lines.append(f'{series("spectre_scan_peak_child_rss_bytes")} {data["peak_child_rss_kib"] * 1024}')
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
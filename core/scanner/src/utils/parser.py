@@ -1,22 +1,199 @@
 # modules/parser.py
 import json
 import csv
-from typing import List, Dict, Any
+import gzip
+import io
+import sqlite3
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+from utils.formats import OUTPUT_FORMATS
+from utils.records import Result, Row, row_dict, row_values
 import os
+import time
 from datetime import datetime
+from utils.ids import generate_scan_id
+from utils.metrics import ScanMetrics
+from utils.scan_index import ScanIndex
+
+# CSV column order shared by every writer
+FIELDNAMES = [
+    'timestamp',
+    'scan_id',
+    'target_ip',
+    'hostname',
+    'port',
+    'protocol',
+    'service',
+    'version',
+    'product',
+    'os_guess'
+]
+
+# Write buffer for uncompressed output files
+WRITE_BUFFER = 1024 * 1024
+
+# Rows per record batch in columnar output
+CHUNK_ROWS = 65536
+
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Low-cardinality columns stored dictionary-encoded in columnar output
+DICTIONARY_COLUMNS = {'scan_id', 'hostname', 'protocol', 'service', 'product', 'version', 'os_guess', 'change'}
+
+@contextmanager
+def _open_text(filepath: str, compression: Optional[str] = None):
+    """Open a text file for writing, optionally gzip or zstd compressed"""
+    if compression is None:
+        with open(filepath, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER) as f:
+            yield f
+    elif compression == 'gzip':
+        # Level 6 is nearly as small as 9 at a fraction of the CPU
+        with gzip.open(filepath, 'wt', compresslevel=6, newline='', encoding='utf-8') as f:
+            yield f
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd output requires the zstandard package: pip install zstandard")
+        with open(filepath, 'wb') as raw:
+            with zstandard.ZstdCompressor(level=3).stream_writer(raw) as compressed:
+                with io.TextIOWrapper(compressed, encoding='utf-8', newline='',
+                                      write_through=False) as f:
+                    yield f
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+
+@contextmanager
+def _read_text(filepath: str):
+    """Open a results file for reading, decompressing by extension"""
+    if filepath.endswith('.gz'):
+        with gzip.open(filepath, 'rt', newline='', encoding='utf-8') as f:
+            yield f
+    elif filepath.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading .zst files requires the zstandard package: pip install zstandard")
+        with open(filepath, 'rb') as raw:
+            with zstandard.ZstdDecompressor().stream_reader(raw) as decompressed:
+                with io.TextIOWrapper(decompressed, encoding='utf-8', newline='') as f:
+                    yield f
+    else:
+        with open(filepath, newline='', encoding='utf-8') as f:
+            yield f
+
+
+def results_format(filepath: str) -> str:
+    """The OUTPUT_FORMATS name a results file was written in, from its extension"""
+    for fmt in sorted(OUTPUT_FORMATS, key=len, reverse=True):
+        if filepath.endswith('.' + fmt):
+            return fmt
+    raise ValueError(f"Unrecognised results file: {filepath}")
+
+
+def iter_results(filepath: str) -> Iterator[Dict]:
+    """
+    Stream the rows of a results file written by OutputFormatter.
+
+    Works for every output format; all but json are read incrementally.
+    Rows come back as plain dicts keyed by column name.
+    """
+    fmt = results_format(filepath)
+
+    if fmt == 'json':
+        with open(filepath, encoding='utf-8') as f:
+            yield from json.load(f).get('results', [])
+    elif fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet requires pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(filepath).iter_batches(batch_size=CHUNK_ROWS):
+            for row in batch.to_pylist():
+                yield {k: ('' if v is None else str(v)) for k, v in row.items()}
+    elif fmt.startswith('jsonl'):
+        with _read_text(filepath) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with _read_text(filepath) as f:
+            yield from csv.DictReader(f)
+
+
+def read_metadata(filepath: str) -> Dict:
+    """Metadata of a results file: its sidecar, or the embedded block for json"""
+    if results_format(filepath) == 'json':
+        with open(filepath, encoding='utf-8') as f:
+            return json.load(f).get('metadata', {})
+    metadata_file = OutputFormatter().metadata_path(filepath)
+    if os.path.exists(metadata_file):
+        with open(metadata_file, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+class SummaryCollector:
+    """Accumulates summary statistics one result row at a time"""
+
+    def __init__(self):
+        self.total_services = 0
+        self.hosts = set()
+        self.port_counts = {}
+        self.service_counts = {}
+
+    def add(self, r: Row) -> None:
+        self.total_services += 1
+        if isinstance(r, Result):
+            ip, port, service = r.host.ip, r.port.port, r.port.service
+        else:
+            ip, port, service = r.get('target_ip', ''), r.get('port', ''), r.get('service', 'unknown')
+        self.hosts.add(ip)
+
+        # Count ports
+        if port:
+            self.port_counts[port] = self.port_counts.get(port, 0) + 1
+
+        # Count services
+        if service:
+            self.service_counts[service] = self.service_counts.get(service, 0) + 1
+
+    def summary(self) -> Dict:
+        # Get top 10 ports
+        top_ports = sorted(self.port_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+
+        return {
+            'total_services': self.total_services,
+            'unique_hosts': len(self.hosts),
+            'open_ports': sorted(list(self.port_counts.keys())),
+            'services_breakdown': self.service_counts,
+            'top_ports': [{'port': p[0], 'count': p[1]} for p in top_ports]
+        }
+
 
 class OutputFormatter:
     """Handles all output formatting for scan results"""
     
-    def __init__(self):
+    def __init__(self, fieldnames: Optional[List[str]] = None, metrics: Optional[ScanMetrics] = None,
+                 index: Optional[ScanIndex] = None):
+        self.fieldnames = fieldnames or FIELDNAMES
+        # Serialize/write timings land here, usually the scanner's metrics
+        self.metrics = metrics or ScanMetrics()
+        # Saved rows are also added to this cross-scan index
+        self.index = index
+        self._index_writer = None
         self.metadata = {}
+        self.summary = SummaryCollector().summary()
+        self.output_path = None
     
     def set_metadata(self, scan_start: datetime, scan_end: datetime, 
-                     target: str, total_hosts: int, total_services: int):
-        """Set scan metadata for inclusion in output"""
+                     target: str, total_hosts: int, total_services: int,
+                     scan_id: Optional[str] = None, performance: Optional[Dict] = None):
+        """Set scan metadata for inclusion in output, `performance` is ScanMetrics.as_dict()"""
         duration = (scan_end - scan_start).total_seconds()
         self.metadata = {
-            'scan_id': scan_start.strftime('%Y%m%d_%H%M%S'),
+            'scan_id': scan_id or generate_scan_id(scan_start),
             'target': target,
             'start_time': scan_start.isoformat(),
             'end_time': scan_end.isoformat(),
@@ -27,6 +204,8 @@ class OutputFormatter:
             'scan_date': scan_start.strftime('%Y-%m-%d'),
             'scan_time': scan_start.strftime('%H:%M:%S')
         }
+        if performance is not None:
+            self.metadata['performance'] = performance
     
     def _format_duration(self, seconds: float) -> str:
         """Format duration in human-readable format"""
@@ -37,129 +216,313 @@ class OutputFormatter:
         else:
             return f"{seconds/3600:.1f}h"
     
-    def save_as_csv(self, results: List[Dict], filepath: str) -> None:
+    def _prepare_path(self, filepath: str, extension: str) -> str:
+        """Ensure the file extension and create the parent directory"""
+        if not filepath.endswith(extension):
+            filepath += extension
+
+        # Create directory if needed
+        os.makedirs(os.path.dirname(filepath), exist_ok=True) if os.path.dirname(filepath) else None
+        return filepath
+
+    def metadata_path(self, filepath: str) -> str:
+        """Path of the metadata sidecar written next to a results file"""
+        base = filepath
+        for extension in COMPRESSION_EXTENSIONS.values():
+            if base.endswith(extension):
+                base = base[:-len(extension)]
+        return os.path.splitext(base)[0] + '_metadata.json'
+
+    def save(self, results: Iterable[Row], filepath: str, fmt: str = 'csv',
+             write_metadata: bool = True) -> Dict:
+        """Save results in any of the OUTPUT_FORMATS"""
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {fmt}")
+        method, kwargs = OUTPUT_FORMATS[fmt]
+        if method == 'save_as_json':
+            # The JSON document embeds its metadata
+            return self.save_as_json(list(results), filepath)
+        return getattr(self, method)(results, filepath, write_metadata=write_metadata, **kwargs)
+
+    def _record_write(self, filepath: str, serialize_time: float, write_time: float) -> None:
+        self.metrics.add('serialize', serialize_time)
+        self.metrics.add('write', write_time)
+        self.metrics.count('bytes_written', os.path.getsize(filepath))
+
+    def _indexed(self, results: Iterable[Row]) -> Iterable[Row]:
+        """Pass rows through, adding each to the scan index on the way"""
+        if self.index is None:
+            return results
+        self._index_writer = self.index.writer(self.metadata.get('scan_id'))
+        return self._feed_index(results, self._index_writer)
+
+    def _feed_index(self, results: Iterable[Row], writer) -> Iterator[Row]:
+        clock = time.perf_counter
+        index_time = 0.0
+        for result in results:
+            if writer is not None:
+                start = clock()
+                try:
+                    writer.add(result)
+                except sqlite3.Error as e:
+                    # The results file matters more than the index
+                    print(f"[ERROR] Scan index disabled for this scan: {e}")
+                    writer = self._index_writer = None
+                index_time += clock() - start
+            yield result
+        self.metrics.add('index', index_time)
+
+    def _finish_index(self) -> None:
+        if self._index_writer is not None:
+            try:
+                self._index_writer.finish(self.metadata, self.output_path)
+            except sqlite3.Error as e:
+                print(f"[ERROR] Failed to update scan index: {e}")
+            self._index_writer = None
+
+    def save_metadata(self, filepath: str) -> str:
+        """Write the metadata sidecar for a results file"""
+        metadata_file = self.metadata_path(filepath)
+        with open(metadata_file, 'w') as f:
+            json.dump(self.metadata, f, indent=2)
+        # Totals are known now, so the indexed scan is complete too
+        self._finish_index()
+        return metadata_file
+
+    def save_as_csv(self, results: Iterable[Row], filepath: str,
+                    write_metadata: bool = True, compression: Optional[str] = None) -> Dict:
         """
         Save scan results as CSV with proper formatting
         Expected columns: timestamp,scan_id,target_ip,hostname,port,protocol,service,version,product,os_guess
+
+        Rows are written one at a time, so `results` may be a generator. When
+        streaming, pass write_metadata=False and call save_metadata() once the
+        totals are known. `compression` may be 'gzip' or 'zstd'.
         """
-        # Ensure .csv extension
-        if not filepath.endswith('.csv'):
-            filepath += '.csv'
+        filepath = self._prepare_path(filepath, '.csv' + COMPRESSION_EXTENSIONS.get(compression, ''))
+        self.output_path = filepath
+        results = self._indexed(results)
         
         print(f"[PARSER] Saving results to {filepath}")
         
         try:
-            # Create directory if needed
-            os.makedirs(os.path.dirname(filepath), exist_ok=True) if os.path.dirname(filepath) else None
-            
-            # Define fieldnames in exact order
-            fieldnames = [
-                'timestamp',
-                'scan_id',
-                'target_ip',
-                'hostname',
-                'port',
-                'protocol',
-                'service',
-                'version',
-                'product',
-                'os_guess'
-            ]
-            
-            # Ensure all results have all fields (fill missing with empty strings)
-            formatted_results = []
-            for result in results:
-                formatted_result = {field: result.get(field, '') for field in fieldnames}
-                formatted_results.append(formatted_result)
-            
-            # Write CSV
-            with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(formatted_results)
-            
-            # Write metadata file
-            metadata_file = filepath.replace('.csv', '_metadata.json')
-            with open(metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            collector = SummaryCollector()
+
+            clock = time.perf_counter
+            serialize_time = write_time = 0.0
+
+            # Missing fields are written as empty strings
+            with _open_text(filepath, compression) as f:
+                writer = csv.writer(f)
+                writer.writerow(self.fieldnames)
+                for result in results:
+                    start = clock()
+                    values = row_values(result, self.fieldnames)
+                    serialized = clock()
+                    writer.writerow(values)
+                    serialize_time += serialized - start
+                    write_time += clock() - serialized
+                    collector.add(result)
+                closing = clock()
+            write_time += clock() - closing
+            self._record_write(filepath, serialize_time, write_time)
             
-            print(f"[PARSER] Successfully saved {len(results)} results to {filepath}")
-            print(f"[PARSER] Metadata saved to {metadata_file}")
+            self.summary = collector.summary()
+            print(f"[PARSER] Successfully saved {collector.total_services} results to {filepath}")
+
+            if write_metadata:
+                metadata_file = self.save_metadata(filepath)
+                print(f"[PARSER] Metadata saved to {metadata_file}")
+
+            return self.summary
             
         except Exception as e:
             print(f"[ERROR] Failed to save CSV: {e}")
             raise
+
+    def save_as_jsonl(self, results: Iterable[Row], filepath: str,
+                      write_metadata: bool = True, compression: Optional[str] = None) -> Dict:
+        """
+        Save scan results as JSON Lines, one result object per line.
+        Metadata goes to a sidecar file like save_as_csv.
+        """
+        filepath = self._prepare_path(filepath, '.jsonl' + COMPRESSION_EXTENSIONS.get(compression, ''))
+        self.output_path = filepath
+        results = self._indexed(results)
+
+        print(f"[PARSER] Saving results to {filepath}")
+
+        try:
+            collector = SummaryCollector()
+
+            clock = time.perf_counter
+            serialize_time = write_time = 0.0
+
+            with _open_text(filepath, compression) as f:
+                for result in results:
+                    start = clock()
+                    line = json.dumps(row_dict(result), ensure_ascii=False, default=str) + '\n'
+                    serialized = clock()
+                    f.write(line)
+                    serialize_time += serialized - start
+                    write_time += clock() - serialized
+                    collector.add(result)
+                closing = clock()
+            write_time += clock() - closing
+            self._record_write(filepath, serialize_time, write_time)
+
+            self.summary = collector.summary()
+            print(f"[PARSER] Successfully saved {collector.total_services} results to {filepath}")
+
+            if write_metadata:
+                metadata_file = self.save_metadata(filepath)
+                print(f"[PARSER] Metadata saved to {metadata_file}")
+
+            return self.summary
+
+        except Exception as e:
+            print(f"[ERROR] Failed to save JSONL: {e}")
+            raise
     
-    def save_as_json(self, results: List[Dict], filepath: str) -> None:
+    def save_as_parquet(self, results: Iterable[Row], filepath: str,
+                        write_metadata: bool = True, chunk_size: int = CHUNK_ROWS) -> Dict:
+        """
+        Save scan results as Parquet, one row group per `chunk_size` rows.
+
+        Ports are stored as integers and repetitive string columns (service,
+        product, os_guess, ...) are dictionary-encoded. Requires pyarrow.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow")
+
+        filepath = self._prepare_path(filepath, '.parquet')
+        self.output_path = filepath
+        results = self._indexed(results)
+
+        print(f"[PARSER] Saving results to {filepath}")
+
+        fields = []
+        for name in self.fieldnames:
+            if name == 'port':
+                fields.append(pa.field(name, pa.int32()))
+            elif name in DICTIONARY_COLUMNS:
+                fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        schema = pa.schema(fields)
+
+        def to_batch(chunk: Dict[str, List]) -> Any:
+            arrays = []
+            for field in schema:
+                values = chunk[field.name]
+                if field.name == 'port':
+                    arrays.append(pa.array([int(v) if v not in ('', None) else None for v in values], pa.int32()))
+                elif pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, pa.string()))
+            return pa.record_batch(arrays, schema=schema)
+
+        try:
+            collector = SummaryCollector()
+            chunk = {name: [] for name in self.fieldnames}
+            rows = 0
+
+            clock = time.perf_counter
+            serialize_time = write_time = 0.0
+
+            def flush(chunk):
+                nonlocal serialize_time, write_time
+                start = clock()
+                batch = to_batch(chunk)
+                serialized = clock()
+                writer.write_batch(batch)
+                serialize_time += serialized - start
+                write_time += clock() - serialized
+
+            with pq.ParquetWriter(filepath, schema, compression='zstd') as writer:
+                columns = [chunk[name] for name in self.fieldnames]
+                for result in results:
+                    start = clock()
+                    for column, value in zip(columns, row_values(result, self.fieldnames)):
+                        column.append(str(value))
+                    serialize_time += clock() - start
+                    collector.add(result)
+                    rows += 1
+                    if rows == chunk_size:
+                        flush(chunk)
+                        chunk = {name: [] for name in self.fieldnames}
+                        columns = [chunk[name] for name in self.fieldnames]
+                        rows = 0
+                if rows:
+                    flush(chunk)
+                closing = clock()
+            write_time += clock() - closing
+            self._record_write(filepath, serialize_time, write_time)
+
+            self.summary = collector.summary()
+            print(f"[PARSER] Successfully saved {collector.total_services} results to {filepath}")
+
+            if write_metadata:
+                metadata_file = self.save_metadata(filepath)
+                print(f"[PARSER] Metadata saved to {metadata_file}")
+
+            return self.summary
+
+        except Exception as e:
+            print(f"[ERROR] Failed to save Parquet: {e}")
+            raise
+
+    def save_as_json(self, results: List[Row], filepath: str) -> Dict:
         """Save scan results as JSON with metadata included"""
-        # Ensure .json extension
-        if not filepath.endswith('.json'):
-            filepath += '.json'
+        filepath = self._prepare_path(filepath, '.json')
+        self.output_path = filepath
         
         print(f"[PARSER] Saving results to {filepath}")
         
         try:
-            # Create directory if needed
-            os.makedirs(os.path.dirname(filepath), exist_ok=True) if os.path.dirname(filepath) else None
-            
+            self.summary = self._generate_summary(results)
+
             # Structure output with metadata
             output = {
                 'metadata': self.metadata,
-                'summary': self._generate_summary(results),
-                'results': results
+                'summary': self.summary,
+                'results': [row_dict(r) for r in results]
             }
             
             # Write JSON with proper formatting
+            start = time.perf_counter()
+            text = json.dumps(output, indent=2, ensure_ascii=False, default=str)
+            serialized = time.perf_counter()
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(output, f, indent=2, ensure_ascii=False, default=str)
+                f.write(text)
+            self._record_write(filepath, serialized - start, time.perf_counter() - serialized)
+
+            if self.index is not None:
+                for _ in self._indexed(results):
+                    pass
+                self._finish_index()
             
             print(f"[PARSER] Successfully saved {len(results)} results to {filepath}")
+            return self.summary
             
         except Exception as e:
             print(f"[ERROR] Failed to save JSON: {e}")
             raise
     
-    def _generate_summary(self, results: List[Dict]) -> Dict:
+    def _generate_summary(self, results: Iterable[Row]) -> Dict:
         """Generate summary statistics from results"""
-        if not results:
-            return {
-                'total_services': 0,
-                'unique_hosts': 0,
-                'open_ports': [],
-                'services_breakdown': {},
-                'top_ports': []
-            }
-        
-        # Calculate statistics
-        unique_hosts = set(r.get('target_ip', '') for r in results)
-        port_counts = {}
-        service_counts = {}
-        
+        collector = SummaryCollector()
         for r in results:
-            # Count ports
-            port = r.get('port', '')
-            if port:
-                port_counts[port] = port_counts.get(port, 0) + 1
-            
-            # Count services
-            service = r.get('service', 'unknown')
-            if service:
-                service_counts[service] = service_counts.get(service, 0) + 1
-        
-        # Get top 10 ports
-        top_ports = sorted(port_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        return {
-            'total_services': len(results),
-            'unique_hosts': len(unique_hosts),
-            'open_ports': sorted(list(port_counts.keys())),
-            'services_breakdown': service_counts,
-            'top_ports': [{'port': p[0], 'count': p[1]} for p in top_ports]
-        }
+            collector.add(r)
+        return collector.summary()
     
-    def print_summary(self, results: List[Dict]) -> None:
-        """Print formatted summary to console"""
-        summary = self._generate_summary(results)
+    def print_summary(self, results: Optional[List[Row]] = None) -> None:
+        """Print formatted summary to console (defaults to the last saved results)"""
+        summary = self._generate_summary(results) if results is not None else self.summary
         
         print(f"\n{'='*50}")
         print(f"SCAN SUMMARY")
@@ -183,12 +546,12 @@ class OutputFormatter:
         print(f"{'='*50}\n")
 
 # Convenience functions for backward compatibility
-def save_as_csv(results: List[Dict], filepath: str) -> None:
+def save_as_csv(results: List[Row], filepath: str) -> None:
     """Legacy function - creates formatter and saves"""
     formatter = OutputFormatter()
     formatter.save_as_csv(results, filepath)
 
-def save_as_json(results: List[Dict], filepath: str) -> None:
+def save_as_json(results: List[Row], filepath: str) -> None:
     """Legacy function - creates formatter and saves"""
     formatter = OutputFormatter()
     formatter.save_as_json(results, filepath)
\ No newline at end of file
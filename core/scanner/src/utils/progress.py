@@ -0,0 +1,131 @@
+import sys
+import time
+from typing import Dict, Hashable, Optional
+
+# nmap --stats-every interval used when progress is displayed
+STATS_INTERVAL = "2s"
+
+
+class NullProgress:
+    """Progress sink for quiet and non-TTY runs, every call is a no-op"""
+
+    enabled = False
+
+    def handle(self, event: Dict, shard: Hashable = 0) -> None:
+        pass
+
+    def shard_done(self, shard: Hashable = 0) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ProgressTracker:
+    """
+    Tracks scan progress from nmap's structured <taskbegin>, <taskprogress>
+    and <taskend> events.
+
+    Each shard (one nmap process) reports its current phase and percent.
+    Overall progress is finished shards plus the fraction of the running
+    ones, and the ETA is extrapolated from elapsed time. The display is
+    refreshed at most once every `min_interval` seconds.
+    """
+
+    enabled = True
+
+    def __init__(self, total_shards: int = 1, desc: str = "Nmap Progress", min_interval: float = 0.5):
+        from tqdm import tqdm
+
+        self.total_shards = max(1, total_shards)
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        self.done = 0
+        # shard -> {'task': phase name, 'percent': float, 'remaining': seconds}
+        self.active: Dict[Hashable, Dict] = {}
+        self._last_draw = 0.0
+        self.desc = desc
+        self._bar = tqdm(total=100, desc=desc, unit="%",
+                         bar_format="{desc} {percentage:3.0f}%|{bar}|")
+
+    @property
+    def fraction(self) -> float:
+        running = sum(s['percent'] for s in self.active.values()) / 100
+        return min(1.0, (self.done + running) / self.total_shards)
+
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until the whole scan finishes"""
+        fraction = self.fraction
+        if fraction <= 0:
+            return None
+        if len(self.active) == 1 and self.done == 0 and self.total_shards == 1:
+            # Single nmap run, trust its own estimate for the current phase
+            remaining = next(iter(self.active.values())).get('remaining')
+            if remaining is not None:
+                return remaining
+        elapsed = time.monotonic() - self.started
+        return elapsed * (1 - fraction) / fraction
+
+    def handle(self, event: Dict, shard: Hashable = 0) -> None:
+        """Apply one nmap task event for a shard"""
+        state = self.active.setdefault(shard, {'task': '', 'percent': 0.0, 'remaining': None})
+        kind = event.get('event')
+
+        if kind == 'taskbegin':
+            state.update(task=event.get('task', ''), percent=0.0, remaining=None)
+        elif kind == 'taskprogress':
+            state.update(task=event.get('task', state['task']),
+                         percent=event.get('percent', state['percent']),
+                         remaining=event.get('remaining'))
+        elif kind == 'taskend':
+            state.update(percent=100.0, remaining=None)
+
+        self._draw()
+
+    def shard_done(self, shard: Hashable = 0) -> None:
+        self.active.pop(shard, None)
+        self.done += 1
+        self._draw(force=True)
+
+    def _draw(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_draw < self.min_interval:
+            return
+        self._last_draw = now
+
+        status = sorted({s['task'] for s in self.active.values() if s['task']})
+        if self.total_shards > 1:
+            status.insert(0, f"{self.done}/{self.total_shards} shards")
+        eta = self.eta()
+        if eta is not None:
+            status.append(f"ETA {_format_eta(eta)}")
+
+        self._bar.n = round(self.fraction * 100, 1)
+        self._bar.set_description_str(f"{self.desc} [{', '.join(status)}]" if status else self.desc,
+                                      refresh=False)
+        self._bar.refresh()
+
+    def close(self) -> None:
+        self._draw(force=True)
+        self._bar.close()
+
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def progress_enabled(quiet: bool = False) -> bool:
+    """Progress is only drawn for interactive runs"""
+    return not quiet and sys.stderr.isatty()
+
+
+def make_progress(enabled: bool, total_shards: int = 1, desc: str = "Nmap Progress"):
+    """ProgressTracker when enabled, otherwise a NullProgress"""
+    if not enabled:
+        return NullProgress()
+    return ProgressTracker(total_shards=total_shards, desc=desc)
@@ -0,0 +1,145 @@
+import sys
+from operator import attrgetter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+
+def intern(value: Optional[str]) -> str:
+    """Share one string object for values repeated across many rows"""
+    return sys.intern(value) if value else ''
+
+
+class Port(NamedTuple):
+    """One open port as reported by nmap"""
+    port: str
+    protocol: str = ''
+    state: str = ''
+    service: str = ''
+    version: str = ''
+    product: str = ''
+
+
+class Host(NamedTuple):
+    """One scanned host and its open ports"""
+    ip: str
+    hostname: str = ''
+    state: str = ''
+    os_guess: str = ''
+    ports: Tuple[Port, ...] = ()
+
+    def as_dict(self) -> Dict:
+        """Plain dict form, used for checkpoint journals"""
+        data = self._asdict()
+        data['ports'] = [p._asdict() for p in self.ports]
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Host':
+        ports = tuple(
+            Port(**{f: intern(str(p.get(f, ''))) for f in Port._fields})
+            for p in data.get('ports', [])
+        )
+        return cls(
+            ip=data.get('ip', ''),
+            hostname=data.get('hostname', ''),
+            state=intern(data.get('state', '')),
+            os_guess=intern(data.get('os_guess', '')),
+            ports=ports
+        )
+
+
+# Output column -> how to read it from a Result
+_COLUMNS = {
+    'timestamp': attrgetter('timestamp'),
+    'scan_id': attrgetter('scan_id'),
+    'target_ip': attrgetter('host.ip'),
+    'hostname': attrgetter('host.hostname'),
+    'port': attrgetter('port.port'),
+    'protocol': attrgetter('port.protocol'),
+    'service': attrgetter('port.service'),
+    'version': attrgetter('port.version'),
+    'product': attrgetter('port.product'),
+    'os_guess': attrgetter('host.os_guess')
+}
+
+RESULT_COLUMNS = list(_COLUMNS)
+
+
+class Result:
+    """
+    One output row: an open port on a host.
+
+    Host-level fields live once on the shared Host, so a host with many
+    open ports costs one small slotted object per port instead of a dict
+    with every column copied. Rows are flattened only when serialized.
+    Extra columns (e.g. `change`) are kept in an optional dict.
+
+    Supports read-only mapping access (`row['port']`, `row.get(...)`) so
+    code written against plain row dicts keeps working.
+    """
+
+    __slots__ = ('timestamp', 'scan_id', 'host', 'port', 'extra')
+
+    def __init__(self, timestamp: str, scan_id: Optional[str], host: Host, port: Port,
+                 extra: Optional[Dict] = None):
+        self.timestamp = timestamp
+        self.scan_id = scan_id
+        self.host = host
+        self.port = port
+        self.extra = extra
+
+    def annotate(self, **fields) -> 'Result':
+        """Attach extra columns in place and return the row"""
+        if self.extra is None:
+            self.extra = fields
+        else:
+            self.extra.update(fields)
+        return self
+
+    def __getitem__(self, key: str):
+        column = _COLUMNS.get(key)
+        if column is not None:
+            return column(self)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in _COLUMNS or bool(self.extra and key in self.extra)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return RESULT_COLUMNS + list(self.extra or ())
+
+    def values(self, fieldnames: Iterable[str]) -> List:
+        """Column values in `fieldnames` order, '' for missing extras"""
+        extra = self.extra or {}
+        return [_COLUMNS[f](self) if f in _COLUMNS else extra.get(f, '') for f in fieldnames]
+
+    def as_dict(self) -> Dict:
+        row = {name: column(self) for name, column in _COLUMNS.items()}
+        if self.extra:
+            row.update(self.extra)
+        return row
+
+    def __repr__(self):
+        return f"<Result {self.host.ip}:{self.port.port}/{self.port.protocol} {self.port.service}>"
+
+
+Row = Union[Result, Dict]
+
+
+def row_values(row: Row, fieldnames: Iterable[str]) -> List:
+    """Values for a Result or plain row dict in column order"""
+    if isinstance(row, Result):
+        return row.values(fieldnames)
+    return [row.get(f, '') for f in fieldnames]
+
+
+def row_dict(row: Row) -> Dict:
+    """Plain dict for a Result or row dict"""
+    return row.as_dict() if isinstance(row, Result) else row
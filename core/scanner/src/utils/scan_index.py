@@ -0,0 +1,305 @@
+import ipaddress
+import os
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.records import Result, Row
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.spectre', 'index.db')
+
+# Rows buffered before each executemany()
+INSERT_BATCH = 5000
+
+# Columns returned by ScanIndex.query()
+QUERY_COLUMNS = ['seen_at', 'scan_id', 'target_ip', 'hostname', 'port', 'protocol',
+                 'service', 'product', 'version', 'os_guess', 'change']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id          INTEGER PRIMARY KEY,
+    scan_id     TEXT NOT NULL UNIQUE,
+    target      TEXT,
+    start_time  TEXT,
+    end_time    TEXT,
+    path        TEXT,
+    rows        INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS services (
+    scan          INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    seen_at       TEXT,
+    ip            TEXT NOT NULL,
+    ip_bin        BLOB,
+    hostname      TEXT,
+    port          INTEGER,
+    protocol      TEXT,
+    service       TEXT,
+    product       TEXT,
+    version       TEXT,
+    version_sort  TEXT,
+    os_guess      TEXT,
+    change        TEXT
+);
+
+CREATE INDEX IF NOT EXISTS services_ip ON services (ip_bin, seen_at);
+CREATE INDEX IF NOT EXISTS services_port ON services (port, seen_at);
+CREATE INDEX IF NOT EXISTS services_service ON services (service COLLATE NOCASE, seen_at);
+CREATE INDEX IF NOT EXISTS services_product ON services (product COLLATE NOCASE, version_sort);
+CREATE INDEX IF NOT EXISTS services_seen ON services (seen_at);
+CREATE INDEX IF NOT EXISTS services_scan ON services (scan);
+"""
+
+_VERSION_TOKEN = re.compile(r'\d+|[a-z]+')
+_VERSION_FILTER = re.compile(r'^\s*(<=|>=|<|>|=)?\s*(.+?)\s*$')
+_RELATIVE_TIME = re.compile(r'^(\d+)\s*([smhdw])$')
+_TIME_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+
+
+def sortable_version(version: str) -> Optional[str]:
+    """
+    Version string that sorts correctly as text.
+
+    Numeric runs are zero-padded, so "8.9p1" becomes
+    "0000000008.0000000009.p.0000000001" and "1.10" sorts after "1.9".
+    Only nmap's leading version number is used ("8.9p1 Ubuntu 3" -> "8.9p1").
+    """
+    if not version:
+        return None
+    tokens = _VERSION_TOKEN.findall(version.split(None, 1)[0].lower())
+    if not tokens:
+        return None
+    return '.'.join(f"{int(t):010d}" if t.isdigit() else t for t in tokens)
+
+
+def ip_key(address: str) -> Optional[bytes]:
+    """16-byte sortable address, IPv4 mapped into IPv6 space so both share one index"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\0' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+
+def network_range(spec: str) -> Tuple[bytes, bytes]:
+    """First and last ip_key() of an address or CIDR block"""
+    network = ipaddress.ip_network(spec, strict=False)
+    return ip_key(str(network.network_address)), ip_key(str(network.broadcast_address))
+
+
+def parse_time(value: str) -> str:
+    """ISO timestamp from an ISO date/time or a relative age such as 7d or 12h"""
+    match = _RELATIVE_TIME.match(value.strip())
+    if match:
+        amount, unit = match.groups()
+        return (datetime.now() - timedelta(**{_TIME_UNITS[unit]: int(amount)})).isoformat()
+    return datetime.fromisoformat(value.strip()).isoformat()
+
+
+class ScanIndex:
+    """
+    Local SQLite index of every saved scan, for cross-scan lookups.
+
+    One row per result with indexes on address (as a sortable blob, so CIDR
+    blocks are range scans), port, service, product + version and time.
+    Versions are also stored in a zero-padded form so "OpenSSH < 8" is an
+    index range instead of a scan over every row.
+
+    OutputFormatter feeds rows in while a scan is written (see writer()),
+    so the index grows one scan at a time instead of re-reading files.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        # Refreshes planner statistics once the tables have grown
+        self.conn.execute('PRAGMA optimize')
+        self.conn.close()
+
+    def __enter__(self) -> 'ScanIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _scan_key(self, scan_id: str) -> int:
+        self.conn.execute('INSERT OR IGNORE INTO scans (scan_id) VALUES (?)', (scan_id,))
+        return self.conn.execute('SELECT id FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()[0]
+
+    def forget_scan(self, scan_id: str) -> None:
+        """Drop a scan's rows, e.g. before indexing its file again"""
+        with self.conn:
+            self.conn.execute('DELETE FROM scans WHERE scan_id = ?', (scan_id,))
+
+    def writer(self, scan_id: Optional[str] = None) -> 'IndexWriter':
+        return IndexWriter(self, scan_id)
+
+    def add_rows(self, rows: Iterable[Row], metadata: Optional[Dict] = None,
+                 path: Optional[str] = None) -> int:
+        """Index an already saved scan, replacing any earlier copy of it"""
+        writer = self.writer((metadata or {}).get('scan_id'))
+        for row in rows:
+            writer.add(row)
+        writer.finish(metadata, path)
+        return writer.rows
+
+    def scans(self) -> List[Dict]:
+        cursor = self.conn.execute(
+            'SELECT scan_id, target, start_time, end_time, path, rows FROM scans ORDER BY start_time')
+        names = [c[0] for c in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def query(self, port: Optional[int] = None, protocol: Optional[str] = None,
+              service: Optional[str] = None, product: Optional[str] = None,
+              version: Optional[str] = None, ip: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              scan_id: Optional[str] = None, change: Optional[str] = None,
+              latest: bool = False, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Matching rows, newest first.
+
+        `product` and `service` match case-insensitively; `product` also
+        accepts a trailing * as a prefix match. `version` is an exact
+        version prefix ("1.18") or a comparison ("<8", ">=7.4p1"). `ip` is
+        an address or CIDR block. `since`/`until` take ISO times or ages
+        such as "7d". With `latest`, only each host's most recent scan in
+        the index counts, i.e. what is exposed now rather than ever.
+        """
+        where, params = [], []
+        if port is not None:
+            where.append('s.port = ?')
+            params.append(port)
+        if protocol:
+            where.append('s.protocol = ?')
+            params.append(protocol.lower())
+        if service:
+            where.append('s.service = ? COLLATE NOCASE')
+            params.append(service)
+        if product:
+            if product.endswith('*'):
+                # LIKE is case-insensitive and can use the NOCASE index
+                where.append("s.product LIKE ? ESCAPE '\\'")
+                params.append(product[:-1].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            else:
+                where.append('s.product = ? COLLATE NOCASE')
+                params.append(product)
+        if version:
+            operator, value = _VERSION_FILTER.match(version).groups()
+            if operator:
+                where.append(f's.version_sort {"=" if operator == "=" else operator} ?')
+                params.append(sortable_version(value))
+            else:
+                where.append('(s.version = ? OR s.version LIKE ?)')
+                params.extend([value, value + '%'])
+        if ip:
+            low, high = network_range(ip)
+            where.append('s.ip_bin BETWEEN ? AND ?')
+            params.extend([low, high])
+        if since:
+            where.append('s.seen_at >= ?')
+            params.append(parse_time(since))
+        if until:
+            where.append('s.seen_at <= ?')
+            params.append(parse_time(until))
+        if scan_id:
+            where.append('sc.scan_id = ?')
+            params.append(scan_id)
+        if change:
+            where.append('s.change = ?')
+            params.append(change)
+        if latest:
+            where.append('s.seen_at = (SELECT MAX(l.seen_at) FROM services l WHERE l.ip_bin = s.ip_bin)')
+
+        sql = ('SELECT s.seen_at, sc.scan_id, s.ip, s.hostname, s.port, s.protocol, s.service, '
+               's.product, s.version, s.os_guess, s.change '
+               'FROM services s JOIN scans sc ON sc.id = s.scan')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY s.seen_at DESC, s.ip_bin, s.port'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        for row in self.conn.execute(sql, params):
+            yield dict(zip(QUERY_COLUMNS, row))
+
+
+class IndexWriter:
+    """Buffers one scan's rows into a ScanIndex as they are saved"""
+
+    def __init__(self, index: ScanIndex, scan_id: Optional[str] = None):
+        self.index = index
+        self.scan_id = scan_id
+        self.scan_key: Optional[int] = None
+        self.buffer: List[Tuple] = []
+        self.rows = 0
+
+    def add(self, row: Row) -> None:
+        if isinstance(row, Result):
+            host, port = row.host, row.port
+            ip, hostname, os_guess = host.ip, host.hostname, host.os_guess
+            number, protocol, service = port.port, port.protocol, port.service
+            product, version, timestamp = port.product, port.version, row.timestamp
+            scan_id, change = row.scan_id, (row.extra or {}).get('change', '')
+        else:
+            ip, hostname, os_guess = row.get('target_ip', ''), row.get('hostname', ''), row.get('os_guess', '')
+            number, protocol, service = row.get('port', ''), row.get('protocol', ''), row.get('service', '')
+            product, version, timestamp = row.get('product', ''), row.get('version', ''), row.get('timestamp', '')
+            scan_id, change = row.get('scan_id'), row.get('change', '')
+
+        if self.scan_key is None:
+            # A scan's file is always saved whole, so a re-save (e.g. after
+            # --resume) replaces what was indexed for it before
+            self.scan_id = self.scan_id or scan_id or 'unknown'
+            self.index.forget_scan(self.scan_id)
+            self.scan_key = self.index._scan_key(self.scan_id)
+
+        self.buffer.append((
+            self.scan_key, timestamp or None, ip, ip_key(ip), hostname,
+            int(number) if str(number).isdigit() else None, protocol, service,
+            product, version, sortable_version(version), os_guess, change or None
+        ))
+        self.rows += 1
+        if len(self.buffer) >= INSERT_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            with self.index.conn:
+                self.index.conn.executemany(
+                    'INSERT INTO services (scan, seen_at, ip, ip_bin, hostname, port, protocol, service, '
+                    'product, version, version_sort, os_guess, change) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    self.buffer
+                )
+            self.buffer = []
+
+    def finish(self, metadata: Optional[Dict] = None, path: Optional[str] = None) -> None:
+        """Flush the remaining rows and record the scan's metadata"""
+        self.flush()
+        metadata = metadata or {}
+        scan_id = metadata.get('scan_id') or self.scan_id
+        if not scan_id:
+            # Nothing was saved and nothing identifies the scan
+            return
+        with self.index.conn:
+            key = self.scan_key if self.scan_key is not None else self.index._scan_key(scan_id)
+            self.index.conn.execute(
+                'UPDATE scans SET scan_id = ?, target = COALESCE(?, target), '
+                'start_time = COALESCE(?, start_time), end_time = COALESCE(?, end_time), '
+                'path = COALESCE(?, path), rows = (SELECT COUNT(*) FROM services WHERE scan = ?) '
+                'WHERE id = ?',
+                (scan_id, metadata.get('target'), metadata.get('start_time'), metadata.get('end_time'),
+                 os.path.abspath(path) if path else None, key, key)
+            )
@@ -0,0 +1,102 @@
+import csv
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.parser import FIELDNAMES
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser('~'), '.spectre', 'state.csv')
+
+# Fields compared to decide whether a service changed between scans
+SERVICE_FIELDS = ('service', 'product', 'version')
+
+StateKey = Tuple[str, str, str]
+
+
+def state_key(row: Dict) -> StateKey:
+    return (row.get('target_ip', ''), str(row.get('port', '')), row.get('protocol', ''))
+
+
+class ScanState:
+    """
+    Last-seen service state keyed by (ip, port, protocol).
+
+    Stored as a CSV with the same columns OutputFormatter.save_as_csv writes,
+    where each row's timestamp is when the service was last probed.
+    """
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        self.rows: Dict[StateKey, Dict] = {}
+        self.by_host: Dict[str, List[StateKey]] = {}
+        self.dirty = False
+
+    def load(self) -> 'ScanState':
+        """Read the state file if it exists"""
+        if os.path.exists(self.path):
+            with open(self.path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self._put(row)
+        self.dirty = False
+        return self
+
+    def _put(self, row: Dict) -> None:
+        key = state_key(row)
+        if key not in self.rows:
+            self.by_host.setdefault(key[0], []).append(key)
+        self.rows[key] = {field: row.get(field, '') for field in FIELDNAMES}
+
+    def hosts(self) -> List[str]:
+        return list(self.by_host)
+
+    def host_rows(self, ip: str) -> List[Dict]:
+        return [self.rows[key] for key in self.by_host.get(ip, [])]
+
+    def host_ports(self, ip: str) -> set:
+        """(port, protocol) pairs last seen open on a host"""
+        return {(key[1], key[2]) for key in self.by_host.get(ip, [])}
+
+    def is_fresh(self, ip: str, ttl: float, now: Optional[datetime] = None) -> bool:
+        """True if every known service on the host was probed within ttl seconds"""
+        rows = self.host_rows(ip)
+        if not rows:
+            return False
+        cutoff = (now or datetime.now()) - timedelta(seconds=ttl)
+        try:
+            return all(datetime.fromisoformat(r['timestamp']) >= cutoff for r in rows)
+        except ValueError:
+            return False
+
+    def diff(self, row: Dict) -> Optional[str]:
+        """Classify a freshly probed row: 'new', 'changed' or None if unchanged"""
+        previous = self.rows.get(state_key(row))
+        if previous is None:
+            return 'new'
+        if any(str(previous.get(f, '')) != str(row.get(f, '')) for f in SERVICE_FIELDS):
+            return 'changed'
+        return None
+
+    def replace_host(self, ip: str, rows: Iterable[Dict]) -> None:
+        """Replace everything known about a host with its latest rows"""
+        self.remove_host(ip)
+        for row in rows:
+            self._put(row)
+        self.dirty = True
+
+    def remove_host(self, ip: str) -> None:
+        for key in self.by_host.pop(ip, []):
+            self.rows.pop(key, None)
+            self.dirty = True
+
+    def save(self) -> None:
+        """Atomically rewrite the state file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(self.rows.values())
+        os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -1,8 +1,8 @@
-from colorama import init, Fore, Style
 from datetime import datetime
 
 def print_banner():
     """Print ASCII banner"""
+    from colorama import Fore, Style
     banner = f"""{Fore.CYAN}
 ╔═╗╔═╗╔═╗╔═╗╔╦╗╦═╗╔═╗
 ╚═╗╠═╝║╣ ║   ║ ╠╦╝║╣ 
@@ -13,9 +13,10 @@ def print_banner():
 
 
 def validate_target(target):
-    """Basic target validation"""
-    # Add validation logic here
-    return True
+    """Whether every comma/space separated entry is an IP, CIDR, range or hostname"""
+    from utils.targets import TargetSet
+    targets = TargetSet.parse(target)
+    return targets.entries > 0 and not targets.invalid
 
 def generate_output_filename(format='csv'):
     """Generate default output filename with timestamp"""
@@ -0,0 +1,513 @@
+import bisect
+import functools
+import ipaddress
+import math
+import socket
+import struct
+import sys
+from array import array
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from utils.validators import HOSTNAME_RE
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_targets(target: str) -> List[Union[Network, str]]:
+    """
+    Split a target string into networks and hostnames.
+
+    Accepts a single IP/CIDR/hostname or a comma/whitespace separated list.
+    Single IPs become /32 (or /128) networks, anything that isn't an address
+    is kept as a hostname string.
+    """
+    entries = []
+    for item in target.replace(',', ' ').split():
+        try:
+            entries.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            entries.append(item)
+    return entries
+
+
+def _size(entry: Union[Network, str]) -> int:
+    return entry.num_addresses if not isinstance(entry, str) else 1
+
+
+def _format(entry: Union[Network, str]) -> str:
+    """Render a target piece as an nmap argument"""
+    if isinstance(entry, str):
+        return entry
+    if entry.num_addresses == 1:
+        return str(entry.network_address)
+    return str(entry)
+
+
+def split_target(target: Union[str, 'TargetSet'], shards: int) -> List[List[str]]:
+    """
+    Split a target into at most `shards` groups of roughly equal size.
+
+    Networks larger than the per-shard budget are cut into equal subnets,
+    then pieces are packed greedily so each group covers a similar number of
+    addresses. Each group is a list of nmap target arguments.
+
+    Args:
+        target: IP, CIDR, hostname or a comma/space separated list of them,
+            or a TargetSet (split into contiguous address ranges)
+        shards: Desired number of groups
+
+    Returns:
+        List of target argument lists, never empty for a non-empty target
+    """
+    if isinstance(target, TargetSet):
+        return target.split(shards)
+
+    entries = parse_targets(target)
+    if not entries:
+        return []
+    shards = max(1, shards)
+
+    total = sum(_size(e) for e in entries)
+    budget = max(1, math.ceil(total / shards))
+
+    pieces = []
+    for entry in entries:
+        if isinstance(entry, str) or entry.num_addresses <= budget:
+            pieces.append(entry)
+            continue
+
+        # Largest power-of-two block that fits the budget
+        host_bits = max(0, budget.bit_length() - 1)
+        new_prefix = max(entry.prefixlen, entry.max_prefixlen - host_bits)
+        pieces.extend(entry.subnets(new_prefix=new_prefix))
+
+    # Greedy bin packing, biggest pieces first into the lightest group
+    groups = [[] for _ in range(min(shards, len(pieces)))]
+    loads = [0] * len(groups)
+    for piece in sorted(pieces, key=_size, reverse=True):
+        i = loads.index(min(loads))
+        groups[i].append(_format(piece))
+        loads[i] += _size(piece)
+
+    return [g for g in groups if g]
+
+
+# Plain IPv4 addresses buffered before they are merged into the sorted set
+COLLAPSE_EVERY = 1 << 20
+
+# Collapses at least this big are sorted with numpy when available
+NUMPY_THRESHOLD = 1 << 16
+
+# Bytes of a target file parsed at a time
+READ_CHUNK = 1 << 20
+
+_pton_v4 = functools.partial(socket.inet_pton, socket.AF_INET)
+_pack_v4 = struct.Struct('!I').pack
+
+
+def _sorted_unique(values: array) -> array:
+    """
+    Sorted distinct values of a uint32 array. Uses numpy when it's installed
+    and the array is big enough for the import to pay off, since sorting a
+    million Python ints costs far more than sorting the raw buffer.
+    """
+    if len(values) >= NUMPY_THRESHOLD:
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            ordered = numpy.sort(numpy.frombuffer(values, dtype=numpy.uint32))
+            keep = numpy.empty(len(ordered), dtype=bool)
+            keep[0] = True
+            numpy.not_equal(ordered[1:], ordered[:-1], out=keep[1:])
+            unique = array('I')
+            unique.frombytes(ordered[keep].tobytes())
+            return unique
+    return array('I', sorted(set(values)))
+
+
+def _merge(items: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Collapse sorted (start, end) intervals, joining overlapping and adjacent ones"""
+    merged = []
+    for start, end in items:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(ranges: Iterable[Tuple[int, int]], holes: Sequence[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Two-pointer sweep removing sorted disjoint `holes` from sorted disjoint `ranges`"""
+    out = []
+    j, n = 0, len(holes)
+    for start, end in ranges:
+        while j < n and holes[j][1] < start:
+            j += 1
+        k = j
+        while k < n and holes[k][0] <= end:
+            if holes[k][0] > start:
+                out.append((start, holes[k][0] - 1))
+            start = holes[k][1] + 1
+            if start > end:
+                break
+            k += 1
+        if start <= end:
+            out.append((start, end))
+    return out
+
+
+def _cut(addresses: array, holes: Sequence[Tuple[int, int]]) -> array:
+    """Sorted `addresses` without those inside sorted disjoint `holes`, copied slice by slice"""
+    if not holes or not addresses:
+        return addresses
+    kept = array(addresses.typecode)
+    pos = 0
+    for start, end in holes:
+        i = bisect.bisect_left(addresses, start, pos)
+        kept.extend(addresses[pos:i])
+        pos = bisect.bisect_right(addresses, end, i)
+    kept.extend(addresses[pos:])
+    return kept
+
+
+def _address_text(version: int, value: int) -> str:
+    if version == 4:
+        return socket.inet_ntoa(_pack_v4(value))
+    return str(ipaddress.IPv6Address(value))
+
+
+def _format_range(version: int, start: int, end: int) -> Iterator[str]:
+    """nmap arguments covering start..end: bare addresses or CIDR blocks"""
+    bits = 32 if version == 4 else 128
+    while start <= end:
+        # Largest aligned block at `start` that doesn't run past `end`
+        size = start & -start if start else 1 << bits
+        while size > end - start + 1:
+            size >>= 1
+        address = _address_text(version, start)
+        yield address if size == 1 else f"{address}/{bits + 1 - size.bit_length()}"
+        start += size
+
+
+def _parse_range(entry: str) -> Optional[Tuple[int, int, int]]:
+    """(version, start, end) for `first-last` or nmap's last-octet `10.0.0.5-20`"""
+    first, last = entry.split('-', 1)
+    start = ipaddress.ip_address(first)
+    if last.isdigit() and start.version == 4:
+        if int(last) > 255:
+            return None
+        end = int(start) & ~0xFF | int(last)
+    else:
+        try:
+            end_address = ipaddress.ip_address(last)
+        except ValueError:
+            return None
+        if end_address.version != start.version:
+            return None
+        end = int(end_address)
+    if end < int(start):
+        return None
+    return start.version, int(start), end
+
+
+def _parse_entry(entry: str) -> Optional[Tuple[int, Union[int, str], Union[int, str]]]:
+    """
+    (version, start, end) for an address, CIDR or range entry, (0, name, name)
+    for a hostname and None when the entry is neither.
+    """
+    try:
+        if '/' in entry:
+            network = ipaddress.ip_network(entry, strict=False)
+            return network.version, int(network.network_address), int(network.broadcast_address)
+        if '-' in entry:
+            # Hostnames may contain dashes, only an address before it makes a range
+            return _parse_range(entry)
+        address = ipaddress.ip_address(entry)
+        return address.version, int(address), int(address)
+    except ValueError:
+        pass
+    if HOSTNAME_RE.match(entry):
+        return 0, entry, entry
+    return None
+
+
+def _open_list(path: str) -> IO[str]:
+    if path == '-':
+        return open(sys.stdin.fileno(), encoding='utf-8', errors='replace', closefd=False)
+    return open(path, encoding='utf-8', errors='replace')
+
+
+class TargetSet:
+    """
+    Scan targets collapsed into sorted, disjoint address sets.
+
+    Entries can be addresses, CIDRs, `a.b.c.d-e.f.g.h` ranges, nmap's
+    last-octet `a.b.c.d-N` ranges and hostnames. Plain IPv4 addresses, the
+    bulk of any large list, are parsed a chunk at a time and kept as a
+    sorted array of 32-bit integers. Everything else becomes merged
+    (start, end) intervals, and addresses those intervals already cover
+    are dropped. A million-line list therefore costs a few megabytes
+    instead of a million ipaddress objects, and exclusions are cut out
+    with one bisect per excluded range.
+
+    Entries that are neither addresses nor valid hostnames are counted in
+    `invalid` (with a few kept in `invalid_samples`) rather than failing
+    the whole list.
+    """
+
+    def __init__(self):
+        # Sorted unique IPv4 addresses outside every range
+        self._singles = array('I')
+        self._pending = array('I')
+        # Sorted disjoint (start, end) intervals per IP version
+        self._ranges = {4: [], 6: []}
+        self._pending_ranges = []
+        self._size = None
+        self.hostnames = {}
+        self.entries = 0
+        self.invalid = 0
+        self.invalid_samples = []
+        self.excluded = 0
+        self.sources = []
+        self.exclude_sources = []
+
+    @classmethod
+    def parse(cls, target: str) -> 'TargetSet':
+        """TargetSet for a --target style comma/whitespace separated string"""
+        return cls().add_text(target)
+
+    def add(self, entry: str) -> bool:
+        """Add one target entry, returns False (and counts it) when it is invalid"""
+        self.entries += 1
+        self._size = None
+        parsed = _parse_entry(entry)
+        if parsed is None:
+            self.invalid += 1
+            if len(self.invalid_samples) < 5:
+                self.invalid_samples.append(entry)
+            return False
+
+        version, start, end = parsed
+        if not version:
+            self.hostnames[start] = None
+        elif version == 4 and start == end:
+            self._pending.append(start)
+        else:
+            self._pending_ranges.append((version, start, end))
+        return True
+
+    def add_text(self, text: str) -> 'TargetSet':
+        """Add every comma/whitespace separated entry of a --target string"""
+        self.sources.append(text)
+        self._add_tokens(text.replace(',', ' ').split())
+        return self
+
+    def add_file(self, path: str) -> 'TargetSet':
+        """Stream entries from a file (`-` for stdin), comma/whitespace separated"""
+        self.sources.append(path)
+        with _open_list(path) as f:
+            while True:
+                lines = f.readlines(READ_CHUNK)
+                if not lines:
+                    break
+                text = ''.join(lines)
+                if '#' in text:
+                    text = '\n'.join(line.split('#', 1)[0] for line in lines)
+                self._add_tokens(text.replace(',', ' ').split())
+        return self
+
+    def _add_tokens(self, tokens: List[str]) -> None:
+        try:
+            # Whole chunk of plain IPv4 addresses converted in C
+            packed = b''.join(map(_pton_v4, tokens))
+            self.entries += len(tokens)
+        except OSError:
+            # Something else in the chunk, sort it out token by token
+            parts = []
+            for token in tokens:
+                try:
+                    parts.append(_pton_v4(token))
+                    self.entries += 1
+                except OSError:
+                    self.add(token)
+            packed = b''.join(parts)
+
+        values = array('I')
+        values.frombytes(packed)
+        if sys.byteorder == 'little':
+            values.byteswap()
+        self._pending.extend(values)
+        self._size = None
+        if len(self._pending) >= COLLAPSE_EVERY:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """Merge pending entries into the sorted sets"""
+        if not self._pending and not self._pending_ranges:
+            return
+        if self._pending:
+            self._singles.extend(self._pending)
+            self._singles = _sorted_unique(self._singles)
+            self._pending = array('I')
+        if self._pending_ranges:
+            for version in (4, 6):
+                added = [(start, end) for v, start, end in self._pending_ranges if v == version]
+                if added:
+                    self._ranges[version] = _merge(sorted(self._ranges[version] + added))
+            self._pending_ranges = []
+        self._singles = _cut(self._singles, self._ranges[4])
+
+    def exclude(self, other: 'TargetSet') -> 'TargetSet':
+        """Remove every address and hostname in `other` from this set"""
+        before = self.num_addresses
+        other._collapse()
+        for version in (4, 6):
+            holes = other._ranges[version]
+            if version == 4 and other._singles:
+                holes = _merge(sorted(holes + [(ip, ip) for ip in other._singles]))
+            if holes:
+                self._ranges[version] = _subtract(self._ranges[version], holes)
+                if version == 4:
+                    self._singles = _cut(self._singles, holes)
+        for hostname in other.hostnames:
+            self.hostnames.pop(hostname, None)
+        self._size = None
+        self.excluded += before - self.num_addresses
+        self.exclude_sources.extend(other.sources)
+        return self
+
+    @property
+    def num_addresses(self) -> int:
+        """Addresses left to scan, each hostname counting as one"""
+        if self._size is None:
+            self._collapse()
+            self._size = len(self._singles) + len(self.hostnames) + sum(
+                end - start + 1 for ranges in self._ranges.values() for start, end in ranges)
+        return self._size
+
+    @property
+    def num_ranges(self) -> int:
+        """Address ranges (CIDRs and a-b entries) after merging"""
+        self._collapse()
+        return len(self._ranges[4]) + len(self._ranges[6])
+
+    def __len__(self) -> int:
+        return self.num_addresses
+
+    def __bool__(self) -> bool:
+        return self.num_addresses > 0
+
+    def __contains__(self, ip: str) -> bool:
+        if ip in self.hostnames:
+            return True
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        self._collapse()
+        value = int(address)
+        if address.version == 4:
+            i = bisect.bisect_left(self._singles, value)
+            if i < len(self._singles) and self._singles[i] == value:
+                return True
+        ranges = self._ranges[address.version]
+        i = bisect.bisect_right(ranges, (value, math.inf)) - 1
+        return i >= 0 and ranges[i][1] >= value
+
+    def __str__(self) -> str:
+        text = ', '.join(self.sources)
+        if self.exclude_sources:
+            text += f" excluding {', '.join(self.exclude_sources)}"
+        return text
+
+    def _pieces(self) -> Iterator[Tuple[int, Union[int, str, array], Union[int, str, None]]]:
+        """
+        Everything in address order: (4, array, None) for runs of single
+        IPv4 addresses, (version, start, end) per range and (0, name, name)
+        per hostname.
+        """
+        self._collapse()
+        singles, pos = self._singles, 0
+        for start, end in self._ranges[4]:
+            i = bisect.bisect_left(singles, start, pos)
+            if i > pos:
+                yield 4, singles[pos:i], None
+            yield 4, start, end
+            pos = i
+        if pos < len(singles):
+            yield 4, singles[pos:], None
+        for start, end in self._ranges[6]:
+            yield 6, start, end
+        for hostname in self.hostnames:
+            yield 0, hostname, hostname
+
+    def batches(self, budget: int) -> Iterator[List[str]]:
+        """
+        Consecutive groups of nmap target arguments covering `budget`
+        addresses each (the last one may be smaller). Ranges are cut at
+        the budget so groups stay even however the targets are laid out.
+        """
+        budget = max(1, budget)
+        group, room = [], budget
+        for version, start, end in self._pieces():
+            if end is None:
+                # Run of single addresses, rendered in bulk
+                while len(start) >= room:
+                    group.extend(map(socket.inet_ntoa, map(_pack_v4, start[:room])))
+                    start = start[room:]
+                    yield group
+                    group, room = [], budget
+                group.extend(map(socket.inet_ntoa, map(_pack_v4, start)))
+                room -= len(start)
+            elif not version:
+                group.append(start)
+                room -= 1
+            else:
+                while room <= end - start:
+                    group.extend(_format_range(version, start, start + room - 1))
+                    start += room
+                    yield group
+                    group, room = [], budget
+                group.extend(_format_range(version, start, end))
+                room -= end - start + 1
+            if not room:
+                yield group
+                group, room = [], budget
+        if group:
+            yield group
+
+    def addresses(self) -> Iterator[str]:
+        """Every address one at a time in address order, then the hostnames"""
+        for version, start, end in self._pieces():
+            if end is None:
+                yield from map(socket.inet_ntoa, map(_pack_v4, start))
+            elif not version:
+                yield start
+            else:
+                for value in range(start, end + 1):
+                    yield _address_text(version, value)
+
+    def split(self, shards: int) -> List[List[str]]:
+        """At most `shards` contiguous groups with an even share of the addresses"""
+        total = self.num_addresses
+        if not total:
+            return []
+        return list(self.batches(math.ceil(total / max(1, shards))))
+
+    def summary(self) -> str:
+        """One line description of the collapsed set for the CLI"""
+        text = f"{self.entries:,} entries -> {self.num_addresses:,} addresses"
+        details = []
+        if self.num_ranges:
+            details.append(f"{self.num_ranges:,} ranges")
+        if self.hostnames:
+            details.append(f"{len(self.hostnames):,} hostnames")
+        if details:
+            text += f" ({', '.join(details)})"
+        if self.excluded:
+            text += f", {self.excluded:,} excluded"
+        if self.invalid:
+            text += f", {self.invalid:,} invalid"
+        return text
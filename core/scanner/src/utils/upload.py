@@ -0,0 +1,214 @@
+import gzip
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote, urlsplit
+
+# Rows per uploaded batch
+DEFAULT_BATCH_SIZE = 5000
+
+DEFAULT_API_URL = "http://localhost:4000"
+
+# Responses worth retrying: throttling and server-side failures
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class UploadError(Exception):
+    """A batch could not be delivered"""
+
+
+def iter_batches(rows: Iterable[Dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_batch(rows: List[Dict]) -> bytes:
+    """gzip-compressed JSON Lines body for one batch"""
+    lines = ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+                    for row in rows)
+    # Level 5 keeps compression well ahead of the network at similar size
+    return gzip.compress(lines.encode('utf-8'), compresslevel=5)
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections to one server, shared between threads.
+
+    Each request borrows a connection and returns it afterwards, so at most
+    `size` TCP/TLS connections are ever opened and they are reused across
+    batches. A connection that fails is dropped and reopened on next use.
+    """
+
+    def __init__(self, url: str, size: int = 4, timeout: float = 30):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: bytes = b'',
+                headers: Optional[Dict[str, str]] = None) -> tuple:
+        """Send one request and return (status, headers, body)"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, response.headers, data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class BatchUploader:
+    """
+    Streams scan results to the API in fixed-size gzip batches.
+
+    Batches are posted to POST {url}/api/scans/{scan_id}/batches with an
+    Idempotency-Key of "{scan_id}:{index}", so a retried or re-run upload
+    never stores a batch twice. Up to `concurrency` batches are in flight
+    on pooled keep-alive connections; reading stops while they're busy, so
+    memory stays bounded by concurrency * batch_size rows.
+
+    Failed requests (network errors, 429 and 5xx) are retried with jittered
+    exponential backoff, honouring Retry-After. Once every batch landed the
+    scan is finalised with POST {url}/api/scans/{scan_id}/complete.
+    """
+
+    def __init__(self, url: str = DEFAULT_API_URL, batch_size: int = DEFAULT_BATCH_SIZE,
+                 concurrency: int = 4, retries: int = 5, timeout: float = 30,
+                 backoff: float = 0.5, token: Optional[str] = None, verbose: bool = False):
+        self.url = url
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.token = token
+        self.verbose = verbose
+        self.pool = ConnectionPool(url, size=self.concurrency, timeout=timeout)
+        self.batches_sent = 0
+        self.rows_sent = 0
+        self.bytes_sent = 0
+        self.duplicates = 0
+
+    def _log(self, message: str, level: str = "INFO"):
+        if self.verbose:
+            print(f"[{level}] {message}")
+
+    def _headers(self, extra: Dict[str, str]) -> Dict[str, str]:
+        headers = {'Connection': 'keep-alive'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        headers.update(extra)
+        return headers
+
+    def _send(self, path: str, body: bytes, headers: Dict[str, str]) -> Dict:
+        """POST with retries, returning the decoded JSON response"""
+        for attempt in range(self.retries + 1):
+            delay = None
+            try:
+                status, response_headers, data = self.pool.request('POST', path, body, headers)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == self.retries:
+                    raise UploadError(f"POST {path} failed: {e}") from e
+                self._log(f"POST {path} failed ({e}), retrying", "WARNING")
+            else:
+                if status < 300:
+                    return json.loads(data) if data else {}
+                if status not in RETRY_STATUSES or attempt == self.retries:
+                    raise UploadError(f"POST {path} returned {status}: {data[:200].decode('utf-8', 'replace')}")
+                self._log(f"POST {path} returned {status}, retrying", "WARNING")
+                retry_after = response_headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+
+            if delay is None:
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+            time.sleep(delay)
+
+    def _post_batch(self, scan_id: str, index: int, rows: List[Dict]) -> Dict:
+        body = encode_batch(rows)
+        response = self._send(
+            f"/api/scans/{quote(scan_id, safe='')}/batches",
+            body,
+            self._headers({
+                'Content-Type': 'application/x-ndjson',
+                'Content-Encoding': 'gzip',
+                'Idempotency-Key': f"{scan_id}:{index}",
+                'X-Batch-Index': str(index),
+                'X-Batch-Rows': str(len(rows))
+            })
+        )
+        self.batches_sent += 1
+        self.rows_sent += len(rows)
+        self.bytes_sent += len(body)
+        if response.get('duplicate'):
+            self.duplicates += 1
+        self._log(f"Batch {index}: {len(rows)} rows, {len(body)} bytes")
+        return response
+
+    def upload(self, scan_id: str, rows: Iterable[Dict], metadata: Optional[Dict] = None) -> Dict:
+        """Upload every row of a scan, then mark it complete"""
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                in_flight = set()
+                for index, batch in enumerate(iter_batches(rows, self.batch_size)):
+                    if len(in_flight) >= self.concurrency:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()
+                    in_flight.add(executor.submit(self._post_batch, scan_id, index, batch))
+
+                for future in in_flight:
+                    future.result()
+
+            return self._send(
+                f"/api/scans/{quote(scan_id, safe='')}/complete",
+                json.dumps({
+                    'scan_id': scan_id,
+                    'batches': self.batches_sent,
+                    'rows': self.rows_sent,
+                    'metadata': metadata or {}
+                }).encode('utf-8'),
+                self._headers({
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': f"{scan_id}:complete"
+                })
+            )
+        finally:
+            self.pool.close()
@@ -1,4 +1,8 @@
 import ipaddress
+import re
+
+# Letters, digits, dots and dashes, as nmap accepts for hostnames
+HOSTNAME_RE = re.compile(r'^[a-zA-Z0-9.-]+$')
 
 def validate_target(target: str) -> bool:
     """Validate IP, CIDR, or hostname"""
@@ -20,7 +24,7 @@ def validate_target(target: str) -> bool:
         pass
     
     # Assume hostname if it looks valid
-    if re.match(r'^[a-zA-Z0-9.-]+$', target):
+    if HOSTNAME_RE.match(target):
         return True
     
-    return False
\ No newline at end of file
+    return False
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The scanner imports its packages as top-level modules (modules.x, utils.x)
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'src'))
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from modules.nmap_command import build_nmap_command, port_args
+from modules.scanner import NetworkScanner
+
+FAKE_NMAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench', 'fake_nmap.py')
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('top1000', ['--top-ports', '1000']),
+    ('TOP100', ['--top-ports', '100']),
+    ('all', ['-p-']),
+    ('22,80,443', ['-p', '22,80,443']),
+    ('1-1024', ['-p', '1-1024']),
+    ('t:80,u:53', ['-p', 'T:80,U:53']),
+    ('T:22, U:53-60', ['-p', 'T:22,U:53-60']),
+    (None, []),
+    ('  ', [])
+])
+def test_port_args(spec, expected):
+    assert port_args(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['top0', 'http', '80,', '1-2-3', '70000', '100-10', 'X:80', '-p 80', '22;id'])
+def test_port_args_rejects_malformed(spec):
+    with pytest.raises(ValueError):
+        port_args(spec)
+
+
+def test_rate_timeout_and_timing_precede_target_tail():
+    cmd = build_nmap_command(['10.0.0.0/24'], ports='top100', probe_args=['-sV'], max_rate=500,
+                             min_rate=100, host_timeout=30, timing=4, stats_every=None, sudo=False)
+    assert cmd == ['nmap', '-sV', '--top-ports', '100', '-T4', '--min-rate', '100', '--max-rate', '500',
+                   '--host-timeout', '30s', '-oX', '-', '10.0.0.0/24']
+
+
+def test_unset_options_are_left_out():
+    cmd = build_nmap_command(['10.0.0.1'], stats_every=None, sudo=False)
+    assert cmd == ['nmap', '-oX', '-', '10.0.0.1']
+
+
+def test_min_rate_above_max_rate_rejected():
+    with pytest.raises(ValueError):
+        build_nmap_command(['10.0.0.1'], min_rate=2000, max_rate=1000)
+
+
+def test_timing_out_of_range_rejected():
+    with pytest.raises(ValueError):
+        build_nmap_command(['10.0.0.1'], timing=6)
+
+
+def test_sudo_and_nmap_path_prefix():
+    cmd = build_nmap_command(['10.0.0.1'], nmap_path='/opt/nmap/bin/nmap')
+    assert cmd[:2] == ['sudo', '/opt/nmap/bin/nmap']
+    cmd = build_nmap_command(['10.0.0.1'], nmap_path='/opt/nmap/bin/nmap', sudo=False)
+    assert cmd[0] == '/opt/nmap/bin/nmap'
+
+
+def test_target_tail():
+    cmd = build_nmap_command(['10.0.0.1', 'example.com'], additional_args=['--exclude', '10.0.0.2'])
+    assert cmd[-6:] == ['--stats-every', '1s', '-oX', '-', '10.0.0.1', 'example.com']
+    assert cmd.index('--exclude') < cmd.index('-oX')
+
+
+def test_input_file_replaces_targets():
+    cmd = build_nmap_command(['10.0.0.1'], input_file='/tmp/targets.txt', stats_every=None, sudo=False)
+    assert cmd[-4:] == ['-oX', '-', '-iL', '/tmp/targets.txt']
+    assert '10.0.0.1' not in cmd
+
+
+def test_no_targets_rejected():
+    with pytest.raises(ValueError):
+        build_nmap_command([])
+
+
+def test_deadline_kills_nmap(monkeypatch):
+    # 2 hosts/s over a /24 would take minutes, the deadline stops it after 1s
+    monkeypatch.setenv('FAKE_NMAP_RATE', '2')
+    scanner = NetworkScanner(show_progress=False, nmap_path=FAKE_NMAP, sudo=False)
+    scanner.deadline = time.time() + 1
+
+    hosts = []
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        for host in scanner._iter_nmap_hosts('10.0.0.0/24', 'top100'):
+            hosts.append(host)
+            proc = scanner.process
+    assert time.monotonic() - start < 1 + NetworkScanner.KILL_GRACE
+    assert 0 < len(hosts) < 256
+    assert proc.poll() is not None
+    assert scanner.process is None
+
+
+def test_deadline_already_passed():
+    scanner = NetworkScanner(show_progress=False, nmap_path=FAKE_NMAP, sudo=False)
+    scanner.deadline = time.time() - 1
+    with pytest.raises(TimeoutError):
+        list(scanner._iter_nmap_hosts('10.0.0.1', 'top100'))
+
+
+def test_terminate_escalates_to_sigkill(monkeypatch):
+    monkeypatch.setattr(NetworkScanner, 'KILL_GRACE', 0.5)
+    proc = subprocess.Popen([sys.executable, '-c',
+                             'import signal, sys, time\n'
+                             'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+                             'print(flush=True)\n'
+                             'time.sleep(60)'], stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()
+
+    NetworkScanner(show_progress=False, sudo=False)._terminate(proc)
+    assert proc.returncode == -9
@@ -0,0 +1,110 @@
+import os
+import stat
+import sys
+import time
+
+from core.orchestrator import AsyncScanOrchestrator, ScanJob
+from modules.scanner import NetworkScanner
+
+FAKE_NMAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench', 'fake_nmap.py')
+
+
+def orchestrator(nmap_path: str = FAKE_NMAP, **kwargs) -> AsyncScanOrchestrator:
+    scanner = NetworkScanner(show_progress=False, nmap_path=nmap_path, sudo=False)
+    return AsyncScanOrchestrator(scanner, show_progress=False, **kwargs)
+
+
+def script(tmp_path, body: str) -> str:
+    path = tmp_path / 'nmap'
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_concurrency_limit(monkeypatch):
+    monkeypatch.setenv('FAKE_NMAP_RATE', '20')
+    jobs = [ScanJob(f"10.0.{i}.0/29", ports='top100') for i in range(6)]
+    orchestrator(concurrency=2).run_sync(jobs)
+
+    assert [job.status for job in jobs] == ['done'] * 6
+    assert all(len(job.hosts) == 8 for job in jobs)
+    # Never more than two nmap processes alive at the same moment
+    events = sorted([(job.started, 1) for job in jobs] + [(job.finished, -1) for job in jobs])
+    running = peak = 0
+    for _, change in events:
+        running += change
+        peak = max(peak, running)
+    assert peak == 2
+
+
+def test_job_deadline(monkeypatch):
+    monkeypatch.setenv('FAKE_NMAP_RATE', '2')
+    job = ScanJob('10.0.0.0/24', ports='top100', timeout=1)
+
+    start = time.monotonic()
+    orchestrator().run_sync([job])
+    assert job.status == 'timeout'
+    assert 0 < len(job.hosts) < 256
+    assert time.monotonic() - start < 1 + AsyncScanOrchestrator.KILL_GRACE
+
+
+def test_job_deadline_covers_exit(tmp_path):
+    # Output ends but the process lingers, the deadline must still hold
+    nmap = script(tmp_path, "import os, time\nos.close(1)\ntime.sleep(60)\n")
+    job = ScanJob('10.0.0.1', timeout=1)
+
+    start = time.monotonic()
+    orchestrator(nmap).run_sync([job])
+    assert job.status == 'timeout'
+    assert time.monotonic() - start < 1 + AsyncScanOrchestrator.KILL_GRACE
+
+
+def test_global_deadline(monkeypatch):
+    monkeypatch.setenv('FAKE_NMAP_RATE', '2')
+    jobs = [ScanJob(f"10.0.{i}.0/24", ports='top100') for i in range(3)]
+
+    start = time.monotonic()
+    orchestrator(concurrency=1, global_timeout=1).run_sync(jobs)
+    assert [job.status for job in jobs] == ['timeout'] * 3
+    assert jobs[1].error == 'Deadline passed before the job started'
+    assert time.monotonic() - start < 1 + AsyncScanOrchestrator.KILL_GRACE
+
+
+def test_malformed_xml_fails_job(tmp_path):
+    # A broken document followed by more output than the pipe buffer holds
+    nmap = script(tmp_path, (
+        "import sys\n"
+        "sys.stdout.write('<?xml version=\"1.0\"?>\\n<nmaprun>\\n<host><<<\\n')\n"
+        "sys.stdout.write(('x' * 1023 + '\\n') * 1024)\n"
+    ))
+    job = ScanJob('10.0.0.1', timeout=10)
+
+    start = time.monotonic()
+    orchestrator(nmap).run_sync([job])
+    assert job.status == 'failed'
+    assert job.error.startswith('Malformed nmap XML')
+    assert time.monotonic() - start < AsyncScanOrchestrator.KILL_GRACE
+
+
+def test_long_script_output_line(tmp_path):
+    nmap = script(tmp_path, (
+        "print('<?xml version=\"1.0\"?>')\n"
+        "print('<nmaprun scanner=\"nmap\">')\n"
+        "print('<host><status state=\"up\"/><address addr=\"10.0.0.1\" addrtype=\"ipv4\"/><ports>"
+        "<port protocol=\"tcp\" portid=\"80\"><state state=\"open\"/><service name=\"http\"/>"
+        "<script id=\"http-title\" output=\"' + 'x' * 100000 + '\"/></port></ports></host>')\n"
+        "print('</nmaprun>')\n"
+    ))
+    job = ScanJob('10.0.0.1')
+    orchestrator(nmap).run_sync([job])
+    assert job.status == 'done'
+    assert [host.ip for host in job.hosts] == ['10.0.0.1']
+
+
+def test_line_over_limit_fails_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(AsyncScanOrchestrator, 'LINE_LIMIT', 1024)
+    nmap = script(tmp_path, "print('<nmaprun>' + 'x' * 4096)\n")
+    job = ScanJob('10.0.0.1')
+    orchestrator(nmap).run_sync([job])
+    assert job.status == 'failed'
+    assert job.error.startswith('Unreadable nmap output')
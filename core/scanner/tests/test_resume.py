@@ -0,0 +1,53 @@
+import csv
+import os
+import signal
+import subprocess
+import sys
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(TESTS_DIR, '..', 'src', 'cli.py')
+FAKE_NMAP = os.path.join(TESTS_DIR, '..', 'bench', 'fake_nmap.py')
+
+
+def cli(tmp_path, *args, **kwargs) -> subprocess.Popen:
+    env = dict(os.environ, SPECTRE_NMAP=FAKE_NMAP, FAKE_NMAP_RATE='40', HOME=str(tmp_path))
+    return subprocess.Popen(
+        [sys.executable, CLI, 'scan', *args, '--no-sudo', '--no-index', '--checkpoint-dir', str(tmp_path / 'ck')],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, **kwargs
+    )
+
+
+def test_interrupted_scan_resumes(tmp_path):
+    output = tmp_path / 'scan'
+    scan = cli(tmp_path, '-t', '10.0.0.0/25', '-o', str(output))
+    time.sleep(1.5)
+    scan.send_signal(signal.SIGINT)
+    log = scan.communicate(timeout=30)[0]
+
+    journals = os.listdir(tmp_path / 'ck')
+    assert len(journals) == 1, log
+    scan_id = journals[0].split('.')[0]
+    assert f"--resume {scan_id}" in log
+
+    resumed = cli(tmp_path, '--resume', scan_id)
+    log = resumed.communicate(timeout=60)[0]
+    assert resumed.returncode == 0, log
+
+    with open(f"{output}.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    # Every host exactly once, 3 fake services each, none scanned twice
+    assert len({row['target_ip'] for row in rows}) == 128
+    assert len(rows) == 128 * 3
+    assert {row['scan_id'] for row in rows} == {scan_id}
+    assert os.listdir(tmp_path / 'ck') == []
+
+
+def test_resume_rejected_for_unjournaled_modes(tmp_path):
+    (tmp_path / 'ck').mkdir()
+    (tmp_path / 'ck' / 'SCAN.jsonl').write_text(
+        '{"type":"scan","scan_id":"SCAN","target":"10.0.0.0/30","shards":[["10.0.0.0/30"]],"settings":{}}\n')
+    scan = cli(tmp_path, '--resume', 'SCAN', '--two-phase')
+    log = scan.communicate(timeout=30)[0]
+    assert scan.returncode == 1
+    assert "--resume can't be combined with --two-phase" in log
@@ -0,0 +1,35 @@
+import os
+import stat
+import sys
+import time
+
+from modules.scanner import NetworkScanner
+
+FAKE_NMAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bench', 'fake_nmap.py')
+
+
+def script(tmp_path, body: str) -> str:
+    path = tmp_path / 'nmap'
+    path.write_text(f"#!{sys.executable}\n{body}")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+def test_scan_streams_every_host():
+    scanner = NetworkScanner(show_progress=False, nmap_path=FAKE_NMAP, sudo=False)
+    results = scanner.scan('10.0.0.0/28', ports='top100', timeout=0)
+    assert len({row.host.ip for row in results}) == 16
+
+
+def test_malformed_xml_stops_nmap(tmp_path):
+    # A broken document followed by more output than the pipe buffer holds
+    nmap = script(tmp_path, (
+        "import sys\n"
+        "sys.stdout.write('<?xml version=\"1.0\"?>\\n<nmaprun>\\n<host><<<\\n')\n"
+        "sys.stdout.write(('x' * 1023 + '\\n') * 1024)\n"
+    ))
+    scanner = NetworkScanner(show_progress=False, nmap_path=nmap, sudo=False)
+
+    start = time.monotonic()
+    assert scanner.scan('10.0.0.1', ports='top100', timeout=0) == []
+    assert time.monotonic() - start < NetworkScanner.KILL_GRACE
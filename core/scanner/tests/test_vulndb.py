@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from modules.vulndb import VulnIndex, normalize_product
+
+
+def cve(number: int, cpe: str, **bounds) -> dict:
+    return {
+        'cve': {'CVE_data_meta': {'ID': f"CVE-2021-{number:05d}"}},
+        'configurations': {'nodes': [{'operator': 'OR', 'cpe_match': [dict(vulnerable=True, cpe23Uri=cpe, **bounds)]}]},
+        'impact': {'baseMetricV3': {'cvssV3': {'baseScore': 7.5, 'baseSeverity': 'HIGH'}}}
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    feed = tmp_path / 'nvdcve-1.1-test.json'
+    feed.write_text(json.dumps({'CVE_Items': [
+        cve(1, 'cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*'),
+        cve(2, 'cpe:2.3:a:ibm:http_server:*:*:*:*:*:*:*:*', versionEndIncluding='9.0'),
+        cve(3, 'cpe:2.3:a:nginx:nginx:*:*:*:*:*:*:*:*', versionEndExcluding='1.20.1'),
+        cve(4, 'cpe:2.3:a:f5:nginx:*:*:*:*:*:*:*:*', versionEndExcluding='1.20.1'),
+        cve(5, 'cpe:2.3:a:beasts:vsftpd:3.0.5:*:*:*:*:*:*:*'),
+        cve(6, 'cpe:2.3:a:acme:server:*:*:*:*:*:*:*:*'),
+        cve(7, 'cpe:2.3:a:other:server:*:*:*:*:*:*:*:*')
+    ]}))
+    return VulnIndex.build([str(feed)])
+
+
+def test_normalize_product():
+    assert normalize_product('Apache httpd') == ('apache', 'http_server')
+    assert normalize_product('ProFTPD ftpd') == (None, 'proftpd')
+
+
+def test_alias_matches_its_vendor_only(index):
+    assert [c[0] for c in index.match('Apache httpd', '2.4.49')] == ['CVE-2021-00001']
+    assert index.match('Apache httpd', '2.4.50') == []
+
+
+def test_unaliased_product_under_one_vendor(index):
+    assert [c[0] for c in index.match('vsftpd', '3.0.5')] == ['CVE-2021-00005']
+
+
+def test_unaliased_product_prefers_same_named_vendor(index):
+    assert [c[0] for c in index.match('nginx', '1.18.0')] == ['CVE-2021-00003']
+
+
+def test_ambiguous_product_matches_nothing(index):
+    assert index.match('Server', '1.0') == []